@@ -7,6 +7,7 @@ from dotenv import load_dotenv
 from quartz_solar_forecast.forecast import run_forecast
 from quartz_solar_forecast.pydantic_models import PVSite, ForecastRequest, TokenRequest
 from quartz_solar_forecast.inverters.enphase import get_enphase_auth_url, get_enphase_access_token
+from quartz_solar_forecast.weather.endpoints import endpoint_health
 
 load_dotenv()
 
@@ -49,10 +50,16 @@ def forecast(forecast_request: ForecastRequest):
     response = {
         "timestamp": formatted_timestamp,
         "predictions": predictions.to_dict(),
+        # seconds since the nwp data was fetched, None for historical timestamps
+        "nwp_age_seconds": predictions_no_live.attrs.get("nwp_age_seconds"),
     }
 
     return response
 
+@app.get("/health/open_meteo")
+def open_meteo_health():
+    return endpoint_health()
+
 @app.get("/solar_inverters/enphase/auth_url")
 def get_enphase_authorization_url():
     auth_url = get_enphase_auth_url()
@@ -0,0 +1,166 @@
+"""
+The quartz-forecast command line
+
+    quartz-forecast batch sites.csv --init-time 2024-07-01T09:00 --output forecasts.parquet
+    quartz-forecast batch sites.parquet --start 2024-07-01 --end 2024-07-07 --freq-hours 24
+
+`backfill` forecasts one site at many init times, in parallel, and writes the forecasts to
+Parquet partitioned by date, so a long backfill can be restarted
+    quartz-forecast backfill --latitude 51.75 --longitude -1.25 --capacity-kwp 1.25 --start 2024-07-01 --end 2024-09-30
+
+Before a backfill of more than 90 days ago, the historical weather data can be prefetched, so
+each forecast reads it from the local archive rather than requesting it
+    quartz-forecast prefetch-nwp sites.csv --start 2023-01-01 --end 2023-12-31
+"""
+import time
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+import typer
+from rich.progress import BarColumn, MofNCompleteColumn, Progress, TextColumn, TimeElapsedColumn, TimeRemainingColumn
+
+from quartz_solar_forecast.utils.forecast_csv import backfill_forecasts
+from quartz_solar_forecast.utils.portfolio import read_sites, run_portfolio_forecast
+from quartz_solar_forecast.weather.archive import prefetch_sites
+
+app = typer.Typer(help="Quartz Solar Forecast")
+
+
+@app.callback()
+def main():
+    """
+    Quartz Solar Forecast
+    """
+
+
+def make_batch_init_times(
+    init_times: Optional[List[str]], start: Optional[str], end: Optional[str], freq_hours: float
+) -> List[pd.Timestamp]:
+    """
+    Make the init times of a batch, from a list of init times, or a start, end and frequency
+
+    :param init_times: the init times
+    :param start: the first init time
+    :param end: the last possible init time, by default start
+    :param freq_hours: the time between init times [hours]
+    :return: the init times, sorted
+    """
+    if init_times:
+        return sorted(pd.Timestamp(init_time) for init_time in init_times)
+    if start is not None:
+        end = start if end is None else end
+        return list(pd.date_range(start, end, freq=pd.Timedelta(hours=freq_hours)))
+
+    raise typer.BadParameter("Give the init times with --init-time, or with --start and --end")
+
+
+@app.command()
+def batch(
+    sites_path: str = typer.Argument(..., help="csv or Parquet file of sites"),
+    init_time: Optional[List[str]] = typer.Option(None, help="an init time, can be given more than once"),
+    start: Optional[str] = typer.Option(None, help="the first init time"),
+    end: Optional[str] = typer.Option(None, help="the last init time"),
+    freq_hours: float = typer.Option(24, help="the time between init times from --start to --end [hours]"),
+    output: str = typer.Option("forecasts.parquet", help="the Parquet file to write"),
+    workers: Optional[int] = typer.Option(None, help="the number of worker processes, by default the number of CPUs"),
+    nwp_source: str = typer.Option("icon", help="the nwp data source, icon, gfs or ukmo"),
+    float32: bool = typer.Option(False, help="use float32 data and forecasts, to halve their memory"),
+    use_generation_store: bool = typer.Option(
+        False, help="read live data from the fleet collector's generation store, by site_id"
+    ),
+):
+    """
+    Forecast every site in a sites file, at one or many init times, and write the forecasts to Parquet
+    """
+    sites = read_sites(sites_path)
+    init_times = make_batch_init_times(init_time, start, end, freq_hours)
+    n_forecasts = len(sites) * len(init_times)
+    print(f"Running {n_forecasts} forecasts, for {len(sites)} sites at {len(init_times)} init times")
+
+    n_rows = 0
+    start_time = time.monotonic()
+    with Progress(
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        MofNCompleteColumn(),
+        TextColumn("{task.fields[rate]:.2f} forecasts/s, {task.fields[rows]} rows"),
+        TimeElapsedColumn(),
+        TimeRemainingColumn(),
+    ) as progress:
+        task = progress.add_task("Forecasting", total=n_forecasts, rate=0.0, rows=0)
+
+        def on_forecast(site_id: str, rows: int):
+            nonlocal n_rows
+            n_rows += rows
+            n_done = progress.tasks[0].completed + 1
+            progress.update(
+                task, advance=1, rate=n_done / max(time.monotonic() - start_time, 1e-9), rows=n_rows
+            )
+
+        failed = run_portfolio_forecast(
+            sites,
+            init_times,
+            output,
+            nwp_source=nwp_source,
+            max_workers=workers,
+            on_forecast=on_forecast,
+            dtype=np.float32 if float32 else None,
+            use_generation_store=use_generation_store,
+        )
+
+    elapsed = time.monotonic() - start_time
+    print(
+        f"Wrote {n_rows} rows from {n_forecasts - len(failed)} forecasts to {output} in {elapsed:.1f}s, "
+        f"{(n_forecasts - len(failed)) / max(elapsed, 1e-9):.2f} forecasts/s"
+    )
+    if failed:
+        print(f"{len(failed)} forecasts failed: {failed}")
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def backfill(
+    latitude: float = typer.Option(..., help="the latitude of the site"),
+    longitude: float = typer.Option(..., help="the longitude of the site"),
+    capacity_kwp: float = typer.Option(..., help="the capacity of the site [kWp]"),
+    start: str = typer.Option(..., help="the first init time"),
+    end: str = typer.Option(..., help="the last possible init time"),
+    freq_hours: float = typer.Option(6, help="the time between init times [hours]"),
+    output_dir: str = typer.Option("backfill_forecasts", help="the directory of the date partitioned Parquet"),
+    workers: Optional[int] = typer.Option(None, help="the number of worker processes, by default the number of CPUs"),
+    nwp_source: str = typer.Option("icon", help="the nwp data source, icon, gfs or ukmo"),
+):
+    """
+    Backfill the forecasts of one site at many init times, one date per worker, into Parquet partitioned by date
+    """
+    start_time = time.monotonic()
+    n_rows = backfill_forecasts(
+        freq_hours,
+        pd.Timestamp(start).to_pydatetime(),
+        pd.Timestamp(end).to_pydatetime(),
+        latitude,
+        longitude,
+        capacity_kwp,
+        output_dir=output_dir,
+        nwp_source=nwp_source,
+        max_workers=workers,
+    )
+    print(f"Wrote {n_rows} rows to {output_dir} in {time.monotonic() - start_time:.1f}s")
+
+
+@app.command()
+def prefetch_nwp(
+    sites_path: str = typer.Argument(..., help="csv or Parquet file of sites"),
+    start: str = typer.Option(..., help="the first init time of the backfill"),
+    end: str = typer.Option(..., help="the last init time of the backfill"),
+):
+    """
+    Fetch the historical weather data for a backfill of the sites into the local archive, one request per site
+    """
+    sites = read_sites(sites_path)
+    prefetch_sites([(site.latitude, site.longitude) for site in sites], start, end)
+
+
+if __name__ == "__main__":
+    app()
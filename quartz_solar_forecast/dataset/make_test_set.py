@@ -12,8 +12,7 @@ from typing import Optional
 import numpy as np
 import pandas as pd
 
-from quartz_solar_forecast.eval.utils import make_hf_filename
-from huggingface_hub import HfFileSystem
+from quartz_solar_forecast.eval.hf_manifest import ICONManifest
 
 test_start_date = pd.Timestamp("2021-01-01")
 test_end_date = pd.Timestamp("2022-01-01")
@@ -103,7 +102,7 @@ def make_test_set(output_file_name: Optional[str] = None, number_of_samples_per_
     return test_set
 
 
-def filter_timestamps_if_hf_files_exists(timestamps_full: pd.DatetimeIndex):
+def filter_timestamps_if_hf_files_exists(timestamps_full: pd.DatetimeIndex, manifest: Optional[ICONManifest] = None):
     """
     Filter the timestamps if the huggingface files exist
 
@@ -111,22 +110,19 @@ def filter_timestamps_if_hf_files_exists(timestamps_full: pd.DatetimeIndex):
     exist in
     https://huggingface.co/datasets/openclimatefix/dwd-icon-eu/tree/main/data
 
+    This uses the cached manifest of ICON files, so only months that have not been
+    listed before are listed on Hugging Face.
+
+    :param timestamps_full: the timestamps
+    :param manifest: the manifest of ICON files, by default the cached one is used
     """
-    timestamps = []
-    fs = HfFileSystem()
-    # print(fs.ls("datasets/openclimatefix/dwd-icon-eu/data/2022/4/11/", detail=False))
-    for timestamp in timestamps_full:
-        timestamp_floor = timestamp.floor("6h")
-        _, huggingface_file = make_hf_filename(timestamp_floor)
-        huggingface_file = huggingface_file[14:]
-
-        if fs.exists(huggingface_file):
-            timestamps.append(timestamp)
-        else:
-            print(f"Skipping {timestamp} because {huggingface_file} does not exist")
-
-    timestamps = pd.DatetimeIndex(timestamps)
-    return timestamps
+    if manifest is None:
+        manifest = ICONManifest()
+
+    exists = manifest.exists(timestamps_full)
+    print(f"Skipping {(~exists).sum()} of {len(timestamps_full)} timestamps because their ICON files do not exist")
+
+    return pd.DatetimeIndex(timestamps_full[exists])
 
 
 # To run the script, un comment the following line and run this file
@@ -0,0 +1,78 @@
+"""
+Checkpoints for the stages of the evaluation
+
+Each stage's output is saved as a Parquet file, named by the stage and a hash of the stage's
+inputs. When the evaluation is run again with the same inputs, e.g. after a crash, the saved
+outputs are loaded rather than recomputed. Files are written to a temporary name and then
+renamed, so a crash part way through a write never leaves a checkpoint that looks complete.
+"""
+import hashlib
+import os
+from typing import Callable, Union
+
+import pandas as pd
+
+EVAL_CHECKPOINT_DIR = "data/eval"
+
+
+def hash_inputs(*inputs: Union[pd.DataFrame, str]) -> str:
+    """
+    Hash the contents of dataframes and strings
+
+    :param inputs: dataframes, or strings such as the hash of an earlier stage
+    :return: the hex digest, 16 characters long
+    """
+    digest = hashlib.sha256()
+    for stage_input in inputs:
+        if isinstance(stage_input, pd.DataFrame):
+            digest.update(",".join(map(str, stage_input.columns)).encode())
+            digest.update(pd.util.hash_pandas_object(stage_input, index=False).to_numpy().tobytes())
+        else:
+            digest.update(str(stage_input).encode())
+        # separate the inputs, so their boundaries are part of the hash
+        digest.update(b"\0")
+
+    return digest.hexdigest()[:16]
+
+
+class CheckpointStore:
+    """
+    Saved outputs of the evaluation stages, keyed by stage name and input hash
+    """
+
+    def __init__(self, directory: str = EVAL_CHECKPOINT_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, stage: str, key: str) -> str:
+        return f"{self.directory}/{stage}-{key}.parquet"
+
+    def exists(self, stage: str, key: str) -> bool:
+        return os.path.exists(self.path(stage, key))
+
+    def load(self, stage: str, key: str) -> pd.DataFrame:
+        return pd.read_parquet(self.path(stage, key))
+
+    def save(self, stage: str, key: str, df: pd.DataFrame):
+        path = self.path(stage, key)
+        tmp_path = f"{path}.tmp"
+        df.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+
+    def load_or_compute(self, stage: str, key: str, compute: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        """
+        Load the output of a stage, or compute and save it if it has not been saved
+
+        :param stage: the stage name
+        :param key: the hash of the stage's inputs, from hash_inputs
+        :param compute: function that computes the stage's output
+        :return: the stage's output
+        """
+        if self.exists(stage, key):
+            print(f"Loading {stage} from checkpoint {self.path(stage, key)}")
+            return self.load(stage, key)
+
+        df = compute()
+        self.save(stage, key, df)
+
+        return df
@@ -1,25 +1,55 @@
 import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Optional
+
 import pandas as pd
-import xarray as xr
-from psp.data_sources.nwp import NwpDataSource
-from psp.data_sources.pv import NetcdfPvDataSource
 from psp.serialization import load_model
-from psp.typings import X
 
-from quartz_solar_forecast.data import get_nwp, make_pv_data
+from quartz_solar_forecast.data import format_nwp_data, process_pv_data
 from quartz_solar_forecast.pydantic_models import PVSite
 from quartz_solar_forecast.forecasts.v1 import forecast_v1
-from quartz_solar_forecast.data import format_nwp_data
 
 from datetime import datetime
 
 dir_path = os.path.dirname(os.path.realpath(__file__))
+model_path = f"{dir_path}/../models/model-0.3.0.pkl"
+
+
+# the model is loaded once in each worker process
+_model = None
+
+
+def _init_worker(model_path: str):
+    global _model
+    _model = load_model(model_path)
+
+
+def make_forecast_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Make a process pool for run_forecast, with the model loaded once per worker
+
+    The pool can be reused by many calls of run_forecast, so the workers, and their models,
+    are only started once.
+
+    :param max_workers: the number of worker processes, defaults to the number of CPUs
+    :return: the process pool
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(model_path,))
 
 
-def run_forecast(pv_df: pd.DataFrame, nwp_df: pd.DataFrame, nwp_source="ICON") -> pd.DataFrame:
+def run_forecast(
+    pv_df: pd.DataFrame,
+    nwp_df: pd.DataFrame,
+    nwp_source="ICON",
+    max_workers: Optional[int] = None,
+    pool: Optional[Executor] = None,
+) -> pd.DataFrame:
     """
     Run the forecast from NWP data
 
+    The NWP data is grouped by pv_id and timestamp once, and the forecasts are run across a
+    process pool, with the model loaded once per worker.
+
     :param pv_df: the PV site data. This should have columns timestamp, id, latitude, longitude, and capacity
     :param nwp_df: all the nwp data for the site and location. This shoulw have the following rows
         - timestamp: the timestamp of the site
@@ -31,59 +61,75 @@ def run_forecast(pv_df: pd.DataFrame, nwp_df: pd.DataFrame, nwp_source="ICON") -
         - cloudcover_mid",
         - cloudcover_high",
         maybe more
+    :param nwp_source: the nwp data source
+    :param max_workers: the number of worker processes, defaults to the number of CPUs.
+        If this is 1, the forecasts are run in this process
+    :param pool: a pool from make_forecast_pool to run the forecasts in, e.g. to reuse it for
+        several calls. If given, max_workers is not used
     """
 
-    # load model only once
-    model = load_model(f"{dir_path}/../models/model-0.3.0.pkl")
+    # group the nwp data once, rather than filtering all of it for every row
+    nwp_groups = {key: group for key, group in nwp_df.groupby(["pv_id", "timestamp"])}
+    empty_nwp_df = nwp_df.iloc[0:0]
+
+    tasks = []
+    for i, pv_row in enumerate(pv_df.to_dict("records")):
+        nwp_site_df = nwp_groups.get((pv_row["pv_id"], pv_row["timestamp"]), empty_nwp_df)
+        tasks.append((i, len(pv_df), pv_row, nwp_site_df, nwp_source))
+
+    if pool is not None:
+        all_predictions = list(pool.map(_forecast_one, *zip(*tasks), chunksize=8))
+    elif max_workers == 1:
+        # load model only once
+        _init_worker(model_path)
+        all_predictions = [_forecast_one(*task) for task in tasks]
+    else:
+        with make_forecast_pool(max_workers) as pool:
+            all_predictions = list(pool.map(_forecast_one, *zip(*tasks), chunksize=8))
 
-    all_predictions = []
-    for i in range(len(pv_df)):
-
-        print(f"Running forecast for {i} of {len(pv_df)}")
-
-        pv_row = pv_df.iloc[i]
-
-        site = PVSite(
-            latitude=pv_row["latitude"],
-            longitude=pv_row["longitude"],
-            capacity_kwp=pv_row["capacity"],
-        )
+    all_predictions = pd.concat(all_predictions)
+    all_predictions['timestamp'] = all_predictions.index
 
-        nwp_site_df = nwp_df[
-            (nwp_df["pv_id"] == pv_row.pv_id) & (nwp_df["timestamp"] == pv_row.timestamp)
-        ]
+    return all_predictions
 
-        pv_id = pv_df["pv_id"][i]
-        ts = pv_df["timestamp"][i]
 
-        # format
-        for c in ["timestamp", "latitude", "longitude", "pv_id"]:
-            if c in nwp_site_df.columns:
-                nwp_site_df = nwp_site_df.drop(columns=c)
+def _forecast_one(
+    i: int, n_rows: int, pv_row: dict, nwp_site_df: pd.DataFrame, nwp_source: str
+) -> pd.DataFrame:
+    """
+    Run the forecast for one row of the testset, using the model loaded in this process
+    """
+    print(f"Running forecast for {i} of {n_rows}")
 
-        nwp_site_df.set_index("time", inplace=True, drop=True)
+    site = PVSite(
+        latitude=pv_row["latitude"],
+        longitude=pv_row["longitude"],
+        capacity_kwp=pv_row["capacity"],
+    )
 
-        if isinstance(ts, str):
-            ts = datetime.fromisoformat(ts)
+    pv_id = pv_row["pv_id"]
+    ts = pv_row["timestamp"]
 
-        # make pv and nwp data from GFS
-        # TODO move this to model
-        print("Making pv and nwp data")
-        nwp_xr = format_nwp_data(df=nwp_site_df, nwp_source=nwp_source, site=site)
-        pv_xr = make_pv_data(site=site, ts=ts)
+    # format
+    nwp_site_df = nwp_site_df.drop(
+        columns=[c for c in ["timestamp", "latitude", "longitude", "pv_id"] if c in nwp_site_df.columns]
+    )
+    nwp_site_df = nwp_site_df.set_index("time", drop=True)
 
-        # run model
-        print('Running model')
-        pred_df = forecast_v1(nwp_source, nwp_xr, pv_xr, ts, model=model)
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
 
-        # only select hourly predictions
-        pred_df = pred_df.resample("1H").mean()
-        pred_df["horizon_hour"] = range(0, len(pred_df))
-        pred_df["pv_id"] = pv_id
+    # make pv and nwp data, there is no live pv data for the testset
+    # TODO move this to model
+    nwp_xr = format_nwp_data(df=nwp_site_df, nwp_source=nwp_source, site=site)
+    pv_xr = process_pv_data(live_generation_kw=None, ts=ts, site=site)
 
-        all_predictions.append(pred_df)
+    # run model
+    pred_df = forecast_v1(nwp_source, nwp_xr, pv_xr, ts, model=_model)
 
-    all_predictions = pd.concat(all_predictions)
-    all_predictions['timestamp'] = all_predictions.index
+    # only select hourly predictions
+    pred_df = pred_df.resample("1H").mean()
+    pred_df["horizon_hour"] = range(0, len(pred_df))
+    pred_df["pv_id"] = pv_id
 
-    return all_predictions
+    return pred_df
@@ -0,0 +1,125 @@
+"""
+A cached manifest of the ICON init files on Hugging Face
+
+Not every ICON init time is in the dataset, so before using a file we need to know if it exists.
+Rather than probing each file, the manifest lists the dataset one month directory at a time and
+caches the names of the files it finds. A month is only listed again if it had not finished
+when it was last listed, so refreshing the manifest only lists recent months.
+
+https://huggingface.co/datasets/openclimatefix/dwd-icon-eu/tree/main/data
+"""
+import json
+import os
+import re
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+ICON_HF_ROOT = "datasets/openclimatefix/dwd-icon-eu/data"
+HF_MANIFEST_PATH = "data/nwp/icon_manifest.json"
+
+ICON_FILE_PATTERN = re.compile(r"(\d{8}_\d{2})\.zarr\.zip$")
+
+
+class ICONManifest:
+    """
+    The ICON init files that exist on Hugging Face, by their date and hour, e.g. "20210101_00"
+    """
+
+    def __init__(self, path: str = HF_MANIFEST_PATH, fs=None):
+        """
+        :param path: the path of the cached manifest
+        :param fs: the Hugging Face file system, by default one is made when it is needed
+        """
+        self.path = path
+        self._fs = fs
+
+        # when each month was last listed, and the files found
+        self.months: Dict[str, str] = {}
+        self.files: Set[str] = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                manifest = json.load(f)
+            self.months = manifest["months"]
+            self.files = set(manifest["files"])
+
+    @property
+    def fs(self):
+        if self._fs is None:
+            from huggingface_hub import HfFileSystem
+
+            self._fs = HfFileSystem()
+        return self._fs
+
+    def months_to_list(self, timestamps: pd.DatetimeIndex, now: Optional[pd.Timestamp] = None) -> List[str]:
+        """
+        Find the months that need listing, to cover the timestamps
+
+        :param timestamps: the timestamps
+        :param now: the current time, used to check if a month has finished
+        :return: the months, e.g. "2021/1", that have never been listed, or that had not
+            finished when they were last listed
+        """
+        now = pd.Timestamp.now(tz="UTC").tz_localize(None) if now is None else now
+
+        months = []
+        for month_start in pd.DatetimeIndex(timestamps).floor("6h").to_period("M").unique().to_timestamp():
+            month = f"{month_start.year}/{month_start.month}"
+            if month_start > now:
+                continue
+            listed_at = self.months.get(month)
+            if listed_at is None or pd.Timestamp(listed_at) < month_start + pd.offsets.MonthBegin(1):
+                months.append(month)
+
+        return months
+
+    def refresh(self, timestamps: pd.DatetimeIndex, now: Optional[pd.Timestamp] = None) -> List[str]:
+        """
+        List the months needed for the timestamps that are not already in the manifest
+
+        :param timestamps: the timestamps
+        :param now: the current time, used to check if a month has finished
+        :return: the months that were listed
+        """
+        now = pd.Timestamp.now(tz="UTC").tz_localize(None) if now is None else now
+
+        months = self.months_to_list(timestamps, now=now)
+        for month in months:
+            print(f"Listing ICON files on Hugging Face for {month}")
+            try:
+                paths = self.fs.find(f"{ICON_HF_ROOT}/{month}")
+            except FileNotFoundError:
+                paths = []
+
+            self.files.update(
+                match.group(1) for match in (ICON_FILE_PATTERN.search(path) for path in paths) if match
+            )
+            self.months[month] = now.isoformat()
+
+        if months:
+            self.save()
+
+        return months
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"months": self.months, "files": sorted(self.files)}, f)
+        os.replace(tmp_path, self.path)
+
+    def exists(self, timestamps: pd.DatetimeIndex, refresh: bool = True) -> np.ndarray:
+        """
+        Check if the ICON init file for each timestamp exists
+
+        :param timestamps: the timestamps, these are rounded down to the 6 hour init times
+        :param refresh: whether to list the months that are needed first
+        :return: boolean for each timestamp
+        """
+        timestamps = pd.DatetimeIndex(timestamps)
+        if refresh:
+            self.refresh(timestamps)
+
+        date_and_hours = timestamps.floor("6h").strftime("%Y%m%d_%H")
+        return date_and_hours.isin(list(self.files))
@@ -1,6 +1,283 @@
+import os
+import warnings
+from typing import Dict, List, Optional, Tuple
+
 import numpy as np
 import pandas as pd
 
+# horizon buckets [hours], the ends are inclusive, and the buckets can overlap
+HORIZON_BUCKETS = [[3, 4], [5, 8], [9, 16], [17, 24], [24, 48], [0, 36]]
+
+# the groupings the metrics are calculated over, as columns of the prepared results
+METRIC_GROUPS = {
+    "overall": None,
+    "horizon": "horizon_hour",
+    "horizon_bucket": "horizon_bucket",
+    "site": "pv_id",
+    "month": "month",
+    "hour_of_day": "hour_of_day",
+}
+
+
+def prepare_results(
+    results_df: pd.DataFrame, pv_metadata: pd.DataFrame, include_night: bool = False
+) -> pd.DataFrame:
+    """
+    Add the errors and the grouping columns to the results, ready for the metrics
+
+    The month and hour of day are of the time being forecast, i.e. timestamp + horizon_hour.
+
+    :param results_df: the forecast results, see compute_metrics
+    :param pv_metadata: dataframe with pv_id and capacity columns
+    :param include_night: whether to include night time, when generation is 0.1 kw or less
+    :return: dataframe with error, abs_error, squared_error and normalized_abs_error columns,
+        and month and hour_of_day columns
+    """
+    # remove night time
+    if not include_night:
+        results_df = results_df[results_df["generation_power"] > 0.1]
+
+    # merge pv_metadata with results_df, pv_metadata can have a row for each timestamp of a site
+    capacities = pv_metadata[["pv_id", "capacity"]].drop_duplicates("pv_id")
+    results_df = pd.merge(results_df, capacities, on="pv_id")
+
+    error = (results_df["forecast_power"] - results_df["generation_power"]).to_numpy(dtype=float)
+    results_df = results_df.assign(
+        error=error,
+        abs_error=np.abs(error),
+        squared_error=error**2,
+        normalized_abs_error=np.abs(error) / results_df["capacity"].to_numpy(dtype=float),
+    )
+
+    target_time = pd.to_datetime(results_df["timestamp"]) + pd.to_timedelta(
+        results_df["horizon_hour"], unit="h"
+    )
+    results_df["month"] = target_time.dt.month
+    results_df["hour_of_day"] = target_time.dt.hour
+
+    return results_df
+
+
+def horizon_bucket_rows(horizon_hour: np.ndarray, horizon_buckets: List[List[int]]):
+    """
+    Find the results in each horizon bucket, a result can be in more than one bucket
+
+    :param horizon_hour: the horizon [hours] of each result
+    :param horizon_buckets: list of [start, end] horizons [hours], the ends are inclusive
+    :return: the row of each result in each bucket, and the label of its bucket, e.g. "5-8"
+    """
+    rows = []
+    labels = []
+    for start, end in horizon_buckets:
+        in_bucket = np.flatnonzero((horizon_hour >= start) & (horizon_hour <= end))
+        rows.append(in_bucket)
+        labels.append(np.full(len(in_bucket), f"{start}-{end}", dtype=object))
+
+    return np.concatenate(rows), pd.Series(np.concatenate(labels), name="horizon_bucket")
+
+
+def group_codes(values: Optional[pd.Series], n_rows: int):
+    """
+    Number the groups
+
+    :param values: the group of each row, or None for one overall group
+    :param n_rows: the number of rows
+    :return: the group number of each row, -1 where the group is missing, and the group keys
+    """
+    if values is None:
+        return np.zeros(n_rows, dtype=np.int64), pd.Index(["all"], name="group")
+
+    codes, keys = pd.factorize(values, sort=True)
+    return codes, pd.Index(keys, name=values.name)
+
+
+def grouped_metrics(results_df: pd.DataFrame, codes: np.ndarray, keys: pd.Index) -> pd.DataFrame:
+    """
+    Calculate MAE, normalized MAE, RMSE, bias and the SEM of the MAE, for every group at once
+
+    :param results_df: the prepared results, from prepare_results
+    :param codes: the group number of each result, from group_codes
+    :param keys: the group keys, from group_codes
+    :return: dataframe with one row per group
+    """
+    keep = codes >= 0
+    results_df, codes = results_df[keep], codes[keep]
+
+    n_groups = len(keys)
+    abs_error = results_df["abs_error"].to_numpy()
+
+    def group_sum(values: np.ndarray) -> np.ndarray:
+        return np.bincount(codes, weights=values, minlength=n_groups)
+
+    n = np.bincount(codes, minlength=n_groups).astype(float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mae = group_sum(abs_error) / n
+        mae_normalized = group_sum(results_df["normalized_abs_error"].to_numpy()) / n
+        rmse = np.sqrt(group_sum(results_df["squared_error"].to_numpy()) / n)
+        bias = group_sum(results_df["error"].to_numpy()) / n
+
+        # sample standard deviation of the absolute error, from the sums of squares
+        variance = (group_sum(abs_error**2) - n * mae**2) / (n - 1)
+        sem = np.sqrt(np.clip(variance, 0, None)) / np.sqrt(n)
+
+    metrics_df = pd.DataFrame(
+        {
+            "n": n.astype(int),
+            "mae": mae,
+            "mae_normalized": mae_normalized,
+            "rmse": rmse,
+            "bias": bias,
+            "sem": sem,
+        },
+        index=keys,
+    )
+
+    return metrics_df.reset_index()
+
+
+def bootstrap_mae_intervals(
+    abs_error: np.ndarray,
+    groupings: Dict[str, Tuple[Optional[np.ndarray], np.ndarray, int]],
+    n_bootstrap: int = 1000,
+    confidence: float = 0.95,
+    seed: int = 0,
+    max_batch_values: int = 10_000_000,
+) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Poisson bootstrap confidence intervals of the MAE, for every group of every grouping
+
+    Each result is weighted by a Poisson(1) count in each replicate. The same weights are used
+    for all the groupings, so the weights are only drawn once.
+
+    :param abs_error: the absolute error of each result
+    :param groupings: for each grouping, the rows it uses (None for all of them), the group
+        number of each of those rows (-1 to leave a row out) and the number of groups
+    :param n_bootstrap: the number of bootstrap replicates
+    :param confidence: the confidence level of the intervals
+    :param seed: the random seed
+    :param max_batch_values: the most weights to draw at once, this limits the memory used
+    :return: the lower and upper ends of the interval for each group, for each grouping
+    """
+    rng = np.random.default_rng(seed)
+    n_samples = len(abs_error)
+    batch_size = int(np.clip(max_batch_values // max(n_samples, 1), 1, n_bootstrap))
+
+    # the bincount bins for a batch of replicates, left out rows go in an extra group at the end
+    bins = {}
+    for name, (rows, codes, n_groups) in groupings.items():
+        n_bins = n_groups + 1
+        bins[name] = (np.arange(batch_size)[:, None] * n_bins + np.where(codes >= 0, codes, n_groups)).ravel()
+
+    replicate_maes = {name: [] for name in groupings}
+    for batch_start in range(0, n_bootstrap, batch_size):
+        n_replicates = min(batch_size, n_bootstrap - batch_start)
+        weights = rng.poisson(1.0, size=(n_replicates, n_samples)).astype(float)
+        weighted_abs_error = weights * abs_error
+
+        for name, (rows, codes, n_groups) in groupings.items():
+            if rows is not None:
+                group_weights, group_weighted_abs_error = weights[:, rows], weighted_abs_error[:, rows]
+            else:
+                group_weights, group_weighted_abs_error = weights, weighted_abs_error
+
+            # one bincount for all the replicates and groups
+            n_bins = n_groups + 1
+            batch_bins = bins[name][: n_replicates * len(codes)]
+            weighted_sums = np.bincount(
+                batch_bins, weights=group_weighted_abs_error.ravel(), minlength=n_replicates * n_bins
+            )
+            weight_sums = np.bincount(batch_bins, weights=group_weights.ravel(), minlength=n_replicates * n_bins)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                maes = (weighted_sums / weight_sums).reshape(n_replicates, n_bins)[:, :n_groups]
+            replicate_maes[name].append(maes)
+
+    alpha = (1 - confidence) / 2
+    intervals = {}
+    for name, maes in replicate_maes.items():
+        maes = np.concatenate(maes)
+        if maes.shape[1] == 0:
+            intervals[name] = (np.array([]), np.array([]))
+            continue
+        with np.errstate(all="ignore"), warnings.catch_warnings():
+            # groups with no results have no interval
+            warnings.simplefilter("ignore", RuntimeWarning)
+            lower, upper = np.nanquantile(maes, [alpha, 1 - alpha], axis=0)
+        intervals[name] = (lower, upper)
+
+    return intervals
+
+
+def compute_metrics(
+    results_df: pd.DataFrame,
+    pv_metadata: pd.DataFrame,
+    include_night: bool = False,
+    horizon_buckets: List[List[int]] = HORIZON_BUCKETS,
+    n_bootstrap: int = 1000,
+    confidence: float = 0.95,
+    seed: int = 0,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Calculate the metrics overall, and by horizon, horizon bucket, site, month and hour of day
+
+    results_df dataframe with the following columns
+    - timestamp
+    - pv_id
+    - horizon_hour
+    - forecast_power
+    - generation_power
+
+    pv_metadata is a dataframe with the following columns
+    - pv_id
+    - capacity
+
+    :param results_df: the forecast results
+    :param pv_metadata: the pv metadata
+    :param include_night: whether to include night time, when generation is 0.1 kw or less
+    :param horizon_buckets: list of [start, end] horizons [hours], the ends are inclusive
+    :param n_bootstrap: the number of bootstrap replicates for the MAE confidence intervals,
+        0 to skip them
+    :param confidence: the confidence level of the intervals
+    :param seed: the random seed for the bootstrap
+    :return: a tidy table of metrics for each grouping, keyed by the names in METRIC_GROUPS
+    """
+    results_df = prepare_results(results_df, pv_metadata, include_night=include_night)
+    bucket_rows, bucket_labels = horizon_bucket_rows(results_df["horizon_hour"].to_numpy(), horizon_buckets)
+
+    tables = {}
+    groupings = {}
+    for name, group in METRIC_GROUPS.items():
+        if name == "horizon_bucket":
+            rows, group_df = bucket_rows, results_df.iloc[bucket_rows]
+            codes, keys = group_codes(bucket_labels, len(bucket_rows))
+        else:
+            rows, group_df = None, results_df
+            codes, keys = group_codes(None if group is None else results_df[group], len(results_df))
+
+        tables[name] = grouped_metrics(group_df, codes, keys)
+        groupings[name] = (rows, codes, len(keys))
+
+    if n_bootstrap > 0:
+        intervals = bootstrap_mae_intervals(
+            results_df["abs_error"].to_numpy(), groupings, n_bootstrap, confidence, seed
+        )
+        for name, (lower, upper) in intervals.items():
+            tables[name]["mae_lower"] = lower
+            tables[name]["mae_upper"] = upper
+
+    return tables
+
+
+def save_metrics(tables: Dict[str, pd.DataFrame], output_dir: str = "metrics"):
+    """
+    Save the metrics tables as Parquet files, one per grouping
+
+    :param tables: the metrics tables, from compute_metrics
+    :param output_dir: the directory to save the files to
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    for name, table in tables.items():
+        table.to_parquet(f"{output_dir}/{name}.parquet", index=False)
+
 
 def metrics(results_df: pd.DataFrame, pv_metadata: pd.DataFrame, include_night: bool = False):
     """
@@ -19,62 +296,21 @@ def metrics(results_df: pd.DataFrame, pv_metadata: pd.DataFrame, include_night:
     - pv_id
     - capacity
 
+    :return: the metrics tables, see compute_metrics
     """
 
-    # remove night time
-    if not include_night:
-        results_df = results_df[results_df["generation_power"] > 0.1]
+    tables = compute_metrics(results_df, pv_metadata, include_night=include_night)
 
-    # merge pv_metadata with results_df
-    results_df = pd.merge(results_df, pv_metadata, on="pv_id")
+    overall = tables["overall"].iloc[0]
+    print(f"MAE: {np.round(overall['mae'], 4)} kw, normalized {np.round(overall['mae_normalized'], 4)} %")
 
-    mae = np.round((results_df["forecast_power"] - results_df["generation_power"]).abs().mean(), 4)
-    mae_normalized = np.round(
-        ((results_df["forecast_power"] - results_df["generation_power"]) / results_df["capacity"])
-        .abs()
-        .mean(),
-        4,
-    )
-    print(f"MAE: {mae} kw, normalized {mae_normalized} %")
-
-    # calculate metrics over the different horizons hours
-    # find all unique horizon_hours
-    horizon_hours = results_df["horizon_hour"].unique()
-    horizon_groups = [[x, x] for x in horizon_hours]
-    horizon_groups += [[3, 4], [5, 8], [9, 16], [17, 24], [24, 48], [0, 36]]
-
-    for horizon_group in horizon_groups:
-        horizon_group_df = results_df[
-            results_df["horizon_hour"].between(horizon_group[0], horizon_group[1])
-        ]
-        mae = np.round(
-            (horizon_group_df["forecast_power"] - horizon_group_df["generation_power"])
-            .abs()
-            .mean(),
-            3,
-        )
-        sem = np.round(
-            (
-                (horizon_group_df["forecast_power"] - horizon_group_df["generation_power"])
-                .abs()
-                .std()
-                / 50 ** 0.5
-            ),
-            3,
-        )
-
-        mae_normalized = np.round(
-            (
-                (horizon_group_df["forecast_power"] - horizon_group_df["generation_power"])
-                / horizon_group_df["capacity"]
+    # print metrics over the different horizons hours, and horizon buckets
+    for name in ["horizon", "horizon_bucket"]:
+        for _, row in tables[name].iterrows():
+            print(
+                f"MAE for horizon {row[METRIC_GROUPS[name]]}: {np.round(row['mae'], 3)} "
+                f"+- {np.round(1.96 * row['sem'], 3)}. "
+                f"mae_normalized: {np.round(100 * row['mae_normalized'], 3)} %"
             )
-            .abs()
-            .mean(),
-            3,
-        )
-
-        print(
-            f"MAE for horizon {horizon_group}: {mae} +- {1.96*sem}. mae_normalized: {100*mae_normalized} %"
-        )
 
-        # TODO add more metrics using ocf_ml_metrics
+    return tables
@@ -1,5 +1,4 @@
 """ Get nwp data from HF"""
-import os
 import sys
 import pandas as pd
 import numpy as np
@@ -9,52 +8,100 @@ import xarray as xr
 
 import multiprocessing
 
+from quartz_solar_forecast.eval.hf_manifest import ICONManifest
+from quartz_solar_forecast.eval.nwp_cache import NWP_CACHE_PATH, NWPCache, make_cache_key
+from quartz_solar_forecast.eval.nwp_mirror import open_icon_file, prune_mirror
 from quartz_solar_forecast.eval.utils import make_hf_filename
 
 multiprocessing.set_start_method("spawn", force=True)
 
 
-def get_nwp(time_locations: pd.DataFrame):
+# dataset variables, note these are unique for ICON
+VARIABLES = ["t_2m", "tot_prec", "clch", "clcm", "clcl", "u", "v", "aswdir_s", "aswdifd_s"]
+
+
+def get_nwp(time_locations: pd.DataFrame, cache_path: str = NWP_CACHE_PATH, check_hf_files: bool = True):
     """
     Get all the nwp data fpr the time locations
 
+    Data is read from the NWP cache where possible. The rest is pulled from Hugging Face, with
+    the time locations grouped by the ICON init file they need, so each file is only opened
+    once, for all the locations that need it. The new data is then added to the cache in one go.
+
     time_locations should have the following columns:
     - timestamp
     - latitude
     - longitude
     - pv_id
+
+    :param time_locations: the time locations
+    :param cache_path: the path of the NWP cache store
+    :param check_hf_files: whether to skip time locations whose ICON file is not on Hugging
+        Face, using the cached manifest of ICON files
+    :return: dataframe of nwp data for each time location
     """
 
-    all_nwp_dfs = []
+    time_locations = time_locations.copy().reset_index(drop=True)
+    time_locations["timestamp"] = pd.to_datetime(time_locations["timestamp"])
+    if "pv_id" not in time_locations.columns:
+        time_locations["pv_id"] = None
+
+    if check_hf_files:
+        exists = ICONManifest().exists(time_locations["timestamp"])
+        if not exists.all():
+            print(f"Skipping {(~exists).sum()} time locations because their ICON files do not exist")
+            time_locations = time_locations[exists].reset_index(drop=True)
+
+    # find the ICON init file for each time location
+    timestamp_floors = time_locations["timestamp"].dt.floor("6h")
+    hf_filenames = {
+        timestamp_floor: make_hf_filename(timestamp_floor) for timestamp_floor in timestamp_floors.unique()
+    }
+    time_locations["date_and_hour"] = timestamp_floors.map(lambda t: hf_filenames[t][0])
+    time_locations["huggingface_file"] = timestamp_floors.map(lambda t: hf_filenames[t][1])
+    time_locations["cache_key"] = [
+        make_cache_key(date_and_hour, latitude, longitude)
+        for date_and_hour, latitude, longitude in zip(
+            time_locations["date_and_hour"], time_locations["latitude"], time_locations["longitude"]
+        )
+    ]
+
+    cache = NWPCache(cache_path)
+    missing = time_locations[~time_locations["cache_key"].isin(cache.index.keys())]
+    missing = missing.drop_duplicates("cache_key")
+    print(f"{len(time_locations) - len(missing)} of {len(time_locations)} time locations are in the NWP cache")
 
+    # group the missing time locations by ICON init file
     tasks_args = []
-    with multiprocessing.Pool() as pool:
-        for i, row in time_locations.iterrows():
-            print(f"Making task {i} of {len(time_locations)}")
-
-            kwargs = {
-                "timestamp": row["timestamp"],
-                "latitude": row["latitude"],
-                "longitude": row["longitude"],
-                "pv_id": row["pv_id"],
-                "progress": np.round(i / len(time_locations), 3),
-            }
-
-            # collect together args for pool.starmap
-            task_arg = list(kwargs.values())
-            tasks_args.append(task_arg)
+    groups = missing.groupby("huggingface_file", sort=False)
+    for i, (huggingface_file, group) in enumerate(groups):
+        print(f"Making task {i} of {groups.ngroups}, for {len(group)} locations")
+
+        # collect together args for pool.starmap
+        tasks_args.append(
+            [huggingface_file, group["latitude"].tolist(), group["longitude"].tolist(), np.round(i / groups.ngroups, 3)]
+        )
 
+    if len(tasks_args) > 0:
         print("Made all NWP tasks, now getting the data")
-        results = pool.starmap(get_nwp_for_one_timestamp_one_location, tasks_args)
+        with multiprocessing.Pool() as pool:
+            results = pool.starmap(get_nwp_for_one_init_time, tasks_args)
 
-    print("Got all NWP data")
+        # add all the new data to the cache
+        keys = [key for _, group in groups for key in group["cache_key"]]
+        cache.append(keys, xr.concat(results, dim="record"))
 
-    for result in results:
-        one_nwp_df = result
+        # keep the local mirror of the ICON files within its size limit
+        prune_mirror()
 
-        all_nwp_dfs.append(one_nwp_df)
+    print("Got all NWP data")
 
-    all_nwp_df = pd.concat(all_nwp_dfs)
+    if len(time_locations) == 0:
+        print("There are no time locations with NWP data")
+        data = make_empty_icon_data()
+    else:
+        data = cache.read(time_locations["cache_key"].tolist())
+    all_nwp_df = make_nwp_df(data, time_locations)
 
     return all_nwp_df
 
@@ -75,65 +122,102 @@ def get_nwp_for_one_timestamp_one_location(
 
     :return: nwp forecast in xarray
     """
+    _, huggingface_file = make_hf_filename(pd.to_datetime(timestamp).floor("6h"))
+    data = get_nwp_for_one_init_time(huggingface_file, [latitude], [longitude], progress)
+
+    time_locations = pd.DataFrame(
+        [{"timestamp": pd.to_datetime(timestamp), "latitude": latitude, "longitude": longitude, "pv_id": pv_id}]
+    )
+    return make_nwp_df(data, time_locations)
+
+
+def get_nwp_for_one_init_time(
+    huggingface_file: str, latitudes: list, longitudes: list, progress: float = True
+) -> xr.Dataset:
+    """
+    Get NWP data from Hugging Face for many locations that use the same ICON init file
+
+    The file is opened once, and all the locations are selected from it with one pointwise
+    selection.
+
+    :param huggingface_file: the ICON init file, from make_hf_filename
+    :param latitudes: the latitude of each location
+    :param longitudes: the longitude of each location
+    :param progress: Float of how far through the process we are. This is becasue we use multiprocessing
+        to pull lots of NWP data. This should be a float between 0 and 1
+    :return: the ICON data with "record" and "step" dimensions, one record for each location
+    """
 
     # List which files are available. Not all dates, and model run times are available
     # fs = HfFileSystem()
     # print(fs.ls("datasets/openclimatefix/dwd-icon-eu/data/2022/4/11/", detail=False))
 
-    # Ensure timestamp is a pd.Timestamp object
-    if not isinstance(timestamp, pd.Timestamp):
-        timestamp = pd.to_datetime(timestamp)
+    print(f"Reading file {huggingface_file} from HF, for {len(latitudes)} locations")
+    sys.stdout.flush()
 
-    # round timestamp to 6 hours floor
-    timestamp_floor = timestamp.floor("6h")
-    date_and_hour, huggingface_file = make_hf_filename(timestamp_floor)
+    # the file is read through the local mirror, so the byte ranges read are kept for later runs
+    data = open_icon_file(huggingface_file)
 
-    # dataset variables, note these are unique for ICON
-    variables = ["t_2m", "tot_prec", "clch", "clcm", "clcl", "u", "v", "aswdir_s", "aswdifd_s"]
+    # take nearest location for all the locations at once, and only select the variables we want
+    data_at_locations = data[VARIABLES].sel(
+        latitude=xr.DataArray(latitudes, dims="record"),
+        longitude=xr.DataArray(longitudes, dims="record"),
+        method="nearest",
+    )
 
-    cache_dir = "data/nwp"
-    cache_file = f"{cache_dir}/{date_and_hour}_lat={latitude}_lon={longitude}.zarr"
-    if not os.path.exists(cache_file):
-        # use fsspec to copy file
-        print(f"Copying file {huggingface_file} from HF to local")
-        sys.stdout.flush()
+    # choice the first isobaricInhPa
+    data_at_locations = data_at_locations.isel(isobaricInhPa=-1)
 
-        data = xr.open_zarr(
-            f"{huggingface_file}",
-            chunks="auto",
-        )
+    #  reduce to 54 hours timestamps, this means there is at least a 48 hours forecast
+    data_at_locations = data_at_locations.isel(step=slice(0, 54))
 
-        # take nearest location and only select the variables we want
-        data_at_location = data.sel(latitude=latitude, longitude=longitude, method="nearest")
-        data_at_location = data_at_location[variables]
+    # only keep the init time of each record, as a coordinate along the records
+    init_time = data_at_locations.time.values
+    data_at_locations = data_at_locations.reset_coords(drop=True)
+    data_at_locations = data_at_locations.assign_coords(time=("record", np.repeat(init_time, len(latitudes))))
 
-        # choice the first isobaricInhPa
-        data_at_location = data_at_location.isel(isobaricInhPa=-1)
+    # load all the data, this can take about ~1 minute seconds
+    print(f"Loading dataset for {huggingface_file} and {len(latitudes)} locations")
+    data_at_locations.load()
 
-        #  reduce to 54 hours timestamps, this means there is at least a 48 hours forecast
-        data_at_location = data_at_location.isel(step=slice(0, 54))
+    if progress:
+        print(f"Got NWP from {huggingface_file} for {len(latitudes)} locations. Progress: {100*progress}%")
 
-        # load all the data, this can take about ~1 minute seconds
-        print(f"Loading dataset for {timestamp=} {longitude=} {latitude=}")
-        data_at_location.load()
+    return data_at_locations
 
-        # save to cache
-        print(f"Saving to cache {cache_file}")
-        data_at_location.to_zarr(cache_file)
-    else:
-        # load from cache
-        print("loading from cache")
-        data_at_location = xr.open_zarr(cache_file)
 
-    # make times from the init time + steps
-    times = pd.to_datetime(data_at_location.time.values) + pd.to_timedelta(
-        data_at_location.step.values, unit="h"
+def make_empty_icon_data() -> xr.Dataset:
+    """
+    ICON data with no records, so make_nwp_df gives an empty dataframe with the usual columns
+    """
+    return xr.Dataset(
+        {variable: (("record", "step"), np.empty((0, 0))) for variable in VARIABLES},
+        coords={
+            "time": ("record", np.empty(0, dtype="datetime64[ns]")),
+            "step": np.empty(0, dtype="timedelta64[ns]"),
+        },
     )
 
+
+def make_nwp_df(data: xr.Dataset, time_locations: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert ICON data at the time locations into the nwp dataframe the model uses
+
+    :param data: ICON data with "record" and "step" dimensions, one record for each time location
+    :param time_locations: dataframe with timestamp, latitude, longitude and pv_id columns
+    :return: dataframe of nwp data, with one row for each time location and step
+    """
+    n_steps = data.sizes["step"]
+
+    # make times from the init time + steps
+    init_times = pd.to_datetime(data.time.values).to_numpy()
+    steps = pd.to_timedelta(data.step.values, unit="h").to_numpy()
+    times = (init_times[:, None] + steps[None, :]).ravel()
+
     # convert to pandas dataframe
-    df = pd.DataFrame(times, columns=["time"])
-    for variable in variables:
-        df[variable] = data_at_location[variable].values
+    df = pd.DataFrame({"time": times})
+    for variable in VARIABLES:
+        df[variable] = data[variable].transpose("record", "step").values.ravel()
 
     # make wind speed out of u and v
     df["si10"] = (df["u"] ** 2 + df["v"] ** 2) ** 0.5
@@ -158,19 +242,12 @@ def get_nwp_for_one_timestamp_one_location(
     # drop u and v
     df = df.drop(columns=["u", "v"])
 
-    # rename id to pv_id
-    df = df.rename(columns={"id": "pv_id"})
-
     # add columns for timestamp, latitude and longitude
-    df["timestamp"] = timestamp
-    df["latitude"] = latitude
-    df["longitude"] = longitude
+    for column in ["timestamp", "latitude", "longitude"]:
+        df[column] = np.repeat(time_locations[column].to_numpy(), n_steps)
 
     # add pv_id columns if it is given
-    if pv_id is not None:
-        df["pv_id"] = pv_id
-
-    if progress:
-        print(f"Getting NWP for {timestamp} {pv_id}. Progress: {100*progress}%")
+    if "pv_id" in time_locations.columns and time_locations["pv_id"].notna().any():
+        df["pv_id"] = np.repeat(time_locations["pv_id"].to_numpy(), n_steps)
 
     return df
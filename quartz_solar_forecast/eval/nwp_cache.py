@@ -0,0 +1,107 @@
+"""
+A consolidated cache of ICON data at the eval sites
+
+All the cached data lives in one chunked, compressed zarr store, with a "record" dimension for
+each (init time, latitude, longitude) and a "step" dimension for the forecast steps. A small JSON
+index maps each key to its record, so a cache lookup is a dictionary lookup and a cache read is
+one slice of the store, rather than a zarr open per site and init time.
+
+New records are appended to the store first, and then the index is replaced atomically, so
+readers only ever see records that have been fully written. The store has a single writer, the
+eval process, which appends the data its workers have pulled from Hugging Face.
+"""
+import json
+import os
+from typing import Dict, List
+
+import numpy as np
+import xarray as xr
+
+NWP_CACHE_PATH = "data/nwp/icon.zarr"
+
+# the number of records in each chunk of the store
+RECORD_CHUNK_SIZE = 256
+
+
+def make_cache_key(date_and_hour: str, latitude: float, longitude: float) -> str:
+    return f"{date_and_hour}_lat={latitude}_lon={longitude}"
+
+
+class NWPCache:
+    """
+    ICON data at many locations and init times, in one zarr store with an index
+    """
+
+    def __init__(self, path: str = NWP_CACHE_PATH):
+        self.path = path
+        self.index_path = f"{path}.index.json"
+
+        self.index: Dict[str, int] = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def append(self, keys: List[str], data: xr.Dataset):
+        """
+        Add records to the cache
+
+        :param keys: the cache key for each record, see make_cache_key
+        :param data: ICON data with "record" and "step" dimensions, and a "time" coordinate with
+            the init time of each record
+        """
+        if len(keys) != data.sizes["record"]:
+            raise ValueError(f"Got {len(keys)} keys for {data.sizes['record']} records")
+        if len(keys) == 0:
+            return
+
+        # the encoding from the source file does not apply to the cache store
+        data = data.copy()
+        for variable in data.variables.values():
+            variable.encoding = {}
+
+        if os.path.exists(self.path):
+            n_records = xr.open_zarr(self.path).sizes["record"]
+            data.to_zarr(self.path, append_dim="record")
+        else:
+            n_records = 0
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            encoding = {
+                name: {"chunks": (RECORD_CHUNK_SIZE, data.sizes["step"])}
+                for name, variable in data.data_vars.items()
+                if variable.dims == ("record", "step")
+            }
+            # fixed units, so init times appended later are encoded the same way
+            encoding["time"] = {"units": "minutes since 1970-01-01", "dtype": "int64"}
+            data.to_zarr(self.path, mode="w", encoding=encoding)
+
+        index = dict(self.index)
+        index.update({key: n_records + i for i, key in enumerate(keys)})
+        self._write_index(index)
+        self.index = index
+
+    def read(self, keys: List[str]) -> xr.Dataset:
+        """
+        Read records from the cache
+
+        :param keys: the cache keys, which should all be in the cache
+        :return: ICON data with "record" and "step" dimensions, in the same order as the keys.
+            If there are no keys and nothing has been cached yet, an empty dataset
+        """
+        if len(keys) == 0 and not os.path.exists(self.path):
+            return xr.Dataset()
+
+        records = np.array([self.index[key] for key in keys], dtype=int)
+        return xr.open_zarr(self.path).isel(record=records).load()
+
+    def _write_index(self, index: Dict[str, int]):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
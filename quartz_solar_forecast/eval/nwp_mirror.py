@@ -0,0 +1,130 @@
+"""
+A local, block cached mirror of the ICON zarr.zip files on Hugging Face
+
+The eval pipeline only needs a few points from each ICON file, but zarr reads whole chunks,
+and the zip central directory, from the remote file. The mirror puts an fsspec block cache
+between the zip layer and Hugging Face, so every byte range that is read is kept on local disk
+and reused by later eval runs, even when they are for different sites.
+
+The cache is stored as sparse files, one per remote file, so only the ranges that have been read
+use disk space. When the mirror grows past its size limit, the least recently written files are
+removed. fsspec checks that a cached file exists before using it, so a removed file is simply
+read from Hugging Face again.
+"""
+import os
+from typing import List, Optional, Tuple
+
+import xarray as xr
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class NWPMirrorSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_file='.env', extra='ignore')
+
+    cache_dir: Optional[str] = Field(alias="NWP_MIRROR_DIR", default="data/nwp/mirror")
+    max_size_gb: float = Field(alias="NWP_MIRROR_MAX_GB", default=20.0)
+
+
+def mirror_url(huggingface_file: str) -> str:
+    """
+    Put a block cache under the zip layer of a Hugging Face file url
+
+    'zip:///::hf://datasets/openclimatefix/dwd-icon-eu/data/2021/1/1/20210101_00.zarr.zip' ->
+    'zip:///::blockcache::hf://datasets/openclimatefix/dwd-icon-eu/data/2021/1/1/20210101_00.zarr.zip'
+    """
+    return huggingface_file.replace("::hf://", "::blockcache::hf://", 1)
+
+
+def open_icon_file(huggingface_file: str, settings: Optional[NWPMirrorSettings] = None) -> xr.Dataset:
+    """
+    Open an ICON file from Hugging Face, through the local mirror
+
+    :param huggingface_file: the ICON file, from make_hf_filename
+    :param settings: the mirror settings, by default these are read from the environment.
+        If the cache directory is empty, the file is read from Hugging Face directly
+    :return: the lazily loaded ICON data
+    """
+    if settings is None:
+        settings = NWPMirrorSettings()
+
+    if not settings.cache_dir:
+        return xr.open_zarr(huggingface_file, chunks="auto")
+
+    return xr.open_zarr(
+        mirror_url(huggingface_file),
+        chunks="auto",
+        storage_options={
+            "blockcache": {
+                "cache_storage": settings.cache_dir,
+                # the ICON files on Hugging Face do not change, so never re-check them
+                "check_files": False,
+                "expiry_time": False,
+            }
+        },
+    )
+
+
+# the file fsspec keeps its cache metadata in, in the cache directory
+CACHE_METADATA_FILE = "cache"
+
+
+def mirror_files(cache_dir: str) -> List[Tuple[float, int, str]]:
+    """
+    List the cached files in the mirror, from the files on disk
+
+    :param cache_dir: the mirror cache directory
+    :return: the modification time, disk usage [bytes] and path of each cached file
+    """
+    if not os.path.isdir(cache_dir):
+        return []
+
+    files = []
+    for entry in os.scandir(cache_dir):
+        if entry.is_file() and entry.name != CACHE_METADATA_FILE:
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_blocks * 512, entry.path))
+    return files
+
+
+def mirror_disk_usage(cache_dir: str) -> int:
+    """
+    Get the disk space used by the mirror, counting only the blocks of the sparse files on disk
+
+    :param cache_dir: the mirror cache directory
+    :return: the disk usage [bytes]
+    """
+    return sum(size for _, size, _ in mirror_files(cache_dir))
+
+
+def prune_mirror(settings: Optional[NWPMirrorSettings] = None) -> int:
+    """
+    Remove the least recently written files from the mirror, until it is within its size limit
+
+    This should not be run while ICON files are being read through the mirror.
+
+    :param settings: the mirror settings, by default these are read from the environment
+    :return: the number of files removed
+    """
+    if settings is None:
+        settings = NWPMirrorSettings()
+
+    if not settings.cache_dir or not os.path.isdir(settings.cache_dir):
+        return 0
+
+    max_bytes = settings.max_size_gb * 1e9
+    usage = mirror_disk_usage(settings.cache_dir)
+    if usage <= max_bytes:
+        return 0
+
+    n_removed = 0
+    for _, size, path in sorted(mirror_files(settings.cache_dir)):
+        if usage <= max_bytes:
+            break
+        os.remove(path)
+        usage -= size
+        n_removed += 1
+
+    print(f"Removed {n_removed} files from the NWP mirror, it now uses {usage / 1e9:.1f} GB")
+
+    return n_removed
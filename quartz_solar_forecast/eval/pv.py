@@ -1,26 +1,33 @@
 import os
+from typing import Callable
 
 import pandas as pd
 import numpy as np
 import xarray as xr
 from huggingface_hub import HfFileSystem
 
+from quartz_solar_forecast.eval.pv_store import PV_STORE_DIR, read_pv_generation, read_pv_metadata, store_exists
+
 fs = HfFileSystem()
 
 def get_pv_metadata(testset: pd.DataFrame):
 
-    # download from hugginface or load from cache
-    cache_dir = "data/pv"
-    metadata_file = f"{cache_dir}/metadata.csv"
-    if not os.path.exists(metadata_file):
-        os.makedirs(cache_dir, exist_ok=True)
-        fs.get("datasets/openclimatefix/uk_pv/metadata.csv", metadata_file)
-
-    # Load in the dataset
-    metadata_df = pd.read_csv(metadata_file)
+    if store_exists():
+        # only read the sites we need from the preprocessed store
+        metadata_df = read_pv_metadata(testset["pv_id"].unique())
+    else:
+        # download from hugginface or load from cache
+        cache_dir = "data/pv"
+        metadata_file = f"{cache_dir}/metadata.csv"
+        if not os.path.exists(metadata_file):
+            os.makedirs(cache_dir, exist_ok=True)
+            fs.get("datasets/openclimatefix/uk_pv/metadata.csv", metadata_file)
+
+        # Load in the dataset
+        metadata_df = pd.read_csv(metadata_file)
+        metadata_df = metadata_df.rename(columns={"ss_id": "pv_id"})
 
     # join metadata with testset
-    metadata_df = metadata_df.rename(columns={"ss_id": "pv_id"})
     combined_data = testset.merge(metadata_df, on="pv_id", how="left")
 
     # only keep the columns we need
@@ -47,6 +54,10 @@ def get_pv_truth(testset: pd.DataFrame):
 
     print('Loading PV data')
 
+    if store_exists():
+        # read only the sites and time windows we need from the preprocessed store
+        return extract_pv_truth_from_store(testset)
+
     # download from hugginface or load from cache
     cache_dir = "data/pv"
     metadata_file = f"{cache_dir}/pv.netcdf"
@@ -58,29 +69,102 @@ def get_pv_truth(testset: pd.DataFrame):
     # Load in the dataset
     pv_ds = xr.open_dataset(metadata_file, engine="h5netcdf")
 
+    return extract_pv_truth(pv_ds, testset)
+
+
+def extract_pv_truth(pv_ds: xr.Dataset, testset: pd.DataFrame, max_horizon_hour: int = 48) -> pd.DataFrame:
+    """
+    Extract the ground truth for every testset row and horizon
+
+    For each site, all the required timestamps are looked up in the datetime index at once, and
+    the values are read with one indexing operation.
+
+    :param pv_ds: the uk_pv dataset, with one variable [W] per pv_id and a datetime dimension
+    :param testset: dataframe with pv_id and timestamp columns
+    :param max_horizon_hour: the maximum horizon, in hours
+    :return: dataframe with pv_id, timestamp, value [kW] and horizon_hour columns. The value
+        is NaN where there is no data
+    """
+    datetime_index = pv_ds.indexes["datetime"]
+
+    def read_site_values(pv_id: str, datetimes: np.ndarray) -> np.ndarray:
+        values = np.full(len(datetimes), np.nan)
+        if pv_id in pv_ds.data_vars:
+            positions = datetime_index.get_indexer(datetimes)
+            found = positions >= 0
+            if found.any():
+                # read each position once and in order, which netcdf backends need
+                unique_positions, inverse = np.unique(positions[found], return_inverse=True)
+                unique_values = pv_ds[pv_id].isel(datetime=unique_positions).values
+                values[found] = unique_values[inverse] / 1000  # to convert from w to kw
+        return values
+
+    return extract_truth_by_site(read_site_values, testset, max_horizon_hour=max_horizon_hour)
+
+
+def extract_truth_by_site(
+    read_site_values: Callable[[str, np.ndarray], np.ndarray], testset: pd.DataFrame, max_horizon_hour: int = 48
+) -> pd.DataFrame:
+    """
+    Extract the ground truth for every testset row and horizon, one site at a time
+
+    :param read_site_values: function of the pv_id and the datetimes needed, which returns the
+        value [kW] at each datetime, NaN where there is no data
+    :param testset: dataframe with pv_id and timestamp columns
+    :param max_horizon_hour: the maximum horizon, in hours
+    :return: dataframe with pv_id, timestamp, value [kW] and horizon_hour columns
+    """
+    horizons = np.arange(0, max_horizon_hour + 1)  # 48 hours in steps of 1 hour
+
     combined_data = []
-    for index, row in testset.iterrows():
-        print(f'Processing {index} of {len(testset)}')
-        pv_id = str(row["pv_id"])
-        base_datetime = pd.to_datetime(row["timestamp"])
-
-        # Calculate future timestamps up to the max horizon
-        for i in range(0, 49):  # 48 hours in steps of 1 hour
-            future_datetime = base_datetime + pd.DateOffset(hours=i)
-            horizon = i  # horizon in hours
-
-            try:
-                # Attempt to select data for the future datetime
-                selected_data = pv_ds[pv_id].sel(datetime=future_datetime)
-                value = selected_data.values.item()
-                value = value / 1000 # to convert from w to kw
-            except KeyError:
-                # If data is not found for the future datetime, set value as NaN
-                value = np.nan
-
-            # Add the data to the DataFrame
-            combined_data.append(pd.DataFrame(
-                {"pv_id": pv_id, "timestamp": future_datetime, "value": value, "horizon_hour": horizon}, index=[i])
+    for pv_id, site_testset in testset.groupby("pv_id", sort=False):
+        pv_id = str(pv_id)
+        print(f"Processing {len(site_testset)} timestamps for pv_id {pv_id}")
+
+        # Calculate future timestamps up to the max horizon, for all the timestamps at once
+        base_datetimes = pd.to_datetime(site_testset["timestamp"]).to_numpy(dtype="datetime64[ns]")
+        future_datetimes = (base_datetimes[:, np.newaxis] + horizons * np.timedelta64(1, "h")).ravel()
+
+        # If data is not found for the future datetime, the value is NaN
+        values = read_site_values(pv_id, future_datetimes)
+
+        combined_data.append(
+            pd.DataFrame(
+                {
+                    "pv_id": pv_id,
+                    "timestamp": future_datetimes,
+                    "value": values,
+                    "horizon_hour": np.tile(horizons, len(base_datetimes)),
+                }
             )
-    combined_data = pd.concat(combined_data)
+        )
+
+    combined_data = pd.concat(combined_data, ignore_index=True)
     return combined_data
+
+
+def extract_pv_truth_from_store(
+    testset: pd.DataFrame, store_dir: str = PV_STORE_DIR, max_horizon_hour: int = 48
+) -> pd.DataFrame:
+    """
+    Extract the ground truth for every testset row and horizon, from the store
+
+    Only the time window each site needs is read. A site that is not in the store raises a
+    FileNotFoundError, rather than giving NaN truth.
+
+    :param testset: dataframe with pv_id and timestamp columns
+    :param store_dir: the directory of the store
+    :param max_horizon_hour: the maximum horizon, in hours
+    :return: dataframe with pv_id, timestamp, value [kW] and horizon_hour columns, see extract_pv_truth
+    """
+
+    def read_site_values(pv_id: str, datetimes: np.ndarray) -> np.ndarray:
+        values = np.full(len(datetimes), np.nan)
+        generation_df = read_pv_generation(pv_id, datetimes.min(), datetimes.max(), store_dir)
+        if len(generation_df) > 0:
+            positions = pd.DatetimeIndex(generation_df["datetime"]).get_indexer(datetimes)
+            found = positions >= 0
+            values[found] = generation_df["power_w"].to_numpy()[positions[found]] / 1000  # w to kw
+        return values
+
+    return extract_truth_by_site(read_site_values, testset, max_horizon_hour=max_horizon_hour)
@@ -0,0 +1,145 @@
+"""
+A preprocessed store of the uk_pv dataset, partitioned by site
+
+Opening the full uk_pv pv.netcdf dominates the start of every evaluation, but each evaluation
+only needs a few days of data for a few sites. `convert_uk_pv` converts the netcdf, once, into
+one Parquet file per site, sorted by time and split into row groups, plus a metadata table
+sorted by pv_id. Reads then only touch the files of the sites needed, and the row group
+statistics let Parquet skip everything outside the time window.
+
+The metadata table is only written once every site has been converted, and marks the store
+as complete. Until then the evaluation reads the netcdf.
+
+    data/pv/store/metadata.parquet
+    data/pv/store/generation/pv_id=8215.parquet
+"""
+import os
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+PV_STORE_DIR = "data/pv/store"
+
+# 30 days of 5 minute data
+ROW_GROUP_SIZE = 8640
+
+
+def metadata_path(store_dir: str = PV_STORE_DIR) -> str:
+    return f"{store_dir}/metadata.parquet"
+
+
+def generation_path(pv_id, store_dir: str = PV_STORE_DIR) -> str:
+    return f"{store_dir}/generation/pv_id={pv_id}.parquet"
+
+
+def store_exists(store_dir: str = PV_STORE_DIR) -> bool:
+    return os.path.exists(metadata_path(store_dir))
+
+
+def _write_parquet(df: pd.DataFrame, path: str, **kwargs):
+    tmp_path = f"{path}.tmp"
+    df.to_parquet(tmp_path, index=False, **kwargs)
+    os.replace(tmp_path, path)
+
+
+def convert_uk_pv(
+    netcdf_path: str = "data/pv/pv.netcdf",
+    metadata_csv_path: str = "data/pv/metadata.csv",
+    store_dir: str = PV_STORE_DIR,
+    pv_ids: Optional[List[str]] = None,
+):
+    """
+    Convert the uk_pv netcdf and metadata csv into the store
+
+    :param netcdf_path: the uk_pv pv.netcdf file
+    :param metadata_csv_path: the uk_pv metadata.csv file
+    :param store_dir: the directory of the store
+    :param pv_ids: optional list of sites to convert, by default all of them. The store is only
+        used once all of them have been converted
+    """
+    pv_ds = xr.open_dataset(netcdf_path, engine="h5netcdf")
+    metadata_df = pd.read_csv(metadata_csv_path)
+
+    write_pv_store(pv_ds, metadata_df, store_dir, pv_ids=pv_ids)
+
+
+def write_pv_store(
+    pv_ds: xr.Dataset, metadata_df: pd.DataFrame, store_dir: str = PV_STORE_DIR, pv_ids: Optional[List[str]] = None
+):
+    """
+    Write the uk_pv data into the store
+
+    Sites that have already been written are skipped, so a conversion that stops part way
+    can be restarted. The metadata table is written last, and marks the store as complete, so
+    it is only written when every site has been converted, not for a subset of pv_ids.
+
+    :param pv_ds: the uk_pv dataset, with one variable [W] per pv_id and a datetime dimension
+    :param metadata_df: the uk_pv metadata, with an ss_id column
+    :param store_dir: the directory of the store
+    :param pv_ids: optional list of sites to write, by default all of them
+    """
+    os.makedirs(f"{store_dir}/generation", exist_ok=True)
+
+    datetimes = pv_ds.indexes["datetime"].to_numpy(dtype="datetime64[ns]")
+    order = np.argsort(datetimes, kind="stable")
+
+    all_pv_ids = list(pv_ds.data_vars)
+    pv_ids = all_pv_ids if pv_ids is None else [str(pv_id) for pv_id in pv_ids]
+    for i, pv_id in enumerate(pv_ids):
+        path = generation_path(pv_id, store_dir)
+        if os.path.exists(path):
+            continue
+
+        print(f"Converting pv_id {pv_id}, {i + 1} of {len(pv_ids)}")
+        values = pv_ds[pv_id].values[order]
+        has_data = ~np.isnan(values)
+
+        generation_df = pd.DataFrame({"datetime": datetimes[order][has_data], "power_w": values[has_data]})
+        _write_parquet(generation_df, path, row_group_size=ROW_GROUP_SIZE)
+
+    missing_pv_ids = [pv_id for pv_id in all_pv_ids if not os.path.exists(generation_path(pv_id, store_dir))]
+    if missing_pv_ids:
+        print(
+            f"{len(missing_pv_ids)} sites are not converted yet, "
+            "the store will be used once they are all converted"
+        )
+        return
+
+    metadata_df = metadata_df.rename(columns={"ss_id": "pv_id"})
+    metadata_df = metadata_df.sort_values("pv_id").reset_index(drop=True)
+    _write_parquet(metadata_df, metadata_path(store_dir), row_group_size=1024)
+
+
+def read_pv_metadata(pv_ids: List[int], store_dir: str = PV_STORE_DIR) -> pd.DataFrame:
+    """
+    Read the metadata of some sites
+
+    :param pv_ids: the sites
+    :param store_dir: the directory of the store
+    :return: the metadata, with a pv_id column, in the same format as the uk_pv metadata.csv
+    """
+    return pd.read_parquet(metadata_path(store_dir), filters=[("pv_id", "in", [int(pv_id) for pv_id in pv_ids])])
+
+
+def read_pv_generation(
+    pv_id, start: pd.Timestamp, end: pd.Timestamp, store_dir: str = PV_STORE_DIR
+) -> pd.DataFrame:
+    """
+    Read the generation of one site, in a time window
+
+    :param pv_id: the site
+    :param start: the start of the window (inclusive)
+    :param end: the end of the window (inclusive)
+    :param store_dir: the directory of the store
+    :return: dataframe with datetime and power_w columns, empty if there is no data in the window
+    """
+    path = generation_path(pv_id, store_dir)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"pv_id {pv_id} is not in the pv store {store_dir}")
+
+    return pd.read_parquet(
+        path, filters=[("datetime", ">=", pd.Timestamp(start)), ("datetime", "<=", pd.Timestamp(end))]
+    )
+
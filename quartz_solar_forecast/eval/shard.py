@@ -0,0 +1,98 @@
+"""
+Split the evaluation across machines
+
+The testset is split into shards by a stable hash of each row's pv_id and timestamp, so every
+machine gets the same split for the same shard count. Each shard saves its results, and its
+pv metadata, and the merge step combines all the shards in a deterministic order.
+"""
+import glob
+import os
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+EVAL_SHARD_DIR = "results/shards"
+
+
+def shard_testset(testset: pd.DataFrame, shard_index: int, shard_count: int) -> pd.DataFrame:
+    """
+    Select one shard of the testset
+
+    :param testset: dataframe with pv_id and timestamp columns
+    :param shard_index: which shard to select, from 0 to shard_count - 1
+    :param shard_count: the number of shards
+    :return: the rows of the testset in this shard
+    """
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"shard_index must be between 0 and {shard_count - 1}, got {shard_index}")
+
+    if shard_count == 1:
+        return testset
+
+    # hash the values as strings, so the split does not depend on how the csv was parsed
+    keys = pd.DataFrame(
+        {
+            "pv_id": testset["pv_id"].astype(str),
+            "timestamp": pd.to_datetime(testset["timestamp"]).dt.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+    )
+    hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+    return testset[hashes % np.uint64(shard_count) == shard_index]
+
+
+def shard_path(shard_dir: str, shard_index: int, shard_count: int, name: str) -> str:
+    return f"{shard_dir}/{name}-{shard_index:04d}-of-{shard_count:04d}.parquet"
+
+
+def save_shard(
+    shard_dir: str, shard_index: int, shard_count: int, results_df: pd.DataFrame, pv_metadata: pd.DataFrame
+):
+    """
+    Save the results and pv metadata of one shard
+
+    :param shard_dir: the directory for the shard files
+    :param shard_index: the shard
+    :param shard_count: the number of shards
+    :param results_df: the combined forecast and ground truth for the shard
+    :param pv_metadata: the pv metadata for the shard
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    for name, df in [("results", results_df), ("pv_metadata", pv_metadata)]:
+        path = shard_path(shard_dir, shard_index, shard_count, name)
+        df.to_parquet(f"{path}.tmp", index=False)
+        os.replace(f"{path}.tmp", path)
+
+
+def merge_shards(shard_dir: str, shard_count: int) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Combine the results and pv metadata of all the shards
+
+    :param shard_dir: the directory of the shard files
+    :param shard_count: the number of shards
+    :return: the results and pv metadata of all the shards, sorted by pv_id and timestamp
+    """
+    missing = [
+        shard_index
+        for shard_index in range(shard_count)
+        for name in ["results", "pv_metadata"]
+        if not os.path.exists(shard_path(shard_dir, shard_index, shard_count, name))
+    ]
+    if missing:
+        found = sorted(glob.glob(f"{shard_dir}/results-*-of-{shard_count:04d}.parquet"))
+        raise ValueError(
+            f"Shards {sorted(set(missing))} of {shard_count} are missing from {shard_dir}, found {found}"
+        )
+
+    merged = []
+    for name, sort_columns in [
+        ("results", ["pv_id", "timestamp", "horizon_hour"]),
+        ("pv_metadata", ["pv_id", "timestamp"]),
+    ]:
+        df = pd.concat(
+            [pd.read_parquet(shard_path(shard_dir, i, shard_count, name)) for i in range(shard_count)]
+        )
+        merged.append(df.sort_values(sort_columns, kind="stable").reset_index(drop=True))
+
+    return merged[0], merged[1]
@@ -7,14 +7,19 @@ This contains 50 sites each with 50 timestamps to make 2500 samples in total.
 """
 
 import os
+from concurrent.futures import Executor
+from typing import Optional
 
+import numpy as np
 import pandas as pd
 from huggingface_hub.hf_api import HfFolder
 
-from quartz_solar_forecast.eval.forecast import run_forecast
-from quartz_solar_forecast.eval.metrics import metrics
+from quartz_solar_forecast.eval.checkpoint import EVAL_CHECKPOINT_DIR, CheckpointStore, hash_inputs
+from quartz_solar_forecast.eval.forecast import make_forecast_pool, run_forecast
+from quartz_solar_forecast.eval.metrics import metrics, save_metrics
 from quartz_solar_forecast.eval.nwp import get_nwp
 from quartz_solar_forecast.eval.pv import get_pv_metadata, get_pv_truth
+from quartz_solar_forecast.eval.shard import EVAL_SHARD_DIR, merge_shards, save_shard, shard_testset
 from quartz_solar_forecast.eval.utils import combine_forecast_ground_truth
 
 from dotenv import load_dotenv
@@ -33,32 +38,150 @@ except:
     )
 
 
-def run_eval(testset_path: str = "dataset/testset.csv"):
-
-    # load testset from csv
+def run_forecast_chunks(
+    store: CheckpointStore,
+    pv_metadata: pd.DataFrame,
+    nwp_df: pd.DataFrame,
+    nwp_key: str,
+    chunk_size: int = 100,
+    pool: Optional[Executor] = None,
+) -> pd.DataFrame:
+    """
+    Run the forecasts a chunk of the testset at a time, saving each chunk as it is done
+
+    Chunks which have already been saved are skipped, so an interrupted run carries on from the
+    last saved chunk. The nwp data of the whole testset is held in memory, and the forecasts of
+    all the chunks are loaded back and returned together.
+
+    :param store: the checkpoint store
+    :param pv_metadata: the pv metadata for each testset row
+    :param nwp_df: the nwp data for each testset row
+    :param nwp_key: the hash of the inputs of the nwp stage
+    :param chunk_size: the number of testset rows in each chunk
+    :param pool: a pool from make_forecast_pool to run every chunk in, so the workers load the
+        model once for the whole run. If None, each chunk starts its own pool
+    :return: the forecasts for all the chunks
+    """
+    nwp_rows = nwp_df.groupby(["pv_id", "timestamp"]).indices
+
+    chunk_keys = []
+    for start in range(0, len(pv_metadata), chunk_size):
+        pv_chunk = pv_metadata.iloc[start : start + chunk_size]
+        chunk_key = hash_inputs(pv_chunk, nwp_key)
+        chunk_keys.append(chunk_key)
+
+        if store.exists("forecast", chunk_key):
+            print(f"Forecasts for rows {start} to {start + len(pv_chunk)} are already done")
+            continue
+
+        rows = [
+            nwp_rows.get((pv_id, timestamp), [])
+            for pv_id, timestamp in zip(pv_chunk["pv_id"], pv_chunk["timestamp"])
+        ]
+        nwp_chunk = nwp_df.iloc[np.concatenate(rows).astype(int)]
+
+        # there is no nwp data where the ICON file does not exist, so those rows are skipped
+        has_nwp = np.array([len(row) > 0 for row in rows], dtype=bool)
+        if not has_nwp.all():
+            print(f"Skipping {(~has_nwp).sum()} rows with no NWP data")
+            if not has_nwp.any():
+                chunk_keys.pop()
+                continue
+
+        print(f"Running forecasts for rows {start} to {start + len(pv_chunk)} of {len(pv_metadata)}")
+        pv_chunk = pv_chunk[has_nwp]
+        store.save("forecast", chunk_key, run_forecast(pv_df=pv_chunk, nwp_df=nwp_chunk, pool=pool))
+
+    return pd.concat([store.load("forecast", chunk_key) for chunk_key in chunk_keys])
+
+
+def run_eval(
+    testset_path: str = "dataset/testset.csv",
+    checkpoint_dir: str = EVAL_CHECKPOINT_DIR,
+    forecast_chunk_size: int = 100,
+    shard_index: int = 0,
+    shard_count: int = 1,
+    shard_dir: str = EVAL_SHARD_DIR,
+):
+    """
+    Run the evaluation
+
+    The output of each stage is checkpointed in checkpoint_dir, keyed by a hash of its inputs,
+    so a re-run skips the stages, and chunks of forecasts, that have already been done.
+
+    The evaluation can be split across machines, by running each shard of the testset
+    separately. Each shard saves its results in shard_dir, and merge_eval then combines them
+    and calculates the metrics.
+
+    :param testset_path: the testset csv, with pv_id and timestamp columns
+    :param checkpoint_dir: the directory for the stage checkpoints
+    :param forecast_chunk_size: the number of testset rows to forecast, and save, at a time
+    :param shard_index: which shard of the testset to run, from 0 to shard_count - 1
+    :param shard_count: the number of shards, 1 runs the whole testset
+    :param shard_dir: the directory for the shard results
+    """
+
+    # load testset from csv, and select this shard
     testset = pd.read_csv(testset_path)
+    testset = shard_testset(testset, shard_index, shard_count)
+
+    store = CheckpointStore(checkpoint_dir)
+    testset_key = hash_inputs(testset)
 
     # Extract generation data and metadata for specific sites and timestamps for the testset from Hugging Face. (Zak)
-    pv_metadata = get_pv_metadata(testset)
+    pv_metadata = store.load_or_compute("pv_metadata", testset_key, lambda: get_pv_metadata(testset))
 
     # Split data into PV inputs and ground truth. (Zak)
-    ground_truth_df = get_pv_truth(testset)
+    ground_truth_df = store.load_or_compute("pv_truth", testset_key, lambda: get_pv_truth(testset))
 
     # Collect NWP data from Hugging Face, ICON. (Peter)
-    nwp_df = get_nwp(pv_metadata)
+    nwp_key = hash_inputs(pv_metadata[["pv_id", "timestamp", "latitude", "longitude"]])
+    nwp_df = store.load_or_compute("nwp", nwp_key, lambda: get_nwp(pv_metadata))
 
-    # Run forecast with PV and NWP inputs.
-    predictions_df = run_forecast(pv_df=pv_metadata, nwp_df=nwp_df)
+    # Run forecast with PV and NWP inputs, in chunks which are saved as they are done. The
+    # workers are only started when the first chunk is submitted, so if every chunk is already
+    # saved the model is not loaded
+    with make_forecast_pool() as pool:
+        predictions_df = run_forecast_chunks(store, pv_metadata, nwp_df, nwp_key, forecast_chunk_size, pool)
 
     # Combine the forecast results with the ground truth (ts, id, horizon (in hours), pred, truth, diff)
     results_df = combine_forecast_ground_truth(predictions_df, ground_truth_df)
 
+    if shard_count > 1:
+        # the metrics are calculated over all the shards, by merge_eval
+        save_shard(shard_dir, shard_index, shard_count, results_df, pv_metadata)
+        print(f"Saved results for shard {shard_index} of {shard_count} to {shard_dir}")
+        return
+
+    report_results(results_df, pv_metadata)
+
+
+def merge_eval(shard_count: int, shard_dir: str = EVAL_SHARD_DIR):
+    """
+    Combine the results of all the shards of an evaluation, and calculate the metrics
+
+    :param shard_count: the number of shards the evaluation was run with
+    :param shard_dir: the directory of the shard results
+    """
+    results_df, pv_metadata = merge_shards(shard_dir, shard_count)
+
+    report_results(results_df, pv_metadata)
+
+
+def report_results(results_df: pd.DataFrame, pv_metadata: pd.DataFrame):
+    """
+    Save the results, and calculate, print and save the metrics
+
+    :param results_df: the combined forecast and ground truth
+    :param pv_metadata: the pv metadata
+    """
     # Save file
     results_df.to_csv("results.csv")
 
     # Calculate and print metrics: MAE
-    metrics(results_df, pv_metadata, include_night=True)
-    metrics(results_df, pv_metadata, include_night=False)
+    # and save the tables of metrics by horizon, site, month and hour of day
+    save_metrics(metrics(results_df, pv_metadata, include_night=True), "metrics/include_night")
+    save_metrics(metrics(results_df, pv_metadata, include_night=False), "metrics/exclude_night")
 
     # Visualizations
     # TODO
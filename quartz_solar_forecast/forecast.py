@@ -1,16 +1,27 @@
 from datetime import datetime, timedelta
 import logging
+from typing import Dict, List, Optional
 
+import numpy as np
 import pandas as pd
+import xarray as xr
 
 from quartz_solar_forecast.data import get_nwp, make_pv_data
 from quartz_solar_forecast.forecasts import forecast_v1_tilt_orientation, TryolabsSolarPowerPredictor
 from quartz_solar_forecast.pydantic_models import PVSite
+from quartz_solar_forecast.utils.precision import float_dtype
+from quartz_solar_forecast.weather.fetch import get_forecast_weather
+from quartz_solar_forecast.weather.serving import nwp_age_seconds
 
 log = logging.getLogger(__name__)
 
 def predict_ocf(
-    site: PVSite, model=None, ts: datetime | str = None, nwp_source: str = "icon"
+    site: PVSite,
+    model=None,
+    ts: datetime | str = None,
+    nwp_source: str = "icon",
+    nwp_xr: Optional[xr.Dataset] = None,
+    dtype: Optional[np.dtype] = None,
 ):
     """
     Run the forecast with the gb model, which can take tilt and orientation as inputs
@@ -19,8 +30,13 @@ def predict_ocf(
     :param model: the model to use for prediction
     :param ts: the timestamp of the site. If None, defaults to the current timestamp rounded down to 15 minutes.
     :param nwp_source: the nwp data source. Either "gfs", "icon" or "ukmo". Defaults to "icon" 
+    :param nwp_xr: optional nwp data from get_nwp, e.g. to reuse it for several timestamps on the
+        same date. If None, the nwp data is fetched for ts
+    :param dtype: the dtype of the data and the forecast, by default from float_dtype
     :return: The PV forecast of the site for time (ts) for 48 hours
     """
+    dtype = float_dtype(dtype)
+
     if ts is None:
         ts = pd.Timestamp.now().round("15min")
 
@@ -38,8 +54,9 @@ def predict_ocf(
         capacity_kwp_original = site.capacity_kwp
 
     # make pv and nwp data from nwp_source
-    nwp_xr = get_nwp(site=site, ts=ts, nwp_source=nwp_source)
-    pv_xr = make_pv_data(site=site, ts=ts)
+    if nwp_xr is None:
+        nwp_xr = get_nwp(site=site, ts=ts, nwp_source=nwp_source, dtype=dtype)
+    pv_xr = make_pv_data(site=site, ts=ts, dtype=dtype)
 
     # load and run models
     pred_df = forecast_v1_tilt_orientation(nwp_source, nwp_xr, pv_xr, ts, model=model)
@@ -48,16 +65,26 @@ def predict_ocf(
     if capacity_kwp_original != site.capacity_kwp:
         pred_df["power_kw"] = pred_df["power_kw"] * capacity_kwp_original / site.capacity_kwp
 
+    pred_df["power_kw"] = pred_df["power_kw"].astype(dtype)
+    # the age of the nwp data, if it is known, e.g. when it may have been served from the cache
+    pred_df.attrs["nwp_age_seconds"] = nwp_age_seconds(nwp_xr)
+
     return pred_df
 
 
 def predict_tryolabs(
-    site: PVSite, ts: datetime | str = None):
+    site: PVSite,
+    ts: datetime | str = None,
+    weather_data: Optional[pd.DataFrame] = None,
+    dtype: Optional[np.dtype] = None,
+):
     """
     Run the forecast with the xgb model
     
     :param site: the PV site
     :param ts: the timestamp of the site. If None, defaults to the current timestamp rounded down to 15 minutes.
+    :param weather_data: optional "xgb" weather data from get_forecast_weather. If None, it is fetched
+    :param dtype: the dtype of the features and the forecast, by default from float_dtype
     :return: The PV forecast of the site for time (ts) for 48 hours
     """
 
@@ -94,6 +121,8 @@ def predict_tryolabs(
             kwp=site.capacity_kwp,
             orientation=site.orientation,
             tilt=site.tilt,
+            weather_data=weather_data,
+            dtype=float_dtype(dtype),
         )
 
         # postprocessing of the dataframe
@@ -132,3 +161,52 @@ def run_forecast(
     
     else:  
         raise ValueError(f"Unsupported model: {model}. Choose between 'xgb' and 'gb'")
+
+
+def run_forecasts(
+    site: PVSite,
+    models: Optional[List[str]] = None,
+    ts: datetime | str = None,
+    nwp_source: str = "icon",
+    dtype: Optional[np.dtype] = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Predict solar power output for a given site with several models, fetching the weather data once
+
+    :param site: the PV site
+    :param models: the models to use for prediction, "gb" and/or "xgb". Defaults to both
+    :param ts: the timestamp of the site. If None, defaults to the current timestamp rounded down to 15 minutes.
+    :param nwp_source: the nwp data source. Either "gfs", "icon" or "ukmo". Defaults to "icon"
+                       (only relevant for the "gb" model)
+    :param dtype: the dtype of the data and the forecasts, by default from float_dtype
+    :return: The PV forecast of the site for time (ts) for 48 hours, for each model
+    """
+    models = ["gb", "xgb"] if models is None else models
+    dtype = float_dtype(dtype)
+
+    if ts is None:
+        ts = pd.Timestamp.now().round("15min")
+
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+    ts = pd.Timestamp(ts).to_pydatetime()
+
+    # one request for the weather data of all the models, within the last 3 months
+    weather = {}
+    if (datetime.now() - ts).days <= 90:
+        weather = get_forecast_weather(
+            site.latitude, site.longitude, ts.date(), models, nwp_source=nwp_source, dtype=dtype
+        )
+
+    forecasts = {}
+    for model in models:
+        if model == "gb":
+            forecasts[model] = predict_ocf(
+                site.model_copy(), None, ts, nwp_source, nwp_xr=weather.get("gb"), dtype=dtype
+            )
+        elif model == "xgb":
+            forecasts[model] = predict_tryolabs(site, ts, weather_data=weather.get("xgb"), dtype=dtype)
+        else:
+            raise ValueError(f"Unsupported model: {model}. Choose between 'xgb' and 'gb'")
+
+    return forecasts
@@ -8,6 +8,8 @@ from psp.typings import X
 
 dir_path = os.path.dirname(os.path.realpath(__file__))
 
+MODEL_PATH = f"{dir_path}/../models/model-0.4.0.pkl"
+
 
 def forecast_v1_tilt_orientation(nwp_source:str, nwp_xr:xr.Dataset, pv_xr:xr.Dataset, ts:pd.Timestamp, model=None):
     """
@@ -17,7 +19,7 @@ def forecast_v1_tilt_orientation(nwp_source:str, nwp_xr:xr.Dataset, pv_xr:xr.Dat
     """
 
     if model is None:
-        model = load_model(f"{dir_path}/../models/model-0.4.0.pkl")
+        model = load_model(MODEL_PATH)
 
     # format pv and nwp data
     pv_data_source = NetcdfPvDataSource(
@@ -1,9 +1,11 @@
 import datetime
+import numpy as np
 import pandas as pd
 import zipfile
 import os.path
 import shutil
 import logging
+from typing import Optional
 
 from huggingface_hub import hf_hub_download
 from quartz_solar_forecast.weather import WeatherService
@@ -137,6 +139,8 @@ class TryolabsSolarPowerPredictor:
         kwp: float,
         orientation: float = 180,
         tilt: float = 30,
+        weather_data: Optional[pd.DataFrame] = None,
+        dtype: np.dtype = np.float64,
     ) -> pd.DataFrame:
         """
         Fetches weather data for the given location and date range, and prepares it for prediction.
@@ -155,21 +159,28 @@ class TryolabsSolarPowerPredictor:
             Orientation angle of the solar panel system in degrees.
         tilt : float
             Tilt angle of the solar panel system in degrees.
+        weather_data : pd.DataFrame, optional
+            The weather data, e.g. the "xgb" view from get_forecast_weather. If None, it is fetched.
+        dtype : np.dtype
+            The dtype of the weather and solar panel features.
 
         Returns
         -------
         pd.DataFrame
             Prepared weather data with additional solar panel parameters.
         """
-        start_date_datetime = datetime.datetime.strptime(start_date, "%Y-%m-%d")
-        end_date_datetime = start_date_datetime + datetime.timedelta(days=2)
-        end_date = end_date_datetime.strftime("%Y-%m-%d")
+        if weather_data is None:
+            start_date_datetime = datetime.datetime.strptime(start_date, "%Y-%m-%d")
+            end_date_datetime = start_date_datetime + datetime.timedelta(days=2)
+            end_date = end_date_datetime.strftime("%Y-%m-%d")
 
-        weather_service = WeatherService()
+            weather_service = WeatherService()
 
-        weather_data = weather_service.get_hourly_weather(
-            latitude, longitude, start_date, end_date
-        )
+            weather_data = weather_service.get_hourly_weather(
+                latitude, longitude, start_date, end_date
+            )
+        else:
+            weather_data = weather_data.copy()
 
         PANEL_COLUMNS = [
             "latitude_rounded",
@@ -190,6 +201,9 @@ class TryolabsSolarPowerPredictor:
         ]
         weather_data = weather_data[cols]
 
+        # the features, as the dtype to predict with
+        weather_data = weather_data.astype({col: dtype for col in cols if col != self.DATE_COLUMN})
+
         return weather_data
 
     def clean(self, df: pd.DataFrame) -> pd.DataFrame:
@@ -219,7 +233,8 @@ class TryolabsSolarPowerPredictor:
                            "shortwave_radiation",
                            "direct_normal_irradiance"]
 
-        df = df.drop(columns=COLUMNS_TO_DROP)
+        # the model does not use the radiation columns, and the weather layer no longer fetches them
+        df = df.drop(columns=COLUMNS_TO_DROP, errors="ignore")
 
         return df
 
@@ -231,6 +246,8 @@ class TryolabsSolarPowerPredictor:
         kwp: float,
         orientation: float = 180,
         tilt: float = 30,
+        weather_data: Optional[pd.DataFrame] = None,
+        dtype: np.dtype = np.float64,
     ) -> pd.DataFrame:
         """
         Predicts solar power output for the specified parameters.
@@ -249,6 +266,10 @@ class TryolabsSolarPowerPredictor:
             Orientation angle of the solar panel system in degrees.
         tilt : float
             Tilt angle of the solar panel system in degrees.
+        weather_data : pd.DataFrame, optional
+            The weather data, e.g. the "xgb" view from get_forecast_weather. If None, it is fetched.
+        dtype : np.dtype
+            The dtype of the features and the predicted power.
 
         Returns
         -------
@@ -256,7 +277,7 @@ class TryolabsSolarPowerPredictor:
             DataFrame containing timestamps and predicted power output in kW for every 15 minutes.
         """
 
-        data = self.get_data(latitude, longitude, start_date, kwp, orientation, tilt)
+        data = self.get_data(latitude, longitude, start_date, kwp, orientation, tilt, weather_data, dtype)
         #if data is not None:
         cleaned_data = self.clean(data)
         predictions = self.model.predict(cleaned_data.drop(columns=[self.DATE_COLUMN]))
@@ -268,4 +289,5 @@ class TryolabsSolarPowerPredictor:
         final_data.loc[final_data["prediction"] < 0, "prediction"] = 0
         df = final_data[[self.DATE_COLUMN, "prediction"]]
         df = df.rename(columns={"prediction": "power_kw"})
+        df["power_kw"] = df["power_kw"].astype(dtype)
         return df
@@ -0,0 +1,233 @@
+"""
+Fleet telemetry collector
+
+Polls live generation data for many sites, across all the supported inverter vendors, on a
+schedule and writes it into the shared generation store. Forecasts then read the store rather
+than calling the vendor APIs during the request.
+
+Each vendor has its own concurrency and rate limits, and failed polls are retried with
+exponential backoff. The inverter clients are synchronous, so each poll runs in a worker thread.
+
+Example:
+
+    sites = load_sites("sites.json")
+    collector = FleetCollector(sites, GenerationStore("data/generation.sqlite"))
+    asyncio.run(collector.run())
+
+"""
+import asyncio
+import json
+import logging
+import random
+from typing import Dict, List, Optional
+
+import pandas as pd
+from pydantic import BaseModel, ConfigDict, Field
+
+from quartz_solar_forecast.inverters.enphase import EnphaseInverter, EnphaseSettings
+from quartz_solar_forecast.inverters.givenergy import GivEnergyInverter, GivEnergySettings
+from quartz_solar_forecast.inverters.inverter import AbstractInverter
+from quartz_solar_forecast.inverters.mock import MockInverter
+from quartz_solar_forecast.inverters.solarman import SolarmanInverter, SolarmanSettings
+from quartz_solar_forecast.inverters.solis import SolisInverter, SolisSettings
+from quartz_solar_forecast.inverters.store import GenerationStore
+from quartz_solar_forecast.inverters.victron import VictronInverter, VictronSettings
+
+log = logging.getLogger(__name__)
+
+
+class VendorLimits(BaseModel):
+    max_concurrency: int = Field(..., description="the maximum number of polls in flight", ge=1)
+    requests_per_second: float = Field(..., description="the maximum rate polls are started", gt=0)
+
+
+# These are conservative, as one poll can make several API calls, e.g. Solis makes one per day
+DEFAULT_VENDOR_LIMITS = {
+    "enphase": VendorLimits(max_concurrency=4, requests_per_second=0.15),
+    "solis": VendorLimits(max_concurrency=2, requests_per_second=0.1),
+    "givenergy": VendorLimits(max_concurrency=8, requests_per_second=1),
+    "solarman": VendorLimits(max_concurrency=4, requests_per_second=0.5),
+    "victron": VendorLimits(max_concurrency=4, requests_per_second=0.5),
+    "mock": VendorLimits(max_concurrency=100, requests_per_second=1000),
+}
+
+
+class FleetSite(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    site_id: str = Field(..., description="the site id, used as the key in the generation store")
+    inverter_type: str = Field(..., description="The type of inverter used")
+    inverter: AbstractInverter = Field(..., description="the inverter to get live data from")
+
+
+def make_inverter(inverter_type: str, settings: Optional[dict] = None) -> AbstractInverter:
+    """
+    Make an inverter of the given type
+
+    :param inverter_type: one of "enphase", "solis", "givenergy", "solarman", "victron" or "mock"
+    :param settings: optional settings for the inverter, keyed by environment variable name, e.g.
+        {"ENPHASE_SYSTEM_ID": "1234"}. Anything not given is read from the environment.
+    :return: the inverter
+    """
+    settings = settings or {}
+    if inverter_type == "enphase":
+        return EnphaseInverter(EnphaseSettings(**settings))
+    elif inverter_type == "solis":
+        return SolisInverter(SolisSettings(**settings))
+    elif inverter_type == "givenergy":
+        return GivEnergyInverter(GivEnergySettings(**settings))
+    elif inverter_type == "solarman":
+        return SolarmanInverter(SolarmanSettings(**settings))
+    elif inverter_type == "victron":
+        return VictronInverter.from_settings(VictronSettings(**settings))
+    elif inverter_type == "mock":
+        return MockInverter()
+    else:
+        raise ValueError(f"Unsupported inverter type: {inverter_type}")
+
+
+def load_sites(path: str) -> List[FleetSite]:
+    """
+    Load the fleet from a JSON file
+
+    The file should be a list of sites, e.g.
+    [{"site_id": "1", "inverter_type": "enphase", "settings": {"ENPHASE_SYSTEM_ID": "1234"}}]
+
+    :param path: the path to the JSON file
+    :return: list of sites
+    """
+    with open(path) as f:
+        sites_config = json.load(f)
+
+    return [
+        FleetSite(
+            site_id=str(site_config["site_id"]),
+            inverter_type=site_config["inverter_type"],
+            inverter=make_inverter(site_config["inverter_type"], site_config.get("settings")),
+        )
+        for site_config in sites_config
+    ]
+
+
+class RateLimiter:
+    """
+    Spaces out calls so they start no faster than the given rate
+    """
+
+    def __init__(self, requests_per_second: float):
+        self._interval = 1 / requests_per_second
+        self._next_time = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            wait = self._next_time - now
+            self._next_time = max(now, self._next_time) + self._interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class FleetCollector:
+    """
+    Polls all the sites in a fleet and writes their live data into the generation store
+    """
+
+    def __init__(
+        self,
+        sites: List[FleetSite],
+        store: GenerationStore,
+        poll_interval: pd.Timedelta = pd.Timedelta(minutes=15),
+        vendor_limits: Optional[Dict[str, VendorLimits]] = None,
+        max_retries: int = 3,
+        backoff_seconds: float = 2.0,
+    ):
+        """
+        :param sites: the sites to poll
+        :param store: the store to write live data to
+        :param poll_interval: how often to poll every site
+        :param vendor_limits: concurrency and rate limits for each inverter type, these
+            override DEFAULT_VENDOR_LIMITS
+        :param max_retries: how many times to retry a failed poll
+        :param backoff_seconds: the wait before the first retry, this doubles on each retry
+        """
+        self.sites = sites
+        self.store = store
+        self.poll_interval = poll_interval
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.vendor_limits = {**DEFAULT_VENDOR_LIMITS, **(vendor_limits or {})}
+
+        # these are made when the collector starts, as they belong to the running event loop
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._rate_limiters: Dict[str, RateLimiter] = {}
+
+    def _setup_limits(self):
+        for inverter_type in {site.inverter_type for site in self.sites}:
+            limits = self.vendor_limits.get(inverter_type, VendorLimits(max_concurrency=1, requests_per_second=1))
+            self._semaphores[inverter_type] = asyncio.Semaphore(limits.max_concurrency)
+            self._rate_limiters[inverter_type] = RateLimiter(limits.requests_per_second)
+
+    async def collect_site(self, site: FleetSite, ts: pd.Timestamp) -> int:
+        """
+        Poll one site, with retries, and write the data to the store
+
+        :param site: the site to poll
+        :param ts: the time of the poll
+        :return: the number of rows written
+        """
+        for attempt in range(self.max_retries + 1):
+            async with self._semaphores[site.inverter_type]:
+                await self._rate_limiters[site.inverter_type].acquire()
+                try:
+                    # some inverters return None rather than raising when they fail
+                    generation_kw = await asyncio.to_thread(site.inverter.get_data, ts)
+                    error = None if generation_kw is not None else "no data returned"
+                except Exception as e:
+                    generation_kw = None
+                    error = str(e)
+
+            if error is None:
+                return await asyncio.to_thread(self.store.write, site.site_id, generation_kw)
+
+            if attempt < self.max_retries:
+                wait = self.backoff_seconds * 2 ** attempt * (1 + random.random())
+                log.warning(f"Polling site {site.site_id} failed ({error}), retrying in {wait:.1f}s")
+                await asyncio.sleep(wait)
+
+        log.error(f"Polling site {site.site_id} failed after {self.max_retries + 1} attempts")
+        return 0
+
+    async def collect_once(self) -> int:
+        """
+        Poll every site once
+
+        :return: the total number of rows written
+        """
+        if not self._semaphores:
+            self._setup_limits()
+
+        ts = pd.Timestamp.now(tz="UTC").tz_localize(None)
+        rows_written = await asyncio.gather(*[self.collect_site(site, ts) for site in self.sites])
+
+        return sum(rows_written)
+
+    async def run(self, iterations: Optional[int] = None):
+        """
+        Poll every site on a schedule
+
+        :param iterations: optional number of polling rounds, by default this runs forever
+        """
+        self._setup_limits()
+        loop = asyncio.get_running_loop()
+
+        iteration = 0
+        while iterations is None or iteration < iterations:
+            started = loop.time()
+            rows_written = await self.collect_once()
+            duration = loop.time() - started
+            log.info(f"Collected {rows_written} rows from {len(self.sites)} sites in {duration:.1f}s")
+
+            iteration += 1
+            if iterations is None or iteration < iterations:
+                await asyncio.sleep(max(self.poll_interval.total_seconds() - duration, 0))
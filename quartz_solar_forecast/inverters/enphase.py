@@ -5,11 +5,12 @@ from typing import Optional
 import pandas as pd
 import json
 import base64
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timedelta
 
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urlparse
 
 from quartz_solar_forecast.inverters.inverter import AbstractInverter
+from quartz_solar_forecast.inverters.normalize import empty_generation_df, normalize_enphase
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -21,6 +22,7 @@ class EnphaseSettings(BaseSettings):
     system_id: str = Field(alias="ENPHASE_SYSTEM_ID")
     api_key: str = Field(alias="ENPHASE_API_KEY")
     client_secret: str = Field(alias="ENPHASE_CLIENT_SECRET")
+    api_url: str = Field(alias="ENPHASE_API_URL", default="https://api.enphaseenergy.com")
 
 
 class EnphaseInverter(AbstractInverter):
@@ -32,6 +34,19 @@ class EnphaseInverter(AbstractInverter):
         return get_enphase_data(self.__settings)
 
 
+def make_enphase_connection(api_url: str) -> http.client.HTTPConnection:
+    """
+    Make a connection to the Enphase API, or anything standing in for it
+
+    :param api_url: the base url of the API, e.g. https://api.enphaseenergy.com
+    :return: HTTP(S) connection
+    """
+    url = urlparse(api_url)
+    if url.scheme == "http":
+        return http.client.HTTPConnection(url.netloc)
+    return http.client.HTTPSConnection(url.netloc)
+
+
 def get_enphase_auth_url(settings: Optional[EnphaseSettings] = None):
     """
     Generate the authorization URL for the Enphase API.
@@ -99,7 +114,7 @@ def get_enphase_access_token(auth_code: Optional[str] = None, settings: Optional
     credentials = f"{client_id}:{client_secret}"
     encoded_credentials = base64.b64encode(credentials.encode("utf-8")).decode("utf-8")
 
-    conn = http.client.HTTPSConnection("api.enphaseenergy.com")
+    conn = make_enphase_connection(settings.api_url)
     headers = {
         "Authorization": f"Basic {encoded_credentials}"
     }
@@ -123,34 +138,18 @@ def get_enphase_access_token(auth_code: Optional[str] = None, settings: Optional
 
 
 def process_enphase_data(data_json: dict, start_at: int) -> pd.DataFrame:
+    """
+    Process the Enphase telemetry response into a DataFrame
+
+    :param data_json: the decoded `production_micro` telemetry response
+    :param start_at: epoch seconds, intervals ending before this are dropped
+    :return: DataFrame with timestamp and power_kw columns
+    """
     # Check if 'intervals' key exists in the response
     if 'intervals' not in data_json:
-        return pd.DataFrame(columns=["timestamp", "power_kw"])
+        return empty_generation_df()
 
-    # Initialize an empty list to store the data
-    data_list = []
-
-    # Loop through the intervals and collect the data for the last week
-    for interval in data_json['intervals']:
-        end_at = interval['end_at']
-        if end_at >= start_at:
-            # Convert to UTC
-            timestamp = datetime.fromtimestamp(end_at, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
-
-            # Append the data to the list
-            data_list.append({"timestamp": timestamp, "power_kw": interval['powr'] / 1000})
-
-    # Convert the list to a DataFrame
-    live_generation_kw = pd.DataFrame(data_list)
-
-    # If DataFrame is empty, return with correct columns
-    if live_generation_kw.empty:
-        return pd.DataFrame(columns=["timestamp", "power_kw"])
-
-    # Convert to datetime
-    live_generation_kw["timestamp"] = pd.to_datetime(live_generation_kw["timestamp"])
-
-    return live_generation_kw
+    return normalize_enphase(data_json['intervals'], start_at)
 
 
 def get_enphase_data(settings: EnphaseSettings) -> pd.DataFrame:
@@ -172,7 +171,7 @@ def get_enphase_data(settings: EnphaseSettings) -> pd.DataFrame:
     # Set the granularity to week
     granularity = "week"
 
-    conn = http.client.HTTPSConnection("api.enphaseenergy.com")
+    conn = make_enphase_connection(settings.api_url)
     headers = {
         "Authorization": f"Bearer {access_token}",
         "key": settings.api_key
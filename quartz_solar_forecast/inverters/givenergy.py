@@ -14,6 +14,7 @@ class GivEnergySettings(BaseSettings):
     model_config = SettingsConfigDict(env_file='.env', extra='ignore')
 
     api_key: str = Field(alias="GIVENERGY_API_KEY")
+    api_url: str = Field(alias="GIVENERGY_API_URL", default="https://api.givenergy.cloud")
 
 
 class GivEnergyInverter(AbstractInverter):
@@ -40,7 +41,7 @@ def get_inverter_serial_number(settings: GivEnergySettings):
     if not api_key:
         raise ValueError("GIVENERGY_API_KEY not set in environment variables")
 
-    url = 'https://api.givenergy.cloud/v1/communication-device'
+    url = f'{settings.api_url}/v1/communication-device'
     
     headers = {
         'Authorization': f'Bearer {api_key}',
@@ -74,7 +75,7 @@ def get_givenergy_data(settings: GivEnergySettings):
 
     inverter_serial_number = get_inverter_serial_number(settings)
 
-    url = f'https://api.givenergy.cloud/v1/inverter/{inverter_serial_number}/system-data/latest'
+    url = f'{settings.api_url}/v1/inverter/{inverter_serial_number}/system-data/latest'
     
     headers = {
         'Authorization': f'Bearer {api_key}',
@@ -1,6 +1,7 @@
 import pandas as pd
 
 from quartz_solar_forecast.inverters.inverter import AbstractInverter
+from quartz_solar_forecast.inverters.normalize import empty_generation_df
 
 
 class MockInverter(AbstractInverter):
@@ -9,4 +10,4 @@ class MockInverter(AbstractInverter):
     """
 
     def get_data(self, ts: pd.Timestamp) -> pd.DataFrame:
-        return pd.DataFrame(columns=['timestamp', 'power_kw'])
+        return empty_generation_df()
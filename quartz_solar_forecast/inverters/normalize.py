@@ -0,0 +1,158 @@
+"""
+Normalise raw inverter payloads into the standard live generation DataFrame.
+
+Every inverter returns a DataFrame with the columns `timestamp` (naive UTC datetimes) and
+`power_kw` (float). The vendor APIs return epochs in seconds or milliseconds and power in W,
+so rather than formatting and re-parsing timestamp strings row by row, the payloads are
+pulled out into columnar numpy arrays and converted in a single vectorised step.
+"""
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+GENERATION_COLUMNS = ["timestamp", "power_kw"]
+
+
+def empty_generation_df() -> pd.DataFrame:
+    """
+    Make an empty live generation DataFrame with the standard columns
+
+    :return: empty DataFrame with timestamp and power_kw columns
+    """
+    return pd.DataFrame(
+        {
+            "timestamp": pd.Series([], dtype="datetime64[ns]"),
+            "power_kw": pd.Series([], dtype=np.float64),
+        }
+    )
+
+
+def make_generation_df(
+    epochs: Iterable,
+    power: Iterable,
+    unit: str = "s",
+    scale: float = 1.0,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+) -> pd.DataFrame:
+    """
+    Make a live generation DataFrame from columnar epoch and power arrays
+
+    :param epochs: the unix epochs of each sample
+    :param power: the power of each sample, in the vendor's unit
+    :param unit: the unit of the epochs, either "s" or "ms"
+    :param scale: factor to multiply the power by to get kW, e.g. 1/1000 for W
+    :param start: optional epoch (same unit as epochs), samples before this are dropped
+    :param end: optional epoch (same unit as epochs), samples after this are dropped
+    :return: DataFrame with timestamp and power_kw columns, sorted by timestamp
+    """
+    epochs = np.asarray(epochs, dtype=np.int64)
+    power_kw = np.asarray(power, dtype=np.float64) * scale
+
+    mask = None
+    if start is not None:
+        mask = epochs >= start
+    if end is not None:
+        mask = epochs <= end if mask is None else mask & (epochs <= end)
+    if mask is not None:
+        epochs = epochs[mask]
+        power_kw = power_kw[mask]
+
+    if len(epochs) == 0:
+        return empty_generation_df()
+
+    # most payloads are already in time order, so only sort when we need to
+    if np.any(epochs[1:] < epochs[:-1]):
+        order = np.argsort(epochs, kind="stable")
+        epochs = epochs[order]
+        power_kw = power_kw[order]
+
+    timestamp = pd.to_datetime(epochs, unit=unit)
+
+    return pd.DataFrame({"timestamp": timestamp, "power_kw": power_kw})
+
+
+def normalize_enphase(intervals: list, start_at: Optional[int] = None) -> pd.DataFrame:
+    """
+    Normalise Enphase `production_micro` telemetry intervals
+
+    :param intervals: list of intervals with `end_at` (epoch seconds) and `powr` (W)
+    :param start_at: optional epoch seconds, intervals ending before this are dropped
+    :return: DataFrame with timestamp and power_kw columns
+    """
+    epochs = [interval["end_at"] for interval in intervals]
+    power_w = [interval["powr"] for interval in intervals]
+
+    return make_generation_df(epochs, power_w, unit="s", scale=1 / 1000, start=start_at)
+
+
+def normalize_solis(
+    data_points: list, start: Optional[float] = None, end: Optional[float] = None
+) -> pd.DataFrame:
+    """
+    Normalise SolisCloud `inverterDay` data points
+
+    :param data_points: list of data points with `dataTimestamp` (epoch ms, may be a string)
+        and `pac` (W)
+    :param start: optional epoch ms, data points before this are dropped
+    :param end: optional epoch ms, data points after this are dropped
+    :return: DataFrame with timestamp and power_kw columns
+    """
+    epochs = [data_point["dataTimestamp"] for data_point in data_points]
+    power_w = [data_point["pac"] for data_point in data_points]
+
+    # SolisCloud returns both fields as strings, so let numpy do the parsing in one go
+    epochs = np.asarray(epochs).astype(np.int64)
+    power_w = np.asarray(power_w).astype(np.float64)
+
+    return make_generation_df(epochs, power_w, unit="ms", scale=1 / 1000, start=start, end=end)
+
+
+def normalize_solarman(records: list) -> pd.DataFrame:
+    """
+    Normalise Solarman history records
+
+    Records without a `generationPower` value are dropped.
+
+    :param records: list of records with `dateTime` (epoch seconds) and `generationPower` (W)
+    :return: DataFrame with timestamp and power_kw columns
+    """
+    epochs = np.asarray([record.get("dateTime") for record in records], dtype=np.float64)
+    power_w = np.asarray(
+        [record.get("generationPower") for record in records], dtype=np.float64
+    )
+
+    valid = ~np.isnan(epochs) & ~np.isnan(power_w)
+
+    return make_generation_df(epochs[valid], power_w[valid], unit="s", scale=1 / 1000)
+
+
+def normalize_victron(kwh: list) -> pd.DataFrame:
+    """
+    Normalise Victron VRM `kwh` stats into average power
+
+    VRM returns the energy [kWh] produced in each interval as `[epoch_ms, kwh]` pairs. This is
+    converted to the average power [kW] over the interval. VRM aggregates into fixed intervals
+    and leaves out intervals with no data, so the interval length is taken as the typical spacing
+    between samples (15 minutes if there is only one sample).
+
+    :param kwh: list of [epoch ms, kWh] pairs
+    :return: DataFrame with timestamp and power_kw columns
+    """
+    if len(kwh) == 0:
+        return empty_generation_df()
+
+    values = np.asarray(kwh, dtype=np.float64)
+    epochs = values[:, 0].astype(np.int64)
+    energy_kwh = values[:, 1]
+
+    generation_df = make_generation_df(epochs, energy_kwh, unit="ms")
+
+    spacing_hours = np.diff(generation_df["timestamp"].to_numpy()) / np.timedelta64(1, "h")
+    spacing_hours = spacing_hours[spacing_hours > 0]
+    interval_hours = np.median(spacing_hours) if len(spacing_hours) > 0 else 0.25
+
+    generation_df["power_kw"] = generation_df["power_kw"] / interval_hours
+
+    return generation_df
@@ -0,0 +1,295 @@
+"""
+Local replay stand-in for the inverter vendor APIs
+
+Serves recorded Enphase, SolisCloud, GivEnergy, Solarman and Victron VRM responses over real
+HTTP, with configurable latency, rate limits and failures. Point the inverter settings at the
+server to benchmark collection and retry behaviour end to end without any network, e.g.
+
+    with ReplayServer(default_recordings(), latency=0.2, failure_rate=0.05) as server:
+        settings = GivEnergySettings(GIVENERGY_API_KEY="key", GIVENERGY_API_URL=server.url)
+        get_givenergy_data(settings)
+
+The settings for each vendor are:
+- Enphase: ENPHASE_API_URL=server.url
+- SolisCloud: SOLIS_CLOUD_API_URL=http://127.0.0.1, SOLIS_CLOUD_API_PORT=server.port
+- GivEnergy: GIVENERGY_API_URL=server.url
+- Solarman: SOLARMAN_API_URL=server.url + SOLARMAN_RECORD_PATH
+- Victron: VICTRON_API_URL=server.url
+
+Recordings map a method and a path pattern to a response body, or to a function of the query
+parameters and JSON body which returns the response body. Recorded responses can also be
+loaded from a directory of JSON files, with `load_recordings`.
+"""
+import fnmatch
+import glob
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from quartz_solar_forecast.inverters.synthetic import SyntheticInverter
+
+SOLARMAN_RECORD_PATH = "/maintain-s/history/power"
+
+Recordings = Dict[Tuple[str, str], Union[Any, Callable[[dict, dict], Any]]]
+
+
+def load_recordings(directory: str) -> Recordings:
+    """
+    Load recorded responses from a directory of JSON files
+
+    Each file should look like {"method": "GET", "path": "/v1/communication-device", "body": {...}}
+    and the path can contain * wildcards.
+
+    :param directory: the directory of JSON files
+    :return: the recordings
+    """
+    recordings = {}
+    for filename in sorted(glob.glob(f"{directory}/*.json")):
+        with open(filename) as f:
+            recording = json.load(f)
+        recordings[(recording["method"].upper(), recording["path"])] = recording["body"]
+
+    return recordings
+
+
+def default_recordings(
+    ts: Optional[pd.Timestamp] = None, latitude: float = 51.75, longitude: float = -1.25, capacity_kwp: float = 4
+) -> Recordings:
+    """
+    Make responses for all the vendor APIs, in each vendor's format
+
+    The generation data comes from the SyntheticInverter, for the week up to ts.
+
+    :param ts: the end of the generation data, defaults to now
+    :param latitude: the latitude of the site
+    :param longitude: the longitude of the site
+    :param capacity_kwp: the capacity [kwp] of the site
+    :return: the recordings
+    """
+    if ts is None:
+        ts = pd.Timestamp.now(tz="UTC").tz_localize(None)
+
+    inverter = SyntheticInverter(latitude, longitude, capacity_kwp, freq="5min", seed=0)
+    generation_kw = inverter.get_data(ts)
+    epochs = generation_kw["timestamp"].to_numpy(dtype="datetime64[s]").astype(np.int64)
+    power_w = np.round(generation_kw["power_kw"].to_numpy() * 1000, 1)
+
+    def on_day(query: dict, body: dict) -> np.ndarray:
+        # Solis asks for one day at a time in the body, Solarman in the query
+        if "time" in body:
+            day = pd.Timestamp(body["time"])
+        else:
+            day = pd.Timestamp(year=int(query["year"]), month=int(query["month"]), day=int(query["day"]))
+        start = int(day.timestamp())
+        return (epochs >= start) & (epochs < start + 24 * 3600)
+
+    def solis_inverter_day(query: dict, body: dict) -> dict:
+        mask = on_day(query, body)
+        data = [
+            {"dataTimestamp": str(epoch * 1000), "pac": str(power)}
+            for epoch, power in zip(epochs[mask].tolist(), power_w[mask].tolist())
+        ]
+        return {"success": True, "code": "0", "msg": "success", "data": data}
+
+    def solarman_record(query: dict, body: dict) -> dict:
+        mask = on_day(query, body)
+        records = [
+            {"dateTime": epoch, "generationPower": power}
+            for epoch, power in zip(epochs[mask].tolist(), power_w[mask].tolist())
+        ]
+        return {"success": True, "records": records}
+
+    # Victron reports the energy in each 15 minute interval
+    quarter_hours = pd.Series(power_w / 1000, index=generation_kw["timestamp"]).resample("15min").mean().dropna()
+    kwh = [
+        [int(t.timestamp() * 1000), power / 4] for t, power in zip(quarter_hours.index, quarter_hours.values)
+    ]
+
+    return {
+        # Enphase
+        ("POST", "/oauth/token"): {"access_token": "replay_access_token", "refresh_token": "replay_refresh_token"},
+        ("GET", "/api/v4/systems/*/telemetry/production_micro"): {
+            "granularity": "week",
+            "items": "intervals",
+            "intervals": [
+                {"end_at": epoch, "devices_reporting": 1, "powr": power, "enwh": power / 12}
+                for epoch, power in zip(epochs.tolist(), power_w.tolist())
+            ],
+        },
+        # SolisCloud
+        ("POST", "/v1/api/inverterList"): {
+            "success": True, "code": "0", "msg": "success", "data": {"page": {"records": [{"sn": "REPLAY0001"}]}}
+        },
+        ("POST", "/v1/api/inverterDay"): solis_inverter_day,
+        # GivEnergy
+        ("GET", "/v1/communication-device"): {"data": [{"inverter": {"serial": "REPLAY0001"}}]},
+        ("GET", "/v1/inverter/*/system-data/latest"): {
+            "data": {
+                "time": pd.Timestamp(int(epochs[-1]), unit="s").strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "solar": {"power": float(power_w[-1])},
+            }
+        },
+        # Solarman
+        ("GET", f"{SOLARMAN_RECORD_PATH}/*/record"): solarman_record,
+        # Victron VRM
+        ("POST", "/v2/auth/login"): {"token": "replay_token", "idUser": 1},
+        ("GET", "/v2/users/*/installations"): {"success": True, "records": [{"idSite": 1234, "name": "Replay"}]},
+        ("GET", "/v2/installations/*/stats"): {"success": True, "records": {"kwh": kwh}},
+    }
+
+
+class ReplayServer:
+    """
+    A local HTTP server which replays recorded vendor API responses
+    """
+
+    def __init__(
+        self,
+        recordings: Recordings,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        requests_per_second: Optional[float] = None,
+        failure_rate: float = 0.0,
+        port: int = 0,
+        seed: Optional[int] = None,
+    ):
+        """
+        :param recordings: the responses to serve, keyed by method and path pattern
+        :param latency: the delay [seconds] before every response
+        :param jitter: extra random delay [seconds], up to this much, before every response
+        :param requests_per_second: if set, requests above this rate get a 429 response
+        :param failure_rate: the fraction of requests that get a 503 response
+        :param port: the port to listen on, by default a free port is used
+        :param seed: the random seed for jitter and failures
+        """
+        self.recordings = recordings
+        self.latency = latency
+        self.jitter = jitter
+        self.requests_per_second = requests_per_second
+        self.failure_rate = failure_rate
+        self.request_count = 0
+        self.status_counts: Dict[int, int] = {}
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = requests_per_second or 0.0
+        self._last_refill = time.monotonic()
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> "ReplayServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "ReplayServer":
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _find_recording(self, method: str, path: str):
+        for (recorded_method, pattern), body in self.recordings.items():
+            if recorded_method == method and fnmatch.fnmatchcase(path, pattern):
+                return body
+        return None
+
+    def _take_token(self) -> bool:
+        """Token bucket rate limit, which allows bursts of up to one second of requests"""
+        if self.requests_per_second is None:
+            return True
+        now = time.monotonic()
+        self._tokens = min(
+            self.requests_per_second, self._tokens + (now - self._last_refill) * self.requests_per_second
+        )
+        self._last_refill = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def _respond(self, method: str, path: str, query: dict, body: dict) -> Tuple[int, Any]:
+        with self._lock:
+            self.request_count += 1
+            allowed = self._take_token()
+            failed = self._random.random() < self.failure_rate
+            delay = self.latency + self._random.random() * self.jitter
+
+        if delay > 0:
+            time.sleep(delay)
+
+        if not allowed:
+            return 429, {"msg": "Too many requests"}
+        if failed:
+            return 503, {"msg": "Service unavailable"}
+
+        recording = self._find_recording(method, path)
+        if recording is None:
+            return 404, {"msg": f"No recording for {method} {path}"}
+        if callable(recording):
+            recording = recording(query, body)
+
+        return 200, recording
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self, method: str):
+                url = urlparse(self.path)
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+                body = {}
+                length = int(self.headers.get("Content-Length") or 0)
+                if length > 0:
+                    try:
+                        body = json.loads(self.rfile.read(length))
+                    except json.JSONDecodeError:
+                        body = {}
+
+                status, payload = server._respond(method, url.path, query, body)
+                with server._lock:
+                    server.status_counts[status] = server.status_counts.get(status, 0) + 1
+
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status == 429:
+                    self.send_header("Retry-After", "1")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
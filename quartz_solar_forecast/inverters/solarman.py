@@ -7,6 +7,7 @@ from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from quartz_solar_forecast.inverters.inverter import AbstractInverter
+from quartz_solar_forecast.inverters.normalize import empty_generation_df, normalize_solarman
 
 
 class SolarmanSettings(BaseSettings):
@@ -26,19 +27,17 @@ class SolarmanInverter(AbstractInverter):
         try:
             end_date = datetime.now()
             start_date = end_date - timedelta(weeks=1)
-            solarman_data = get_solarman_data(start_date, end_date, self.__settings)
-
-            # Filter out rows with null power_kw values
-            valid_data = solarman_data.dropna(subset=['power_kw'])
+            # rows with null power_kw values are already dropped
+            valid_data = get_solarman_data(start_date, end_date, self.__settings)
 
             if valid_data.empty:
                 print("No valid Solarman data found.")
-                return pd.DataFrame(columns=['timestamp', 'power_kw'])
+                return empty_generation_df()
 
             return valid_data
         except Exception as e:
             print(f"Error retrieving Solarman data: {str(e)}")
-            return pd.DataFrame(columns=['timestamp', 'power_kw'])
+            return empty_generation_df()
 
 
 def get_solarman_data(start_date, end_date, settings: SolarmanSettings):
@@ -50,7 +49,7 @@ def get_solarman_data(start_date, end_date, settings: SolarmanSettings):
     :param settings: the Solarman settings
     :return: DataFrame with timestamp and power_kw columns
     """
-    all_data = []
+    records = []
     
     current_date = start_date
     
@@ -78,32 +77,12 @@ def get_solarman_data(start_date, end_date, settings: SolarmanSettings):
             print(f"API request failed for {current_date} with status code {response.status_code}")
         else:
             data = response.json()
-            records = data.get('records', [])
-            
-            if records:
-                df = pd.DataFrame(records)
-                df['timestamp'] = pd.to_datetime(df['dateTime'], unit='s')
-                all_data.append(df)
+            records.extend(data.get('records', []))
         
         current_date += timedelta(days=1)
     
-    if not all_data:
+    if not records:
         raise ValueError("No data found for the specified date range")
     
-    # Concatenate all dataframes
-    full_data = pd.concat(all_data, ignore_index=True)
-    
-    # Select relevant columns
-    full_data = full_data[['timestamp', 'generationPower']]
-
-    # Convert watts to kilowatts and rename the column
-    full_data['power_kw'] = full_data['generationPower'] / 1000.0
-    full_data = full_data.drop('generationPower', axis=1)
-
-    # Ensure the dataframe only has 'timestamp' and 'power_kw' columns
-    full_data = full_data[['timestamp', 'power_kw']]
-
-    # Sort by timestamp
-    full_data = full_data.sort_values('timestamp')
-    
-    return full_data
+    # Convert all the records to timestamp and power_kw in one go, this also converts W to kW
+    return normalize_solarman(records)
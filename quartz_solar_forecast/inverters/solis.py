@@ -16,6 +16,7 @@ from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from quartz_solar_forecast.inverters.inverter import AbstractInverter
+from quartz_solar_forecast.inverters.normalize import normalize_solis
 
 try:
     import async_timeout
@@ -316,26 +317,20 @@ class SolisData:
         )
         return inverter_list
     
-    def process_solis_data(self, live_generation_kw: pd.DataFrame) -> pd.DataFrame:
+    def process_solis_data(self, data_points: list, start_time: datetime, end_time: datetime) -> pd.DataFrame:
         """
-        Process the Solis data and convert it to a DataFrame with timestamp and power_kw columns.
-        
-        :param live_generation_kw: DataFrame with original Solis data
+        Process the raw Solis data points into a DataFrame with timestamp and power_kw columns.
+
+        :param data_points: list of raw `inverterDay` data points, for all inverters and days
+        :param start_time: data points before this time are dropped
+        :param end_time: data points after this time are dropped
         :return: DataFrame with processed data
         """
-        # Create a copy of the DataFrame to avoid SettingWithCopyWarning
-        processed_df = live_generation_kw[['timestamp', 'power_kw']].copy()
-        
-        # Ensure the timestamp is in the correct format
-        processed_df.loc[:, 'timestamp'] = pd.to_datetime(processed_df['timestamp'])
-        
-        # Sort by timestamp
-        processed_df = processed_df.sort_values('timestamp')
-        
-        # Reset the index
-        processed_df = processed_df.reset_index(drop=True)
-        
-        return processed_df
+        return normalize_solis(
+            data_points,
+            start=start_time.timestamp() * 1000,
+            end=end_time.timestamp() * 1000,
+        )
 
     async def get_solis_data(self) -> pd.DataFrame:
         """
@@ -352,12 +347,13 @@ class SolisData:
             end_time = datetime.now(timezone.utc)
             start_time = end_time - timedelta(days=7)
             
-            data_list = []
+            data_points = []
             
             for inverter in inverter_list:
                 inverter_sn = inverter['sn']
                 for day in range(7):
                     current_date = (end_time - timedelta(days=day)).strftime('%Y-%m-%d')
+                    inverter_day_data = None
                     try:
                         inverter_day_data = await soliscloud.inverter_day(
                             self.api_key,
@@ -370,14 +366,7 @@ class SolisData:
                         
                         # Check if inverter_day_data is a list of dictionaries
                         if isinstance(inverter_day_data, list) and all(isinstance(item, dict) for item in inverter_day_data):
-                            for data_point in inverter_day_data:
-                                timestamp = datetime.fromtimestamp(int(data_point['dataTimestamp']) / 1000, tz=timezone.utc)
-                                if start_time <= timestamp <= end_time:
-                                    data_list.append({
-                                        "timestamp": timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                                        "power_kw": float(data_point['pac']) / 1000,  # Convert W to kW
-                                        "inverter_sn": inverter_sn
-                                    })
+                            data_points.extend(inverter_day_data)
                         else:
                             print(f"Unexpected data format for inverter {inverter_sn} on {current_date}")
                             print(f"Received data: {inverter_day_data}")
@@ -389,23 +378,8 @@ class SolisData:
                     # Avoid rate limiting
                     await asyncio.sleep(0.5)  # 2 times/sec limit
             
-            # Convert the list to a DataFrame
-            live_generation_kw = pd.DataFrame(data_list)
-            
-            if live_generation_kw.empty:
-                return pd.DataFrame(columns=["timestamp", "power_kw"])
-
-            # Convert to datetime
-            live_generation_kw["timestamp"] = pd.to_datetime(live_generation_kw["timestamp"])
-            
-            # Sort by timestamp
-            live_generation_kw = live_generation_kw.sort_values("timestamp")
-            
-            # Process the data to match the desired format
-            processed_df = self.process_solis_data(live_generation_kw)
-            processed_df = processed_df.reset_index(drop=True)
-            
-            return processed_df
+            # Convert all the data points to a DataFrame in one go
+            return self.process_solis_data(data_points, start_time, end_time)
 
 
 async def get_solis_data(settings: SolisSettings):
@@ -0,0 +1,131 @@
+"""
+A shared store of live generation data
+
+The fleet collector writes inverter data into the store in the background, and forecasts read it
+from the store, so forecast latency does not depend on the inverter vendors' cloud APIs.
+The store is a single SQLite file in WAL mode, so one writer and many readers can use it at once.
+"""
+import os
+import sqlite3
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+from quartz_solar_forecast.inverters.inverter import AbstractInverter
+from quartz_solar_forecast.inverters.normalize import make_generation_df
+
+
+class GenerationStoreSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_file='.env', extra='ignore')
+
+    path: Optional[str] = Field(alias="GENERATION_STORE_PATH", default=None)
+
+
+class GenerationStore:
+    """
+    Live generation data for many sites, keyed by site id and timestamp
+    """
+
+    def __init__(self, path: str = "data/generation.sqlite"):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS generation ("
+                "site_id TEXT NOT NULL, "
+                "timestamp INTEGER NOT NULL, "
+                "power_kw REAL, "
+                "PRIMARY KEY (site_id, timestamp)"
+                ") WITHOUT ROWID"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def write(self, site_id: str, generation_kw: pd.DataFrame) -> int:
+        """
+        Write live generation data for a site, overwriting any existing values
+
+        :param site_id: the site id
+        :param generation_kw: DataFrame with timestamp and power_kw columns
+        :return: the number of rows written
+        """
+        if generation_kw is None or generation_kw.empty:
+            return 0
+
+        epochs = generation_kw["timestamp"].to_numpy(dtype="datetime64[s]").astype(np.int64)
+        power_kw = generation_kw["power_kw"].to_numpy(dtype=np.float64)
+        power_kw = np.where(np.isnan(power_kw), None, power_kw)
+
+        rows = zip([site_id] * len(epochs), epochs.tolist(), power_kw.tolist())
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO generation (site_id, timestamp, power_kw) VALUES (?, ?, ?)",
+                rows,
+            )
+
+        return len(epochs)
+
+    def read(
+        self,
+        site_id: str,
+        start: Optional[pd.Timestamp] = None,
+        end: Optional[pd.Timestamp] = None,
+    ) -> pd.DataFrame:
+        """
+        Read live generation data for a site
+
+        :param site_id: the site id
+        :param start: optional start time (inclusive)
+        :param end: optional end time (inclusive)
+        :return: DataFrame with timestamp and power_kw columns, sorted by timestamp
+        """
+        start_epoch = -(2 ** 62) if start is None else int(pd.Timestamp(start).timestamp())
+        end_epoch = 2 ** 62 if end is None else int(pd.Timestamp(end).timestamp())
+
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT timestamp, power_kw FROM generation "
+                "WHERE site_id = ? AND timestamp BETWEEN ? AND ? ORDER BY timestamp",
+                (site_id, start_epoch, end_epoch),
+            ).fetchall()
+
+        epochs = [row[0] for row in rows]
+        power_kw = [np.nan if row[1] is None else row[1] for row in rows]
+
+        return make_generation_df(epochs, power_kw, unit="s")
+
+    def last_timestamp(self, site_id: str) -> Optional[pd.Timestamp]:
+        """
+        Get the time of the most recent data for a site
+
+        :param site_id: the site id
+        :return: the most recent timestamp, or None if there is no data
+        """
+        with self._connect() as conn:
+            (last,) = conn.execute(
+                "SELECT MAX(timestamp) FROM generation WHERE site_id = ?", (site_id,)
+            ).fetchone()
+
+        return None if last is None else pd.Timestamp(last, unit="s")
+
+
+class StoredInverter(AbstractInverter):
+    """
+    Provides live data for a site from the generation store, rather than the inverter's API.
+    """
+
+    def __init__(self, store: GenerationStore, site_id: str, lookback: pd.Timedelta = pd.Timedelta(weeks=1)):
+        self.__store = store
+        self.__site_id = site_id
+        self.__lookback = lookback
+
+    def get_data(self, ts: pd.Timestamp) -> pd.DataFrame:
+        return self.__store.read(self.__site_id, start=ts - self.__lookback, end=ts)
@@ -0,0 +1,164 @@
+"""
+Synthetic inverter for load and scale testing
+
+Generates physically plausible live generation histories for any location, capacity and sample
+rate, without calling any vendor API. The clear sky shape comes from the sun's position and the
+angle of the panels, and is then scaled by slowly varying cloud cover and measurement noise.
+Gaps (single missing samples) and outages (hours with no data) can also be added.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from quartz_solar_forecast.inverters.inverter import AbstractInverter
+
+
+def get_solar_position(timestamps: pd.DatetimeIndex, latitude: float, longitude: float):
+    """
+    Get the approximate solar elevation and azimuth
+
+    This uses the NOAA low accuracy equations, which are good to about a degree.
+
+    :param timestamps: naive UTC timestamps
+    :param latitude: the latitude of the site
+    :param longitude: the longitude of the site
+    :return: elevation and azimuth (clockwise from north) in radians
+    """
+    day_of_year = timestamps.dayofyear.to_numpy()
+    hour = (timestamps.hour + timestamps.minute / 60 + timestamps.second / 3600).to_numpy()
+
+    # fractional year
+    gamma = 2 * np.pi / 365 * (day_of_year - 1 + (hour - 12) / 24)
+
+    equation_of_time = 229.18 * (
+        0.000075
+        + 0.001868 * np.cos(gamma)
+        - 0.032077 * np.sin(gamma)
+        - 0.014615 * np.cos(2 * gamma)
+        - 0.040849 * np.sin(2 * gamma)
+    )
+    declination = (
+        0.006918
+        - 0.399912 * np.cos(gamma)
+        + 0.070257 * np.sin(gamma)
+        - 0.006758 * np.cos(2 * gamma)
+        + 0.000907 * np.sin(2 * gamma)
+        - 0.002697 * np.cos(3 * gamma)
+        + 0.00148 * np.sin(3 * gamma)
+    )
+
+    solar_time_minutes = hour * 60 + equation_of_time + 4 * longitude
+    hour_angle = np.radians(solar_time_minutes / 4 - 180)
+    latitude = np.radians(latitude)
+
+    sin_elevation = np.sin(latitude) * np.sin(declination) + np.cos(latitude) * np.cos(
+        declination
+    ) * np.cos(hour_angle)
+    elevation = np.arcsin(np.clip(sin_elevation, -1, 1))
+
+    azimuth = np.arctan2(
+        np.sin(hour_angle),
+        np.cos(hour_angle) * np.sin(latitude) - np.tan(declination) * np.cos(latitude),
+    )
+    azimuth = np.mod(azimuth + np.pi, 2 * np.pi)
+
+    return elevation, azimuth
+
+
+class SyntheticInverter(AbstractInverter):
+    """
+    Provides synthetic live data, shaped like real generation, for load and scale testing.
+    """
+
+    def __init__(
+        self,
+        latitude: float,
+        longitude: float,
+        capacity_kwp: float,
+        tilt: float = 35,
+        orientation: float = 180,
+        freq: str = "5min",
+        history: pd.Timedelta = pd.Timedelta(weeks=1),
+        noise: float = 0.05,
+        gap_probability: float = 0.01,
+        outage_probability: float = 0.05,
+        outage_duration: pd.Timedelta = pd.Timedelta(hours=2),
+        seed: Optional[int] = None,
+    ):
+        """
+        :param latitude: the latitude of the site
+        :param longitude: the longitude of the site
+        :param capacity_kwp: the capacity [kwp] of the site
+        :param tilt: the tilt of the panels [degrees]
+        :param orientation: the orientation of the panels [degrees], 180 is south facing
+        :param freq: the sample rate, e.g. "5min" like Enphase or "1h"
+        :param history: how much history to return, up to the requested time
+        :param noise: the standard deviation of the multiplicative measurement noise
+        :param gap_probability: the probability that any one sample is missing
+        :param outage_probability: the probability per day of an outage, when there is no data
+        :param outage_duration: how long each outage lasts
+        :param seed: the random seed, set this to get the same data every time
+        """
+        self.latitude = latitude
+        self.longitude = longitude
+        self.capacity_kwp = capacity_kwp
+        self.tilt = tilt
+        self.orientation = orientation
+        self.freq = pd.Timedelta(freq)
+        self.history = history
+        self.noise = noise
+        self.gap_probability = gap_probability
+        self.outage_probability = outage_probability
+        self.outage_duration = outage_duration
+        self.seed = seed
+
+    def get_data(self, ts: pd.Timestamp) -> pd.DataFrame:
+        rng = np.random.default_rng(self.seed)
+
+        ts = pd.Timestamp(ts)
+        if ts.tzinfo is not None:
+            ts = ts.tz_convert("UTC").tz_localize(None)
+
+        end = ts.floor(self.freq)
+        timestamps = pd.date_range(end=end, periods=int(self.history / self.freq), freq=self.freq)
+        n_samples = len(timestamps)
+
+        elevation, azimuth = get_solar_position(timestamps, self.latitude, self.longitude)
+
+        # fraction of the sun's irradiance on the panels
+        tilt = np.radians(self.tilt)
+        cos_incidence = np.sin(elevation) * np.cos(tilt) + np.cos(elevation) * np.sin(tilt) * np.cos(
+            azimuth - np.radians(self.orientation)
+        )
+
+        # clear sky irradiance falls off at low sun elevations, as it goes through more atmosphere
+        sin_elevation = np.clip(np.sin(elevation), 0, None)
+        clear_sky = np.where(
+            sin_elevation > 0, np.exp(-0.14 / np.maximum(sin_elevation, 1e-3)), 0
+        )
+        direct = clear_sky * np.clip(cos_incidence, 0, None)
+        diffuse = 0.15 * clear_sky * sin_elevation * (1 + np.cos(tilt)) / 2
+        clear_sky_kw = self.capacity_kwp * np.clip(direct + diffuse, 0, 1)
+
+        # cloud cover varies slowly, over a few hours. This is smoothed white noise, with an
+        # exponential kernel so it behaves like a first order autoregressive process
+        steps_per_hour = max(pd.Timedelta(hours=1) / self.freq, 1)
+        persistence = np.exp(-1 / (3 * steps_per_hour))
+        kernel = persistence ** np.arange(int(15 * steps_per_hour) + 1)
+        white_noise = rng.normal(0, 1, n_samples + len(kernel))
+        cloud = np.convolve(white_noise, kernel, mode="valid")[:n_samples] * np.sqrt(1 - persistence**2)
+        clear_sky_index = 1 / (1 + np.exp(-1.5 * cloud - 0.5))
+
+        measurement_noise = 1 + rng.normal(0, self.noise, n_samples)
+        power_kw = np.clip(clear_sky_kw * clear_sky_index * measurement_noise, 0, self.capacity_kwp)
+
+        # drop single samples, and whole outages
+        keep = rng.random(n_samples) >= self.gap_probability
+        n_days = self.history / pd.Timedelta(days=1)
+        n_outages = rng.poisson(self.outage_probability * n_days)
+        outage_length = int(np.ceil(self.outage_duration / self.freq))
+        for outage_start in rng.integers(0, n_samples, n_outages):
+            keep[outage_start : outage_start + outage_length] = False
+
+        return pd.DataFrame({"timestamp": timestamps[keep], "power_kw": power_kw[keep]})
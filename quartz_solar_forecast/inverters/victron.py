@@ -1,8 +1,10 @@
-from typing import Callable
+from typing import Callable, Optional
 
 import pandas as pd
+import requests
 from datetime import datetime, timedelta
 from quartz_solar_forecast.inverters.inverter import AbstractInverter
+from quartz_solar_forecast.inverters.normalize import normalize_victron
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 try:
@@ -15,6 +17,7 @@ class VictronSettings(BaseSettings):
 
     username: str = Field(alias="VICTRON_USER")
     password: str = Field(alias="VICTRON_PASS")
+    api_url: Optional[str] = Field(alias="VICTRON_API_URL", default=None)
 
 
 class VictronInverter(AbstractInverter):
@@ -25,6 +28,9 @@ class VictronInverter(AbstractInverter):
 
     @classmethod
     def from_settings(cls, settings: VictronSettings):
+        if settings.api_url is not None:
+            return cls.from_url(settings.api_url, settings.username, settings.password)
+
         api = VRM_API(username=settings.username, password=settings.password)
         get_sites = lambda: api.get_user_sites(api.user_id)
         end = datetime.now()
@@ -32,6 +38,33 @@ class VictronInverter(AbstractInverter):
         get_kwh_stats = lambda site_id: api.get_kwh_stats(site_id, start=start, end=end)
         return cls(get_sites, get_kwh_stats)
 
+    @classmethod
+    def from_url(cls, api_url: str, username: str, password: str):
+        """
+        Make the inverter using the VRM v2 HTTP API at the given url directly, e.g. a local
+        stand-in for the VRM API, rather than through ocf_vrmapi
+        """
+        response = requests.post(f"{api_url}/v2/auth/login", json={"username": username, "password": password})
+        response.raise_for_status()
+        login = response.json()
+        headers = {"X-Authorization": f"Bearer {login['token']}"}
+
+        def get_sites():
+            response = requests.get(f"{api_url}/v2/users/{login['idUser']}/installations", headers=headers)
+            response.raise_for_status()
+            return response.json()
+
+        end = datetime.now()
+        start = end - timedelta(weeks=1)
+
+        def get_kwh_stats(site_id):
+            params = {"type": "kwh", "start": int(start.timestamp()), "end": int(end.timestamp())}
+            response = requests.get(f"{api_url}/v2/installations/{site_id}/stats", headers=headers, params=params)
+            response.raise_for_status()
+            return response.json()
+
+        return cls(get_sites, get_kwh_stats)
+
     def get_data(self, ts: pd.Timestamp) -> pd.DataFrame:
         sites = self.__get_sites()
         # get first site (bit of a guess)
@@ -41,8 +74,5 @@ class VictronInverter(AbstractInverter):
 
         kwh = stats["records"]["kwh"]
 
-        df = pd.DataFrame(kwh)
-
-        df[0] = pd.to_datetime(df[0], unit='ms')
-        df.columns = ["timestamp", "power_kw"]
-        return df
+        # convert the kWh produced in each interval to kW
+        return normalize_victron(kwh)
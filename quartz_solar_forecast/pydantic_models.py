@@ -6,6 +6,8 @@ from quartz_solar_forecast.inverters.givenergy import GivEnergySettings, GivEner
 from quartz_solar_forecast.inverters.mock import MockInverter
 from quartz_solar_forecast.inverters.solarman import SolarmanSettings, SolarmanInverter
 from quartz_solar_forecast.inverters.solis import SolisSettings, SolisInverter
+from quartz_solar_forecast.inverters.store import GenerationStore, GenerationStoreSettings, StoredInverter
+from quartz_solar_forecast.inverters.synthetic import SyntheticInverter
 from quartz_solar_forecast.inverters.victron import VictronSettings, VictronInverter
 
 
@@ -30,10 +32,20 @@ class PVSite(BaseModel):
     inverter_type: str = Field(
         default=None,
         description="The type of inverter used",
-        json_schema_extra=["enphase", "solis", "givenergy", "solarman", None],
+        json_schema_extra=["enphase", "solis", "givenergy", "solarman", "victron", "synthetic", None],
+    )
+    site_id: Optional[str] = Field(
+        default=None,
+        description="the site id in the generation store. If this is set and GENERATION_STORE_PATH "
+                    "is configured, live data is read from the store instead of the inverter",
     )
 
     def get_inverter(self):
+        if self.site_id is not None:
+            store_settings = GenerationStoreSettings()
+            if store_settings.path is not None:
+                return StoredInverter(GenerationStore(store_settings.path), self.site_id)
+
         if self.inverter_type == 'enphase':
             return EnphaseInverter(EnphaseSettings())
         elif self.inverter_type == 'solis':
@@ -44,6 +56,14 @@ class PVSite(BaseModel):
             return SolarmanInverter(SolarmanSettings())
         elif self.inverter_type == 'victron':
             return VictronInverter.from_settings(VictronSettings())
+        elif self.inverter_type == 'synthetic':
+            return SyntheticInverter(
+                latitude=self.latitude,
+                longitude=self.longitude,
+                capacity_kwp=self.capacity_kwp,
+                tilt=self.tilt,
+                orientation=self.orientation,
+            )
         else:
             return MockInverter()
 
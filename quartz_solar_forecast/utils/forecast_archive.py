@@ -0,0 +1,294 @@
+"""
+An append-only archive of forecasts
+
+Each forecast run is appended as a compressed Parquet part, partitioned by model and the month
+of the init time, and recorded in an index of site, model and init time. An append writes its
+index row as a small fragment, rather than rewriting the whole index, and `compact` merges the
+fragments into the index:
+
+    data/forecast_archive/index.parquet
+    data/forecast_archive/index/1721984400000000000-1a2b3c4d.parquet
+    data/forecast_archive/model=gb/month=2024-07/51.59_-1.89_4_20240726_0900.parquet
+
+A query reads the index first, so only the parts it needs are opened. `compact` also merges a
+month's parts into one file, sorted by site and init time and split into row groups, so that
+queries over a month read only the row groups of the sites and init times they ask for.
+
+The archive can be on any fsspec file system, e.g. "hf://datasets/..." for Hugging Face, where
+each file written is one commit. It assumes there is one writer at a time.
+"""
+import operator
+import time
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+import fsspec
+from fsspec.implementations.local import LocalFileSystem
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+FORECAST_ARCHIVE_DIR = "data/forecast_archive"
+
+ARCHIVE_SCHEMA = pa.schema(
+    [
+        ("site_id", pa.string()),
+        ("model", pa.string()),
+        ("forecast_init_time", pa.timestamp("ns")),
+        ("datetime", pa.timestamp("ns")),
+        ("power_kw", pa.float64()),
+    ]
+)
+
+INDEX_SCHEMA = pa.schema(
+    [
+        ("site_id", pa.string()),
+        ("model", pa.string()),
+        ("forecast_init_time", pa.timestamp("ns")),
+        ("path", pa.string()),
+    ]
+)
+
+# 48 hours of 15 minute forecasts, for 100 runs
+ROW_GROUP_SIZE = 19200
+
+COMPRESSION = "zstd"
+
+FILTER_OPS = {"==": operator.eq, ">=": operator.ge, "<=": operator.le}
+
+# the columns that identify a forecast run
+RUN_COLUMNS = ["site_id", "model", "forecast_init_time"]
+
+
+def site_id_from_location(latitude: float, longitude: float, capacity_kwp: float) -> str:
+    """
+    Make a site id from a site's location and capacity, as used in the per run csv file names
+    """
+    return f"{latitude}_{longitude}_{capacity_kwp}"
+
+
+class ForecastArchive:
+    """
+    Forecasts, by site, model and init time
+    """
+
+    def __init__(self, root: str = FORECAST_ARCHIVE_DIR, storage_options: Optional[dict] = None):
+        """
+        :param root: the directory or url of the archive
+        :param storage_options: options for the fsspec file system, e.g. a token
+        """
+        self.fs, self.root = fsspec.core.url_to_fs(root, **(storage_options or {}))
+        self.root = self.root.rstrip("/")
+
+    @property
+    def index_path(self) -> str:
+        return f"{self.root}/index.parquet"
+
+    @property
+    def index_fragment_dir(self) -> str:
+        return f"{self.root}/index"
+
+    def part_path(self, site_id: str, model: str, init_time: pd.Timestamp) -> str:
+        return f"{self.root}/model={model}/month={init_time:%Y-%m}/{site_id}_{init_time:%Y%m%d_%H%M}.parquet"
+
+    def _write_table(self, table: pa.Table, path: str, **kwargs):
+        self.fs.makedirs(path.rsplit("/", 1)[0], exist_ok=True)
+        if not isinstance(self.fs, LocalFileSystem):
+            # remote files are only created when their upload finishes, and a move is a copy
+            # and a delete, so they are written in place
+            with self.fs.open(path, "wb") as f:
+                pq.write_table(table, f, compression=COMPRESSION, **kwargs)
+            return
+
+        # write to a temporary file, so a failed write never leaves a part file
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with self.fs.open(tmp_path, "wb") as f:
+            pq.write_table(table, f, compression=COMPRESSION, **kwargs)
+        self.fs.mv(tmp_path, path)
+
+    def index_fragments(self) -> List[str]:
+        """
+        The index fragments that have not been merged into the index yet, oldest first
+        """
+        if not self.fs.exists(self.index_fragment_dir):
+            return []
+        # the fragment names start with the time they were written
+        return sorted(self.fs.glob(f"{self.index_fragment_dir}/*.parquet"))
+
+    def read_index(self) -> pd.DataFrame:
+        """
+        Read the index, including the fragments that have not been merged into it yet
+
+        :return: dataframe with site_id, model, forecast_init_time and path columns
+        """
+        return self._read_index(self.index_fragments())
+
+    def _read_index(self, fragments: List[str]) -> pd.DataFrame:
+        tables = []
+        if self.fs.exists(self.index_path):
+            with self.fs.open(self.index_path, "rb") as f:
+                tables.append(pq.read_table(f, schema=INDEX_SCHEMA))
+        if fragments:
+            tables.append(pq.ParquetDataset(fragments, filesystem=self.fs, schema=INDEX_SCHEMA).read())
+        if not tables:
+            return INDEX_SCHEMA.empty_table().to_pandas()
+
+        # a run that was appended again is replaced by its latest row
+        index_df = pa.concat_tables(tables).to_pandas()
+        index_df = index_df.drop_duplicates(["site_id", "model", "forecast_init_time"], keep="last")
+        return index_df.reset_index(drop=True)
+
+    def _write_index(self, index_df: pd.DataFrame):
+        index_df = index_df.sort_values(["model", "site_id", "forecast_init_time"]).reset_index(drop=True)
+        self._write_table(pa.Table.from_pandas(index_df, schema=INDEX_SCHEMA, preserve_index=False), self.index_path)
+
+    def append(self, forecast: pd.DataFrame, site_id: str, model: str, init_time: datetime) -> str:
+        """
+        Append one forecast run
+
+        Appending the same site, model and init time again replaces that run.
+
+        :param forecast: the forecast, indexed by datetime, with a power_kw column, as from run_forecast
+        :param site_id: the site
+        :param model: the model, e.g. "gb"
+        :param init_time: the init time of the forecast
+        :return: the path of the part that was written
+        """
+        init_time = pd.Timestamp(init_time).floor("min")
+        forecast_df = pd.DataFrame(
+            {
+                "site_id": site_id,
+                "model": model,
+                "forecast_init_time": init_time,
+                "datetime": pd.DatetimeIndex(forecast.index),
+                "power_kw": forecast["power_kw"].to_numpy(dtype=float),
+            }
+        ).sort_values("datetime")
+
+        path = self.part_path(site_id, model, init_time)
+        self._write_table(pa.Table.from_pandas(forecast_df, schema=ARCHIVE_SCHEMA, preserve_index=False), path)
+
+        index_row = pd.DataFrame(
+            {"site_id": [site_id], "model": [model], "forecast_init_time": [init_time], "path": [path]}
+        )
+        fragment_path = f"{self.index_fragment_dir}/{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet"
+        self._write_table(pa.Table.from_pandas(index_row, schema=INDEX_SCHEMA, preserve_index=False), fragment_path)
+
+        return path
+
+    def query(
+        self,
+        site_id: Optional[str] = None,
+        model: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Read the forecasts issued for a site and model in a time window
+
+        :param site_id: the site, by default all sites
+        :param model: the model, by default all models
+        :param start: the earliest init time (inclusive), by default no limit
+        :param end: the latest init time (inclusive), by default no limit
+        :param columns: the columns to read, by default all of them
+        :return: dataframe with the ARCHIVE_SCHEMA columns, sorted by site, model, init time and datetime
+        """
+        index_df = self.read_index()
+
+        filters = []
+        for column, op, value in [
+            ("site_id", "==", site_id),
+            ("model", "==", model),
+            ("forecast_init_time", ">=", None if start is None else pd.Timestamp(start)),
+            ("forecast_init_time", "<=", None if end is None else pd.Timestamp(end)),
+        ]:
+            if value is None:
+                continue
+            filters.append((column, op, value))
+            index_df = index_df[FILTER_OPS[op](index_df[column], value)]
+
+        if index_df.empty:
+            return ARCHIVE_SCHEMA.empty_table().to_pandas()[columns or ARCHIVE_SCHEMA.names]
+
+        table = self._read_runs(index_df, filters, columns)
+
+        sort_columns = [c for c in RUN_COLUMNS + ["datetime"] if c in table.column_names]
+        forecasts_df = table.to_pandas().sort_values(sort_columns, kind="stable").reset_index(drop=True)
+        return forecasts_df[columns or ARCHIVE_SCHEMA.names]
+
+    def _read_runs(
+        self, index_df: pd.DataFrame, filters: Optional[list] = None, columns: Optional[List[str]] = None
+    ) -> pa.Table:
+        """
+        Read the forecast runs in the index
+
+        A run that was appended again after its month was compacted is in both the compacted file
+        and a new part, so only the rows of each file whose run the index points at that file are
+        kept.
+
+        :param index_df: the index rows of the runs
+        :param filters: Parquet filters, which use the row group statistics to skip row groups
+        :param columns: the columns to read, by default all of them. The RUN_COLUMNS are always read
+        :return: the forecasts of the runs
+        """
+        read_columns = None if columns is None else list(dict.fromkeys(RUN_COLUMNS + columns))
+        run_schema = pa.schema([INDEX_SCHEMA.field(column) for column in RUN_COLUMNS])
+
+        tables = []
+        for path, runs_df in index_df.groupby("path", sort=False):
+            table = pq.ParquetDataset(
+                [path], filesystem=self.fs, schema=ARCHIVE_SCHEMA, filters=filters or None
+            ).read(columns=read_columns)
+            runs = pa.Table.from_pandas(runs_df[RUN_COLUMNS], schema=run_schema, preserve_index=False)
+            tables.append(table.join(runs, keys=RUN_COLUMNS, join_type="left semi"))
+
+        return pa.concat_tables(tables)
+
+    def merge_index(self) -> int:
+        """
+        Merge the index fragments into the index
+
+        :return: the number of fragments merged
+        """
+        fragments = self.index_fragments()
+        if fragments:
+            self._write_index(self._read_index(fragments))
+            self.fs.rm(fragments)
+        return len(fragments)
+
+    def compact(self, model: str, month: str) -> Optional[str]:
+        """
+        Merge the index fragments into the index, and the parts of one model and month into one file
+
+        :param model: the model
+        :param month: the month of the init times, e.g. "2024-07"
+        :return: the path of the merged file, or None if there were no parts to merge
+        """
+        fragments = self.index_fragments()
+        index_df = self._read_index(fragments)
+        in_month = (index_df["model"] == model) & (
+            pd.DatetimeIndex(index_df["forecast_init_time"]).strftime("%Y-%m") == month
+        )
+        old_paths = list(index_df.loc[in_month, "path"].unique())
+        if len(old_paths) < 2:
+            self.merge_index()
+            return None
+
+        table = self._read_runs(index_df[in_month]).select(ARCHIVE_SCHEMA.names)
+        table = table.sort_by([("site_id", "ascending"), ("forecast_init_time", "ascending"), ("datetime", "ascending")])
+
+        path = f"{self.root}/model={model}/month={month}/compacted-{uuid.uuid4().hex[:8]}.parquet"
+        self._write_table(table, path, row_group_size=ROW_GROUP_SIZE)
+
+        index_df.loc[in_month, "path"] = path
+        self._write_index(index_df)
+        # the fragments are in the index now, and they point at the old parts
+        if fragments:
+            self.fs.rm(fragments)
+
+        for old_path in old_paths:
+            self.fs.rm(old_path)
+
+        return path
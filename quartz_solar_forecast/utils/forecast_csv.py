@@ -1,10 +1,70 @@
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import List, Optional
+
 import pandas as pd
-from datetime import datetime, timedelta
-from quartz_solar_forecast.forecast import run_forecast
+from psp.serialization import load_model
+
+from quartz_solar_forecast.data import get_nwp
+from quartz_solar_forecast.forecast import predict_ocf, run_forecast
+from quartz_solar_forecast.forecasts.v1_tilt_orientation import MODEL_PATH
 from quartz_solar_forecast.pydantic_models import PVSite
 
 
+# the model is loaded once in each backfill worker process
+_model = None
+
+
+def _init_worker():
+    global _model
+    _model = load_model(MODEL_PATH)
+
+
+def make_init_times(init_time_freq: float, start: datetime, end: datetime) -> List[pd.DatetimeIndex]:
+    """
+    Make the forecast init times, grouped by date
+
+    :param init_time_freq: the time between init times [hours], this can be a fraction, e.g. 0.25
+    :param start: the first init time
+    :param end: the last possible init time
+    :return: the init times on each date
+    """
+    init_times = pd.date_range(start=start, end=end, freq=pd.Timedelta(hours=init_time_freq))
+    return [init_times[init_times.normalize() == date] for date in init_times.normalize().unique()]
+
+
+def forecast_date(
+    site: PVSite, init_times: pd.DatetimeIndex, nwp_source: str = "icon", model=None
+) -> pd.DataFrame:
+    """
+    Run the gb forecasts for init times on the same date
+
+    The NWP data covers the 7 days from the start of the init time's date, so it is the same for
+    every init time on a date and is only fetched once.
+
+    :param site: the PV site
+    :param init_times: the init times, all on the same date
+    :param nwp_source: the nwp data source
+    :param model: the loaded model, by default it is loaded for each forecast
+    :return: dataframe with datetime, power_kw and forecast_init_time columns
+    """
+    nwp_xr = get_nwp(site=site, ts=init_times[0].to_pydatetime(), nwp_source=nwp_source)
+
+    forecasts = []
+    for init_time in init_times:
+        print(f"Running forecast for initialization time: {init_time}")
+        # copy the site, as predict_ocf can change its capacity
+        predictions_df = predict_ocf(
+            site.model_copy(), model, init_time.to_pydatetime(), nwp_source, nwp_xr=nwp_xr
+        )
+        predictions_df = predictions_df.rename_axis("datetime").reset_index()
+        predictions_df["forecast_init_time"] = init_time
+        forecasts.append(predictions_df)
+
+    return pd.concat(forecasts, ignore_index=True)
+
+
 def generate_all_forecasts(
     init_time_freq: int,
     start: datetime,
@@ -14,19 +74,89 @@ def generate_all_forecasts(
     capacity_kwp: float,
 ) -> pd.DataFrame:
 
-    all_forecasts = pd.DataFrame()
+    site = PVSite(latitude=latitude, longitude=longitude, capacity_kwp=capacity_kwp)
 
-    init_time = start
-    while init_time <= end:
-        print(f"Running forecast for initialization time: {init_time}")
-        predictions_df = forecast_for_site(
-            latitude, longitude, capacity_kwp, init_time=init_time
-        )
-        predictions_df["forecast_init_time"] = init_time
-        all_forecasts = pd.concat([all_forecasts, predictions_df])
-        init_time += timedelta(hours=init_time_freq)
+    model = load_model(MODEL_PATH)
+
+    # the forecasts are collected and joined once, and the NWP data is fetched once per date
+    all_forecasts = [
+        forecast_date(site, date_init_times, model=model)
+        for date_init_times in make_init_times(init_time_freq, start, end)
+    ]
+
+    return pd.concat(all_forecasts, ignore_index=True)
+
+
+def _backfill_date(site: PVSite, init_times: pd.DatetimeIndex, nwp_source: str, partition_path: str) -> int:
+    """
+    Run the forecasts for one date in a backfill worker, and write them to the date's partition
+    """
+    forecasts = forecast_date(site, init_times, nwp_source=nwp_source, model=_model)
+
+    os.makedirs(os.path.dirname(partition_path), exist_ok=True)
+    forecasts.to_parquet(f"{partition_path}.tmp", index=False)
+    os.replace(f"{partition_path}.tmp", partition_path)
+
+    return len(forecasts)
+
+
+def backfill_forecasts(
+    init_time_freq: float,
+    start: datetime,
+    end: datetime,
+    latitude: float,
+    longitude: float,
+    capacity_kwp: float,
+    output_dir: str = "backfill_forecasts",
+    nwp_source: str = "icon",
+    max_workers: Optional[int] = None,
+) -> int:
+    """
+    Backfill gb forecasts for many init times, writing them to Parquet partitioned by date
+
+    Each date is run in a worker process, which loads the model once and fetches the NWP data
+    once for all the init times on the date. The forecasts are written as each date finishes,
+    to output_dir/date=YYYY-MM-DD/forecasts.parquet, so they are never all held in memory.
+    Dates that have already been written are skipped, so a backfill can be restarted.
+
+    :param init_time_freq: the time between init times [hours], this can be a fraction, e.g. 0.25
+    :param start: the first init time
+    :param end: the last possible init time
+    :param latitude: the latitude of the PV site
+    :param longitude: the longitude of the PV site
+    :param capacity_kwp: the capacity of the PV site [kWp]
+    :param output_dir: the directory of the partitioned output
+    :param nwp_source: the nwp data source
+    :param max_workers: the number of worker processes, defaults to the number of CPUs.
+        If this is 1, the dates are run in this process
+    :return: the number of forecast rows written
+    """
+    site = PVSite(latitude=latitude, longitude=longitude, capacity_kwp=capacity_kwp)
+
+    tasks = []
+    for date_init_times in make_init_times(init_time_freq, start, end):
+        partition_path = f"{output_dir}/date={date_init_times[0].date()}/forecasts.parquet"
+        if os.path.exists(partition_path):
+            print(f"Forecasts for {date_init_times[0].date()} are already done")
+            continue
+        tasks.append((site, date_init_times, nwp_source, partition_path))
+
+    rows_written = 0
+    if max_workers == 1:
+        # load model only once
+        _init_worker()
+        for i, task in enumerate(tasks):
+            rows_written += _backfill_date(*task)
+            print(f"Finished forecasts for {task[1][0].date()}, {i + 1} of {len(tasks)} dates")
+        return rows_written
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(_backfill_date, *task): task[1][0].date() for task in tasks}
+        for i, future in enumerate(as_completed(futures)):
+            rows_written += future.result()
+            print(f"Finished forecasts for {futures[future]}, {i + 1} of {len(tasks)} dates")
 
-    return all_forecasts
+    return rows_written
 
 
 def forecast_for_site(
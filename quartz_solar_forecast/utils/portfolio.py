@@ -0,0 +1,186 @@
+"""
+Forecasts for a portfolio of sites
+
+The sites are forecast concurrently in worker processes, which each load the model once. Each
+site's forecast is written to one Parquet file in long format, one row group per forecast, as
+soon as it finishes:
+
+    site_id | forecast_init_time  | time                | power_kw
+    site_1  | 2023-11-01 00:00:00 | 2023-11-01 00:00:00 | 0.0
+
+Only a few sites' forecasts are held in memory at once, however many sites there are.
+
+The site_id of each site is the key of its forecasts in the output. PVSite.site_id is also the
+site's id in the generation store of the fleet collector, so by default it is not passed on to
+the forecast, and a portfolio run does not read live data from the store even when
+GENERATION_STORE_PATH is set. With use_generation_store=True, it does.
+"""
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from psp.serialization import load_model
+
+from quartz_solar_forecast.forecast import predict_ocf
+from quartz_solar_forecast.forecasts.v1_tilt_orientation import MODEL_PATH
+from quartz_solar_forecast.pydantic_models import PVSite
+from quartz_solar_forecast.utils.precision import float_dtype
+
+PORTFOLIO_SCHEMA = pa.schema(
+    [
+        ("site_id", pa.string()),
+        ("forecast_init_time", pa.timestamp("ns")),
+        ("time", pa.timestamp("ns")),
+        ("power_kw", pa.float64()),
+    ]
+)
+
+
+def portfolio_schema(dtype: np.dtype) -> pa.Schema:
+    """
+    The schema of the portfolio forecasts, with power_kw in the float dtype of the forecasts
+    """
+    return PORTFOLIO_SCHEMA.set(3, pa.field("power_kw", pa.from_numpy_dtype(dtype)))
+
+# the model is loaded once in each worker process
+_model = None
+
+
+def _init_worker():
+    global _model
+    _model = load_model(MODEL_PATH)
+
+
+def read_sites(path: str) -> List[PVSite]:
+    """
+    Read the sites of a portfolio from a csv or Parquet file
+
+    :param path: file with site_id, latitude, longitude and capacity_kwp columns, and optional
+        tilt and orientation columns
+    :return: the sites
+    """
+    if path.endswith(".parquet"):
+        sites_df = pd.read_parquet(path)
+        sites_df["site_id"] = sites_df["site_id"].astype(str)
+    else:
+        sites_df = pd.read_csv(path, dtype={"site_id": str})
+    return [PVSite(**row.dropna().to_dict()) for _, row in sites_df.iterrows()]
+
+
+def forecast_site(
+    site: PVSite,
+    ts: datetime | str,
+    nwp_source: str = "icon",
+    dtype: Optional[np.dtype] = None,
+    use_generation_store: bool = False,
+) -> pd.DataFrame:
+    """
+    Run the gb forecast for one site, in long format
+
+    :param site: the PV site, with a site_id
+    :param ts: the forecast init time
+    :param nwp_source: the nwp data source
+    :param dtype: the dtype of the data and the forecast, by default from float_dtype
+    :param use_generation_store: whether the forecast reads the site's live data from the
+        generation store, by its site_id
+    :return: dataframe with site_id, forecast_init_time, time and power_kw columns
+    """
+    # the site_id is only the output key, unless the generation store is used
+    run_site = site.model_copy() if use_generation_store else site.model_copy(update={"site_id": None})
+    predictions_df = predict_ocf(run_site, _model, ts, nwp_source, dtype=dtype)
+
+    return pd.DataFrame(
+        {
+            "site_id": site.site_id,
+            "forecast_init_time": pd.Timestamp(ts),
+            "time": pd.DatetimeIndex(predictions_df.index),
+            "power_kw": predictions_df["power_kw"].to_numpy(),
+        }
+    )
+
+
+def run_portfolio_forecast(
+    sites: List[PVSite],
+    init_times: List[datetime | str],
+    output_path: str,
+    nwp_source: str = "icon",
+    max_workers: Optional[int] = None,
+    on_forecast: Optional[Callable[[str, int], None]] = None,
+    dtype: Optional[np.dtype] = None,
+    use_generation_store: bool = False,
+) -> List[Tuple[str, pd.Timestamp]]:
+    """
+    Forecast all the sites of a portfolio at each init time, and write the forecasts to Parquet
+
+    The output is written to a temporary file and renamed when all the forecasts have finished.
+    Forecasts that fail are left out of the output, and returned.
+
+    :param sites: the sites, each with a unique site_id
+    :param init_times: the forecast init times
+    :param output_path: the Parquet file to write
+    :param nwp_source: the nwp data source
+    :param max_workers: the number of worker processes, defaults to the number of CPUs
+    :param on_forecast: optional function called as each forecast finishes, with the site_id
+        and the number of rows written, 0 if the forecast failed
+    :param dtype: the dtype of the data and the forecasts, by default from float_dtype
+    :param use_generation_store: whether the forecasts read live data from the generation store
+        of the fleet collector, by site_id, if GENERATION_STORE_PATH is set
+    :return: the site_id and init time of each forecast that failed
+    """
+    site_ids = [site.site_id for site in sites]
+    if None in site_ids or len(set(site_ids)) != len(site_ids):
+        raise ValueError("Every site in the portfolio needs a unique site_id")
+
+    dtype = float_dtype(dtype)
+    schema = portfolio_schema(dtype)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    # limit the finished forecasts waiting to be written
+    max_pending = 2 * max_workers
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    tmp_path = f"{output_path}.tmp"
+
+    failed = []
+    n_done = 0
+    n_tasks = len(sites) * len(init_times)
+    tasks = ((site, pd.Timestamp(ts)) for ts in init_times for site in sites)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as pool, pq.ParquetWriter(
+        tmp_path, schema
+    ) as writer:
+        pending = {}
+        while True:
+            for site, ts in tasks:
+                pending[pool.submit(forecast_site, site, ts, nwp_source, dtype, use_generation_store)] = (site.site_id, ts)
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                site_id, ts = pending.pop(future)
+                n_done += 1
+                try:
+                    site_df = future.result()
+                except Exception as e:
+                    print(f"Forecast for site {site_id} at {ts} failed: {e}")
+                    failed.append((site_id, ts))
+                    if on_forecast is not None:
+                        on_forecast(site_id, 0)
+                    continue
+
+                writer.write_table(pa.Table.from_pandas(site_df, schema=schema, preserve_index=False))
+                if on_forecast is not None:
+                    on_forecast(site_id, len(site_df))
+                else:
+                    print(f"Finished forecast for site {site_id} at {ts}, {n_done} of {n_tasks}")
+
+    os.replace(tmp_path, output_path)
+
+    return failed
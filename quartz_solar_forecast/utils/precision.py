@@ -0,0 +1,31 @@
+"""
+The float precision of the forecast data
+
+By default the nwp data, PV data, model features and forecasts are float64. Setting
+QUARTZ_FLOAT32=true switches them all to float32, which halves their memory, e.g. for batch
+and backfill runs over large portfolios. The forecasts change by much less than the model's error.
+"""
+from typing import Optional
+
+import numpy as np
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class PrecisionSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_file='.env', extra='ignore')
+
+    float32: bool = Field(alias="QUARTZ_FLOAT32", default=False)
+
+
+def float_dtype(dtype: Optional[np.dtype] = None) -> np.dtype:
+    """
+    Get the float dtype of the forecast data
+
+    :param dtype: the dtype to use, by default float32 if QUARTZ_FLOAT32 is set, and float64 otherwise
+    :return: the dtype
+    """
+    if dtype is not None:
+        return np.dtype(dtype)
+
+    return np.dtype(np.float32 if PrecisionSettings().float32 else np.float64)
@@ -0,0 +1,97 @@
+"""
+Resample live PV generation onto the model's 15 minute grid
+
+Inverters return whatever they have, e.g. 5 minute Enphase intervals, a single GivEnergy point
+or 15 minute to hourly Victron energy. The model works on a regular 15 minute grid and only
+looks at the recent history, so live data is aligned to that grid before it is handed over.
+"""
+import numpy as np
+import pandas as pd
+
+# the time resolution of the model
+PV_FREQ = pd.Timedelta("15min")
+
+# how much PV history is given to the model. The inverters all fetch the last week of data.
+PV_LOOKBACK = pd.Timedelta(days=7)
+
+
+def resample_pv_data(
+    live_generation_kw: pd.DataFrame,
+    ts: pd.Timestamp,
+    lookback: pd.Timedelta = PV_LOOKBACK,
+    freq: pd.Timedelta = PV_FREQ,
+) -> pd.DataFrame:
+    """
+    Resample live generation data onto a regular grid ending at ts
+
+    Each grid timestamp is the average power over the period ending at that timestamp, i.e.
+    the samples in (t - freq, t]. Samples that cover more than one period, e.g. hourly
+    energy, are spread back over the periods they cover. Periods with no data are NaN and
+    flagged with `is_gap`. Periods before the first observation are dropped.
+
+    :param live_generation_kw: DataFrame with timestamp and power_kw columns
+    :param ts: the forecast time, only data up to this time is used
+    :param lookback: how far back from ts to keep data
+    :param freq: the grid resolution
+    :return: DataFrame with timestamp, power_kw and is_gap columns, sorted by timestamp.
+        This is empty if there is no data in the lookback window
+    """
+    ts = pd.Timestamp(ts)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+
+    end = ts.floor(freq)
+    start = end - lookback
+    n_periods = int(lookback / freq)
+
+    timestamps = live_generation_kw["timestamp"].to_numpy(dtype="datetime64[ns]")
+    power_kw = live_generation_kw["power_kw"].to_numpy(dtype=np.float64)
+
+    # keep the series sorted, so the window can be found with a binary search
+    if np.any(timestamps[1:] < timestamps[:-1]):
+        order = np.argsort(timestamps, kind="stable")
+        timestamps = timestamps[order]
+        power_kw = power_kw[order]
+
+    first = np.searchsorted(timestamps, start.to_datetime64(), side="right")
+    last = np.searchsorted(timestamps, end.to_datetime64(), side="right")
+    timestamps = timestamps[first:last]
+    power_kw = power_kw[first:last]
+
+    valid = ~np.isnan(power_kw)
+    if not valid.any():
+        return pd.DataFrame(
+            {
+                "timestamp": pd.Series([], dtype="datetime64[ns]"),
+                "power_kw": pd.Series([], dtype=np.float64),
+                "is_gap": pd.Series([], dtype=bool),
+            }
+        )
+
+    # the period each sample falls into, (start + i * freq, start + (i + 1) * freq]
+    offset_ns = (timestamps - start.to_datetime64()).astype(np.int64)
+    period = (offset_ns - 1) // freq.value
+
+    counts = np.bincount(period[valid], minlength=n_periods)
+    sums = np.bincount(period[valid], weights=power_kw[valid], minlength=n_periods)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        resampled_kw = pd.Series(sums / counts)
+
+    # samples coarser than the grid cover the periods before them too. Gaps only make the
+    # spacing bigger, so the smallest spacing is the sample interval
+    spacing = np.diff(timestamps).astype(np.int64)
+    spacing = spacing[spacing > 0]
+    if len(spacing) > 0:
+        periods_covered = int(np.ceil(spacing.min() / freq.value))
+        if periods_covered > 1:
+            resampled_kw = resampled_kw.bfill(limit=periods_covered - 1)
+
+    first_period = period[valid][0]
+    resampled_kw = resampled_kw.to_numpy()[first_period:]
+
+    grid = pd.date_range(start=start + freq, end=end, freq=freq)[first_period:]
+
+    return pd.DataFrame(
+        {"timestamp": grid, "power_kw": resampled_kw, "is_gap": np.isnan(resampled_kw)}
+    )
+
@@ -0,0 +1,189 @@
+"""
+A local store of historical weather data from the Open-Meteo archive API
+
+For timestamps more than 90 days back, get_nwp uses the Open-Meteo archive API for the 7 days
+from the timestamp's date. A backfill over a year would request overlapping 7 day windows
+thousands of times. Instead, `NWPArchive.prefetch` pulls one long date range for a site in one
+request and stores it locally, and get_nwp then slices its windows from the store.
+
+The data is stored as one Parquet file per grid cell, with the coordinates rounded to
+ARCHIVE_GRID_DECIMALS, so nearby sites share the same data:
+
+    data/nwp/archive/51.75_-1.25.parquet
+"""
+import os
+from datetime import date, datetime
+from typing import List, Optional
+
+import openmeteo_requests
+import pandas as pd
+import requests
+import requests_cache
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from retry_requests import retry
+
+from quartz_solar_forecast.weather.decode import hourly_to_df
+from quartz_solar_forecast.weather.endpoints import weather_api
+
+# the Open-Meteo variables, and their names in the nwp data used by the models
+NWP_VARIABLES = {
+    "temperature_2m": "t",
+    "precipitation": "prate",
+    "cloud_cover_low": "lcc",
+    "cloud_cover_mid": "mcc",
+    "cloud_cover_high": "hcc",
+    "wind_speed_10m": "si10",
+    "shortwave_radiation": "dswrf",
+    "direct_radiation": "dlwrf",
+}
+
+# 0.01 degrees is about 1 km, much finer than the archive's grid
+ARCHIVE_GRID_DECIMALS = 2
+
+
+class NWPArchiveSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_file='.env', extra='ignore')
+
+    archive_dir: Optional[str] = Field(alias="NWP_ARCHIVE_DIR", default="data/nwp/archive")
+
+
+def make_openmeteo_client(cache: bool = True) -> openmeteo_requests.Client:
+    """
+    Make an Open-Meteo API client, with retries on errors
+
+    :param cache: whether to keep the responses in a cache that never expires, so a repeated
+        request never reaches Open-Meteo. Without it, every request fetches the latest data
+    """
+    session = requests_cache.CachedSession('.cache', expire_after=-1) if cache else requests.Session()
+    retry_session = retry(session, retries=5, backoff_factor=0.2)
+    return openmeteo_requests.Client(session=retry_session)
+
+
+class NWPArchive:
+    """
+    Historical hourly weather data, by grid cell
+    """
+
+    def __init__(self, archive_dir: str = "data/nwp/archive"):
+        self.archive_dir = archive_dir
+
+    @classmethod
+    def from_settings(cls, settings: Optional[NWPArchiveSettings] = None) -> Optional["NWPArchive"]:
+        """
+        Make the archive from the environment, or None if NWP_ARCHIVE_DIR is set to empty
+        """
+        settings = NWPArchiveSettings() if settings is None else settings
+        return cls(settings.archive_dir) if settings.archive_dir else None
+
+    @staticmethod
+    def grid_cell(latitude: float, longitude: float):
+        return round(latitude, ARCHIVE_GRID_DECIMALS), round(longitude, ARCHIVE_GRID_DECIMALS)
+
+    def path(self, latitude: float, longitude: float) -> str:
+        latitude, longitude = self.grid_cell(latitude, longitude)
+        return f"{self.archive_dir}/{latitude}_{longitude}.parquet"
+
+    def read(self, latitude: float, longitude: float, start: date, end: date) -> Optional[pd.DataFrame]:
+        """
+        Read the hourly data for whole days
+
+        :param latitude: the latitude of the site
+        :param longitude: the longitude of the site
+        :param start: the first day
+        :param end: the last day (inclusive)
+        :return: dataframe indexed by time, with a column for each of the NWP_VARIABLES names,
+            or None if the store does not have every hour of the days
+        """
+        path = self.path(latitude, longitude)
+        if not os.path.exists(path):
+            return None
+
+        start = pd.Timestamp(start)
+        end = pd.Timestamp(end) + pd.Timedelta(hours=23)
+        df = pd.read_parquet(path, filters=[("time", ">=", start), ("time", "<=", end)])
+
+        n_hours = int((end - start) / pd.Timedelta(hours=1)) + 1
+        if len(df) != n_hours:
+            return None
+
+        return df
+
+    def prefetch(
+        self,
+        latitude: float,
+        longitude: float,
+        start: date,
+        end: date,
+        openmeteo: Optional[openmeteo_requests.Client] = None,
+    ) -> int:
+        """
+        Fetch a date range from the archive API, in one request, and add it to the store
+
+        :param latitude: the latitude of the site
+        :param longitude: the longitude of the site
+        :param start: the first day
+        :param end: the last day (inclusive)
+        :param openmeteo: the Open-Meteo client, by default one is made
+        :return: the number of hours in the store for the grid cell
+        """
+        openmeteo = make_openmeteo_client() if openmeteo is None else openmeteo
+        cell_latitude, cell_longitude = self.grid_cell(latitude, longitude)
+
+        params = {
+            "latitude": cell_latitude,
+            "longitude": cell_longitude,
+            "start_date": f"{start}",
+            "end_date": f"{end}",
+            "hourly": list(NWP_VARIABLES),
+        }
+        response = weather_api(openmeteo, "archive", params)
+        df = hourly_to_df(response[0].Hourly(), list(NWP_VARIABLES.values()))
+
+        path = self.path(latitude, longitude)
+        if os.path.exists(path):
+            df = pd.concat([pd.read_parquet(path), df])
+            df = df[~df.index.duplicated(keep="last")]
+        df = df.sort_index()
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        # one row group per 30 days, so reads of a window only decode the row groups they need
+        df.to_parquet(f"{path}.tmp", row_group_size=24 * 30)
+        os.replace(f"{path}.tmp", path)
+
+        return len(df)
+
+
+def prefetch_sites(
+    locations: List[tuple],
+    start: datetime,
+    end: datetime,
+    archive: Optional[NWPArchive] = None,
+    forecast_days: int = 7,
+):
+    """
+    Prefetch the archive data for forecasts of many sites
+
+    Each grid cell is fetched in one request, covering the forecasts from start to end, i.e.
+    up to forecast_days after the end.
+
+    :param locations: the (latitude, longitude) of each site
+    :param start: the first forecast init time
+    :param end: the last forecast init time
+    :param archive: the archive, by default from the environment
+    :param forecast_days: the days of weather data each forecast uses, after its init date
+    """
+    archive = NWPArchive.from_settings() if archive is None else archive
+    if archive is None:
+        raise ValueError("NWP_ARCHIVE_DIR is set to empty, so there is no archive to prefetch to")
+
+    start_date = pd.Timestamp(start).date()
+    end_date = min(
+        (pd.Timestamp(end) + pd.Timedelta(days=forecast_days)).date(), pd.Timestamp.now().date()
+    )
+
+    openmeteo = make_openmeteo_client()
+    cells = sorted({NWPArchive.grid_cell(latitude, longitude) for latitude, longitude in locations})
+    for i, (latitude, longitude) in enumerate(cells):
+        print(f"Prefetching archive weather for {latitude}, {longitude}, {i + 1} of {len(cells)}")
+        archive.prefetch(latitude, longitude, start_date, end_date, openmeteo=openmeteo)
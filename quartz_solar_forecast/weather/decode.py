@@ -0,0 +1,98 @@
+"""
+Decode Open-Meteo responses
+
+The responses are flatbuffers, and `ValuesAsNumpy` gives a float32 view of each variable's
+values in the buffer, without copying them. `decode_hourly` copies the views straight into one
+preallocated (step, variable) array, in the dtype the model needs, and `make_nwp_dataset` wraps
+that array in xarray, so the nwp data is assembled with one copy and no pandas in between.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+
+def hourly_times(hourly) -> np.ndarray:
+    """
+    The times of the hourly data of an Open-Meteo response
+
+    :param hourly: the hourly data of the response
+    :return: datetime64[ns] array
+    """
+    start = np.datetime64(int(hourly.Time()), "s")
+    end = np.datetime64(int(hourly.TimeEnd()), "s")
+    return np.arange(start, end, np.timedelta64(int(hourly.Interval()), "s")).astype("datetime64[ns]")
+
+
+def decode_hourly(
+    hourly,
+    variable_indices: Sequence[int],
+    out: Optional[np.ndarray] = None,
+    column_offset: int = 0,
+    dtype: np.dtype = np.float64,
+) -> np.ndarray:
+    """
+    Copy variables of an Open-Meteo response into the columns of a (step, variable) array
+
+    :param hourly: the hourly data of the response
+    :param variable_indices: the indices of the variables to copy, in the order they were requested
+    :param out: the array to copy into, by default a new one is made with a column for each variable
+    :param column_offset: the column of out for the first variable
+    :param dtype: the dtype of the new array, if out is not given
+    :return: the array
+    """
+    if out is None:
+        n_steps = len(hourly_times(hourly))
+        out = np.empty((n_steps, len(variable_indices)), dtype=dtype)
+
+    for column, variable_index in enumerate(variable_indices):
+        out[:, column_offset + column] = hourly.Variables(variable_index).ValuesAsNumpy()
+
+    return out
+
+
+def hourly_to_df(hourly, variables: List[str]) -> pd.DataFrame:
+    """
+    Convert the hourly data of an Open-Meteo response to a dataframe
+
+    :param hourly: the hourly data of the response
+    :param variables: the names of the variables, in the order they were requested
+    :return: dataframe indexed by time, with a column for each variable
+    """
+    values = decode_hourly(hourly, range(len(variables)))
+    return pd.DataFrame(values, index=pd.DatetimeIndex(hourly_times(hourly), name="time"), columns=variables)
+
+
+def make_nwp_dataset(
+    values: np.ndarray,
+    times: np.ndarray,
+    variables: List[str],
+    nwp_source: str,
+    latitude: float,
+    longitude: float,
+) -> xr.Dataset:
+    """
+    Wrap a (step, variable) array of nwp data in xarray, as the gb model expects it
+
+    :param values: the nwp data, with a row for each time and a column for each variable
+    :param times: the time of each row
+    :param variables: the name of each column
+    :param nwp_source: the nwp data source, used as the name of the data variable
+    :param latitude: the latitude of the site
+    :param longitude: the longitude of the site
+    :return: dataset with step and variable dimensions, and x, y and time coordinates
+    """
+    times = np.asarray(times, dtype="datetime64[ns]")
+
+    data_xr = xr.DataArray(
+        data=values,
+        dims=["step", "variable"],
+        coords=dict(
+            step=("step", times - times[0]),
+            variable=np.array(variables, dtype=object),
+        ),
+    )
+    data_xr = data_xr.to_dataset(name=nwp_source)
+    data_xr = data_xr.assign_coords({"x": [longitude], "y": [latitude], "time": times[:1]})
+    return data_xr
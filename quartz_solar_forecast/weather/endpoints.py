@@ -0,0 +1,153 @@
+"""
+The Open-Meteo endpoints, with a fallback to the public service
+
+docker-compose.yaml runs a local Open-Meteo server on port 8080, which has lower latency and no
+rate limits. Each endpoint's base url can be set, e.g. in .env
+
+    OPEN_METEO_FORECAST_URL=http://localhost:8080/v1/forecast
+    OPEN_METEO_ARCHIVE_URL=http://localhost:8080/v1/archive
+
+A configured endpoint is health checked before it is used, and the result is kept for
+OPEN_METEO_HEALTH_CHECK_SECONDS. If it is down, or a request to it fails, e.g. because the local
+server has not synced the model, the request goes to the public service instead, unless
+OPEN_METEO_FALLBACK is false.
+"""
+import time
+from typing import Dict, List, Optional, Tuple
+
+import openmeteo_requests
+import requests
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+PUBLIC_URLS = {
+    "forecast": "https://api.open-meteo.com/v1/forecast",
+    "archive": "https://archive-api.open-meteo.com/v1/archive",
+}
+
+HEALTH_CHECK_TIMEOUT = 2
+
+# url -> (healthy, time.monotonic() of the check)
+_health: Dict[str, Tuple[bool, float]] = {}
+
+
+class OpenMeteoSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_file='.env', extra='ignore')
+
+    forecast_url: str = Field(alias="OPEN_METEO_FORECAST_URL", default=PUBLIC_URLS["forecast"])
+    archive_url: str = Field(alias="OPEN_METEO_ARCHIVE_URL", default=PUBLIC_URLS["archive"])
+    fallback: bool = Field(alias="OPEN_METEO_FALLBACK", default=True)
+    health_check_seconds: float = Field(alias="OPEN_METEO_HEALTH_CHECK_SECONDS", default=60)
+
+    def url(self, endpoint: str) -> str:
+        """
+        The configured url of an endpoint, "forecast" or "archive"
+        """
+        if endpoint not in PUBLIC_URLS:
+            raise ValueError(f"Unknown Open-Meteo endpoint {endpoint}, choose from {list(PUBLIC_URLS)}")
+        return getattr(self, f"{endpoint}_url")
+
+
+def check_health(url: str, timeout: float = HEALTH_CHECK_TIMEOUT) -> bool:
+    """
+    Check that an Open-Meteo server is up
+
+    The request has no parameters, so a healthy server answers with a 400 error, and any
+    response below 500 means it is up.
+
+    :param url: the endpoint url
+    :param timeout: the timeout of the request [seconds]
+    :return: whether the server is up
+    """
+    try:
+        response = requests.get(url, timeout=timeout)
+    except requests.exceptions.RequestException:
+        return False
+
+    return response.status_code < 500
+
+
+def is_healthy(url: str, max_age_seconds: float) -> bool:
+    """
+    Whether an endpoint is up, from a health check at most max_age_seconds old
+    """
+    healthy, checked = _health.get(url, (False, -float("inf")))
+    if time.monotonic() - checked > max_age_seconds:
+        healthy = check_health(url)
+        _health[url] = (healthy, time.monotonic())
+
+    return healthy
+
+
+def endpoint_urls(endpoint: str, settings: Optional[OpenMeteoSettings] = None) -> List[str]:
+    """
+    The urls to try for an endpoint, in order
+
+    :param endpoint: the endpoint, "forecast" or "archive"
+    :param settings: the settings, by default from the environment
+    :return: the configured url, if it is healthy or there is no fallback, then the public url
+    """
+    settings = OpenMeteoSettings() if settings is None else settings
+    url = settings.url(endpoint)
+    public_url = PUBLIC_URLS[endpoint]
+
+    if url == public_url:
+        return [public_url]
+    if not settings.fallback:
+        return [url]
+    if is_healthy(url, settings.health_check_seconds):
+        return [url, public_url]
+
+    print(f"Open-Meteo at {url} is down, using {public_url}")
+    return [public_url]
+
+
+def weather_api(
+    openmeteo: openmeteo_requests.Client,
+    endpoint: str,
+    params: dict,
+    settings: Optional[OpenMeteoSettings] = None,
+) -> list:
+    """
+    Request an Open-Meteo endpoint, falling back to the public service if the configured one fails
+
+    :param openmeteo: the Open-Meteo client
+    :param endpoint: the endpoint, "forecast" or "archive"
+    :param params: the parameters of the request
+    :param settings: the settings, by default from the environment
+    :return: the responses, one for each location and model
+    """
+    urls = endpoint_urls(endpoint, settings)
+
+    for i, url in enumerate(urls):
+        try:
+            return openmeteo.weather_api(url, params=params)
+        except Exception as e:
+            if i == len(urls) - 1:
+                raise
+            print(f"Open-Meteo request to {url} failed, using {urls[i + 1]}. Error: {e}")
+            # skip the failing endpoint until its next health check
+            _health[url] = (False, time.monotonic())
+
+
+def endpoint_health(settings: Optional[OpenMeteoSettings] = None) -> Dict[str, dict]:
+    """
+    Check the health of each endpoint now
+
+    :param settings: the settings, by default from the environment
+    :return: for each endpoint, its url, whether it is up, and whether requests fall back to the public url
+    """
+    settings = OpenMeteoSettings() if settings is None else settings
+
+    health = {}
+    for endpoint in PUBLIC_URLS:
+        url = settings.url(endpoint)
+        healthy = check_health(url)
+        _health[url] = (healthy, time.monotonic())
+        health[endpoint] = {
+            "url": url,
+            "healthy": healthy,
+            "fallback": PUBLIC_URLS[endpoint] if settings.fallback and url != PUBLIC_URLS[endpoint] else None,
+        }
+
+    return health
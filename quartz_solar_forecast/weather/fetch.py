@@ -0,0 +1,205 @@
+"""
+One weather fetch for all the forecast models
+
+The gb model uses the ICON, GFS or UKMO variables, and the GFS visibility, for 8 days. The xgb
+model uses the best match variables for 3 days. Open-Meteo's forecast API can return several
+models for one location in one request, so the union of the variables and the longest time
+window are fetched once, and each forecast model is given its own view of the data.
+
+    weather = get_forecast_weather(51.75, -1.25, date(2024, 7, 1), ["gb", "xgb"])
+    weather["gb"]   # nwp dataset, with variables t, prate, lcc, mcc, hcc, si10, dswrf, dlwrf, vis
+    weather["xgb"]  # dataframe with date, temperature_2m, relative_humidity_2m, ...
+"""
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import openmeteo_requests
+import pandas as pd
+import xarray as xr
+
+from quartz_solar_forecast.weather.archive import NWP_VARIABLES, make_openmeteo_client
+from quartz_solar_forecast.weather.decode import decode_hourly, hourly_times, hourly_to_df, make_nwp_dataset
+from quartz_solar_forecast.weather.endpoints import weather_api
+
+# the Open-Meteo model of each gb nwp source
+NWP_SOURCE_MODELS = {"icon": "icon_seamless", "gfs": "gfs_seamless", "ukmo": "ukmo_seamless"}
+
+# the gb model takes visibility from GFS, whichever nwp source it uses
+VISIBILITY_MODEL = "gfs_seamless"
+
+# the Open-Meteo model and variables of the xgb model, in the order of its features
+XGB_MODEL = "best_match"
+XGB_VARIABLES = [
+    "temperature_2m",
+    "relative_humidity_2m",
+    "dew_point_2m",
+    "precipitation",
+    "surface_pressure",
+    "cloud_cover",
+    "cloud_cover_low",
+    "cloud_cover_mid",
+    "cloud_cover_high",
+    "wind_speed_10m",
+    "wind_direction_10m",
+    "is_day",
+    "direct_radiation",
+    "diffuse_radiation",
+]
+
+# the days of weather data each forecast model uses, after the forecast's date
+MODEL_DAYS = {"gb": 7, "xgb": 2}
+
+
+def request_weather(
+    latitude: float,
+    longitude: float,
+    start_date: date,
+    end_date: date,
+    model_variables: Dict[str, List[str]],
+    openmeteo: Optional[openmeteo_requests.Client] = None,
+) -> Tuple[List[str], Dict[str, object]]:
+    """
+    Request the hourly variables of several Open-Meteo models, in one request
+
+    :param latitude: the latitude of the location
+    :param longitude: the longitude of the location
+    :param start_date: the first day
+    :param end_date: the last day (inclusive)
+    :param model_variables: the variables to get from each Open-Meteo model
+    :param openmeteo: the Open-Meteo client, by default one is made
+    :return: the variables requested, in order, and the hourly data of the response for each model
+    """
+    openmeteo = make_openmeteo_client() if openmeteo is None else openmeteo
+
+    models = list(model_variables)
+    variables = list(dict.fromkeys(variable for names in model_variables.values() for variable in names))
+
+    params = {
+        "latitude": latitude,
+        "longitude": longitude,
+        "start_date": f"{start_date}",
+        "end_date": f"{end_date}",
+        "hourly": variables,
+        "models": models,
+        "timezone": "GMT",
+    }
+
+    # there is one response for each model, in the order they were requested
+    responses = weather_api(openmeteo, "forecast", params)
+
+    return variables, {model: response.Hourly() for model, response in zip(models, responses)}
+
+
+def fetch_weather(
+    latitude: float,
+    longitude: float,
+    start_date: date,
+    end_date: date,
+    model_variables: Dict[str, List[str]],
+    openmeteo: Optional[openmeteo_requests.Client] = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Fetch the hourly variables of several Open-Meteo models, in one request
+
+    :param latitude: the latitude of the location
+    :param longitude: the longitude of the location
+    :param start_date: the first day
+    :param end_date: the last day (inclusive)
+    :param model_variables: the variables to get from each Open-Meteo model
+    :param openmeteo: the Open-Meteo client, by default one is made
+    :return: for each Open-Meteo model, dataframe indexed by time with a column for each of its variables
+    """
+    variables, hourly = request_weather(latitude, longitude, start_date, end_date, model_variables, openmeteo)
+
+    return {model: hourly_to_df(hourly[model], variables)[model_variables[model]] for model in model_variables}
+
+
+def decode_nwp(
+    variables: List[str],
+    hourly: Dict[str, object],
+    nwp_source: str,
+    latitude: float,
+    longitude: float,
+    dtype: np.dtype = np.float64,
+) -> xr.Dataset:
+    """
+    Decode the gb model's nwp data from the responses, straight into one (step, variable) array
+
+    :param variables: the variables requested, in order
+    :param hourly: the hourly data of the response for each Open-Meteo model
+    :param nwp_source: the nwp data source of the gb model
+    :param latitude: the latitude of the site
+    :param longitude: the longitude of the site
+    :param dtype: the dtype of the nwp data
+    :return: the nwp data, as the gb model expects it
+    """
+    source_hourly = hourly[NWP_SOURCE_MODELS[nwp_source]]
+    times = hourly_times(source_hourly)
+
+    values = np.empty((len(times), len(NWP_VARIABLES) + 1), dtype=dtype)
+    decode_hourly(source_hourly, [variables.index(variable) for variable in NWP_VARIABLES], out=values)
+    decode_hourly(
+        hourly[VISIBILITY_MODEL], [variables.index("visibility")], out=values, column_offset=len(NWP_VARIABLES)
+    )
+
+    return make_nwp_dataset(
+        values, times, list(NWP_VARIABLES.values()) + ["vis"], nwp_source, latitude, longitude
+    )
+
+
+def get_forecast_weather(
+    latitude: float,
+    longitude: float,
+    start_date: date,
+    forecast_models: List[str],
+    nwp_source: str = "icon",
+    openmeteo: Optional[openmeteo_requests.Client] = None,
+    dtype: np.dtype = np.float64,
+) -> Dict[str, object]:
+    """
+    Get the weather data for one or more forecast models, in one request
+
+    :param latitude: the latitude of the site
+    :param longitude: the longitude of the site
+    :param start_date: the date of the forecast
+    :param forecast_models: the forecast models, "gb" and/or "xgb"
+    :param nwp_source: the nwp data source of the gb model. Either "gfs", "icon" or "ukmo"
+    :param openmeteo: the Open-Meteo client, by default one is made
+    :param dtype: the dtype of the gb model's nwp data
+    :return: for each forecast model, its view of the weather data. For "gb" this is the nwp
+        xarray dataset, and for "xgb" a dataframe with a date column
+    """
+    if nwp_source not in NWP_SOURCE_MODELS:
+        raise Exception(f'Source ({nwp_source}) must be either "icon", "gfs", or "ukmo"')
+    unknown_models = set(forecast_models) - set(MODEL_DAYS)
+    if unknown_models:
+        raise ValueError(f"Unsupported models: {sorted(unknown_models)}. Choose between 'xgb' and 'gb'")
+
+    model_variables: Dict[str, List[str]] = {}
+
+    def add_variables(model: str, variables: List[str]):
+        model_variables[model] = list(dict.fromkeys(model_variables.get(model, []) + variables))
+
+    if "gb" in forecast_models:
+        add_variables(NWP_SOURCE_MODELS[nwp_source], list(NWP_VARIABLES))
+        add_variables(VISIBILITY_MODEL, ["visibility"])
+    if "xgb" in forecast_models:
+        add_variables(XGB_MODEL, XGB_VARIABLES)
+
+    start_date = pd.Timestamp(start_date)
+    end_date = start_date + pd.Timedelta(days=max(MODEL_DAYS[model] for model in forecast_models))
+    variables, hourly = request_weather(
+        latitude, longitude, start_date.date(), end_date.date(), model_variables, openmeteo
+    )
+
+    views = {}
+    if "gb" in forecast_models:
+        views["gb"] = decode_nwp(variables, hourly, nwp_source, latitude, longitude, dtype=dtype)
+    if "xgb" in forecast_models:
+        end = start_date + pd.Timedelta(days=MODEL_DAYS["xgb"] + 1)
+        xgb_df = hourly_to_df(hourly[XGB_MODEL], variables)[XGB_VARIABLES]
+        xgb_df = xgb_df[(xgb_df.index >= start_date) & (xgb_df.index < end)]
+        views["xgb"] = xgb_df.rename_axis("date").reset_index()
+
+    return views
@@ -0,0 +1,147 @@
+"""
+Stale-while-revalidate serving of the recent nwp data
+
+When Open-Meteo is slow or failing, fetching the nwp data for a forecast request retries with
+backoff, and the request blocks the whole time. With NWP_STALE_WHILE_REVALIDATE=true, the nwp
+data of each location, nwp source and forecast date is kept in memory, and a request
+
+- uses the cached data straight away, if it was fetched at most NWP_MAX_STALE_MINUTES ago, and
+  refreshes it in a background thread if it is more than NWP_REFRESH_MINUTES old
+- fetches the data, and waits for it, if there is none or it is too stale
+
+The nwp data is fetched without the HTTP cache of the other Open-Meteo requests, which never
+expires, so a refresh always gets the latest data from Open-Meteo, and the dataset's
+"fetched_at" attribute is the UTC time Open-Meteo served it. The forecast can then report the
+age of its nwp data.
+
+With stale-while-revalidate off, the data is fetched through the HTTP cache as before. It may
+be from an earlier request, so its age is not known and "fetched_at" is not set.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+from quartz_solar_forecast.weather.archive import make_openmeteo_client
+from quartz_solar_forecast.weather.fetch import get_forecast_weather
+
+# the number of locations, nwp sources and dates kept in memory
+MAX_CACHED = 1024
+
+_cache: "OrderedDict[Tuple, xr.Dataset]" = OrderedDict()
+_refreshing = set()
+_lock = threading.Lock()
+_refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="nwp-refresh")
+
+
+class NWPServingSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_file='.env', extra='ignore')
+
+    stale_while_revalidate: bool = Field(alias="NWP_STALE_WHILE_REVALIDATE", default=False)
+    max_stale_minutes: float = Field(alias="NWP_MAX_STALE_MINUTES", default=180)
+    refresh_minutes: float = Field(alias="NWP_REFRESH_MINUTES", default=15)
+
+
+def nwp_age_seconds(nwp_xr: xr.Dataset, now: Optional[pd.Timestamp] = None) -> Optional[float]:
+    """
+    The age of the nwp data, from its "fetched_at" attribute
+
+    :param nwp_xr: the nwp data
+    :param now: the current UTC time, by default now
+    :return: the seconds since the data was fetched, or None if it is not known
+    """
+    fetched_at = nwp_xr.attrs.get("fetched_at")
+    if fetched_at is None:
+        return None
+
+    now = pd.Timestamp.now(tz="UTC") if now is None else now
+    return (now - pd.Timestamp(fetched_at)).total_seconds()
+
+
+def fetch_nwp(latitude: float, longitude: float, start_date: date, nwp_source: str, dtype: np.dtype) -> xr.Dataset:
+    """
+    Fetch the latest nwp data of the gb model from Open-Meteo, skipping the HTTP cache, and
+    record when it was fetched
+    """
+    nwp_xr = get_forecast_weather(
+        latitude,
+        longitude,
+        start_date,
+        ["gb"],
+        nwp_source=nwp_source,
+        openmeteo=make_openmeteo_client(cache=False),
+        dtype=dtype,
+    )["gb"]
+    nwp_xr.attrs["fetched_at"] = pd.Timestamp.now(tz="UTC").isoformat()
+    return nwp_xr
+
+
+def _store(key: Tuple, nwp_xr: xr.Dataset):
+    with _lock:
+        _cache[key] = nwp_xr
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_CACHED:
+            _cache.popitem(last=False)
+
+
+def _refresh(key: Tuple):
+    latitude, longitude, start_date, nwp_source, dtype = key
+    try:
+        _store(key, fetch_nwp(latitude, longitude, start_date, nwp_source, np.dtype(dtype)))
+    except Exception as e:
+        print(f"Background refresh of the nwp data for {key} failed, serving the cached data. Error: {e}")
+    finally:
+        with _lock:
+            _refreshing.discard(key)
+
+
+def get_serving_nwp(
+    latitude: float,
+    longitude: float,
+    start_date: date,
+    nwp_source: str = "icon",
+    dtype: np.dtype = np.float64,
+    settings: Optional[NWPServingSettings] = None,
+) -> xr.Dataset:
+    """
+    Get the recent nwp data of the gb model, from the cache if stale-while-revalidate is on
+
+    :param latitude: the latitude of the site
+    :param longitude: the longitude of the site
+    :param start_date: the date of the forecast
+    :param nwp_source: the nwp data source. Either "gfs", "icon" or "ukmo"
+    :param dtype: the dtype of the nwp data
+    :param settings: the settings, by default from the environment
+    :return: the nwp data, with a "fetched_at" attribute if stale-while-revalidate is on
+    """
+    settings = NWPServingSettings() if settings is None else settings
+    if not settings.stale_while_revalidate:
+        return get_forecast_weather(latitude, longitude, start_date, ["gb"], nwp_source=nwp_source, dtype=dtype)["gb"]
+
+    key = (latitude, longitude, start_date, nwp_source, np.dtype(dtype).str)
+
+    with _lock:
+        nwp_xr = _cache.get(key)
+    age = None if nwp_xr is None else nwp_age_seconds(nwp_xr)
+
+    if age is None or age > settings.max_stale_minutes * 60:
+        nwp_xr = fetch_nwp(latitude, longitude, start_date, nwp_source, dtype)
+        _store(key, nwp_xr)
+        return nwp_xr.copy()
+
+    if age > settings.refresh_minutes * 60:
+        with _lock:
+            refresh = key not in _refreshing
+            _refreshing.add(key)
+        if refresh:
+            _refresh_pool.submit(_refresh, key)
+
+    # a shallow copy, so the cached dataset's attributes are not changed by the caller
+    return nwp_xr.copy()
@@ -0,0 +1,27 @@
+""" Convert the uk_pv dataset into the preprocessed store used by the evaluation
+
+This downloads pv.netcdf and metadata.csv from Hugging Face, if they are not already in
+data/pv, and converts them into one Parquet file per site plus a metadata table. After this
+has run once, the evaluation reads only the sites and time windows it needs from the store.
+"""
+import os
+
+import typer
+from huggingface_hub import HfFileSystem
+
+from quartz_solar_forecast.eval.pv_store import PV_STORE_DIR, convert_uk_pv
+
+
+def main(data_dir: str = "data/pv", store_dir: str = PV_STORE_DIR):
+    fs = HfFileSystem()
+    os.makedirs(data_dir, exist_ok=True)
+    for filename in ["pv.netcdf", "metadata.csv"]:
+        if not os.path.exists(f"{data_dir}/{filename}"):
+            print(f"Downloading {filename} from HF")
+            fs.get(f"datasets/openclimatefix/uk_pv/{filename}", f"{data_dir}/{filename}")
+
+    convert_uk_pv(f"{data_dir}/pv.netcdf", f"{data_dir}/metadata.csv", store_dir)
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -5,13 +5,18 @@ The results are saved to HF -
 https://huggingface.co/openclimatefix/open-source-quartz-solar-forecast/tree/main/data
 
 This means we can start to compare the difference between the forecasts and the actual generation.
+The forecasts are appended to a forecast archive in the repo, see
+quartz_solar_forecast/utils/forecast_archive.py, which can be queried by site, model and init time.
 """
 
 import os
 from datetime import datetime
-from huggingface_hub import login, HfFileSystem, HfApi
-from quartz_solar_forecast.utils.forecast_csv import forecast_for_site
-from quartz_solar_forecast.utils.file_path import get_file_path
+
+import pandas as pd
+from huggingface_hub import login
+from quartz_solar_forecast.forecast import run_forecasts
+from quartz_solar_forecast.pydantic_models import PVSite
+from quartz_solar_forecast.utils.forecast_archive import ForecastArchive, site_id_from_location
 
 
 if __name__ == "__main__":
@@ -21,15 +26,26 @@ if __name__ == "__main__":
     print(hf_repo)
 
     login(hf_token)
-    fs = HfFileSystem(token=hf_token)
+    archive = ForecastArchive(f"hf://{hf_repo}/forecast_archive", storage_options={"token": hf_token})
     now = datetime.utcnow()
     latitude = 51.59
     longitude = -1.89
     capacity_kwp = 4
 
-    for model in ["gb", "xgb"]:
-        forecast = forecast_for_site(latitude, longitude, capacity_kwp, model, now)
+    site_id = site_id_from_location(latitude, longitude, capacity_kwp)
+
+    # both models use the weather data from one request
+    site = PVSite(latitude=latitude, longitude=longitude, capacity_kwp=capacity_kwp)
+    forecasts = run_forecasts(site=site, models=["gb", "xgb"], ts=now)
+
+    for model, forecast in forecasts.items():
+        path = archive.append(forecast, site_id, model, now)
+        print(f"Appended the {model} forecast to {path}")
 
-        path = get_file_path(latitude, longitude, capacity_kwp, model, now)
-        with fs.open(f"{hf_repo}/{path}", "w") as f:
-            forecast.to_csv(path_or_buf=f)
+    # at the start of each month, merge the last month's parts and the index fragments, so
+    # queries read a few files rather than one per run
+    if now.day == 1:
+        last_month = f"{pd.Timestamp(now) - pd.DateOffset(months=1):%Y-%m}"
+        for model in forecasts:
+            path = archive.compact(model, last_month)
+            print(f"Compacted the {model} forecasts for {last_month} into {path}")
@@ -0,0 +1,106 @@
+""" Load test the live PV path with synthetic inverters
+
+This makes live generation data for many random sites with the SyntheticInverter and times
+how long it takes to get the data and to process it into the model's PV input.
+
+If an API url is given, forecast requests for the sites are sent to the API instead, with
+inverter_type="synthetic", so the whole live PV path in the API is exercised.
+"""
+import asyncio
+import time
+from typing import Optional
+
+import httpx
+import numpy as np
+import pandas as pd
+import typer
+
+from quartz_solar_forecast.data import process_pv_data
+from quartz_solar_forecast.inverters.synthetic import SyntheticInverter
+from quartz_solar_forecast.pydantic_models import PVSite
+
+
+def make_sites(n_sites: int, seed: int = 42) -> list:
+    rng = np.random.default_rng(seed)
+    return [
+        PVSite(
+            latitude=rng.uniform(50, 58),
+            longitude=rng.uniform(-5, 1.5),
+            capacity_kwp=rng.uniform(1, 4),
+            tilt=rng.uniform(20, 45),
+            orientation=rng.uniform(90, 270),
+            inverter_type="synthetic",
+        )
+        for _ in range(n_sites)
+    ]
+
+
+def load_test_process_pv_data(sites: list, ts: pd.Timestamp, freq: str):
+    get_data_seconds = 0.0
+    process_seconds = 0.0
+    for i, site in enumerate(sites):
+        inverter = SyntheticInverter(
+            latitude=site.latitude,
+            longitude=site.longitude,
+            capacity_kwp=site.capacity_kwp,
+            tilt=site.tilt,
+            orientation=site.orientation,
+            freq=freq,
+            seed=i,
+        )
+
+        started = time.perf_counter()
+        live_generation_kw = inverter.get_data(ts)
+        get_data_seconds += time.perf_counter() - started
+
+        started = time.perf_counter()
+        process_pv_data(live_generation_kw, ts, site)
+        process_seconds += time.perf_counter() - started
+
+    print(f"Made live data for {len(sites)} sites in {get_data_seconds:.2f}s")
+    print(f"Processed live data for {len(sites)} sites in {process_seconds:.2f}s "
+          f"({len(sites) / process_seconds:.0f} sites/s)")
+
+
+async def load_test_api(sites: list, ts: pd.Timestamp, api_url: str, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(base_url=api_url, timeout=600) as client:
+
+        async def forecast(site: PVSite):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(
+                    "/forecast/", json={"site": site.model_dump(), "timestamp": ts.isoformat()}
+                )
+                latencies.append(time.perf_counter() - started)
+                return response.status_code
+
+        started = time.perf_counter()
+        status_codes = await asyncio.gather(*[forecast(site) for site in sites])
+        duration = time.perf_counter() - started
+
+    n_ok = sum(status_code == 200 for status_code in status_codes)
+    print(f"{n_ok} of {len(sites)} requests succeeded in {duration:.1f}s "
+          f"({len(sites) / duration:.1f} requests/s)")
+    print(f"Latency p50 {np.percentile(latencies, 50):.2f}s, p99 {np.percentile(latencies, 99):.2f}s")
+
+
+def main(
+    n_sites: int = 1000,
+    freq: str = "5min",
+    api_url: Optional[str] = None,
+    concurrency: int = 32,
+):
+    ts = pd.Timestamp.now().floor("15min")
+    sites = make_sites(n_sites)
+
+    if api_url is None:
+        load_test_process_pv_data(sites, ts, freq)
+    else:
+        asyncio.run(load_test_api(sites, ts, api_url, concurrency))
+
+
+if __name__ == "__main__":
+    typer.run(main)
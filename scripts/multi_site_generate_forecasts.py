@@ -1,91 +1,44 @@
-from quartz_solar_forecast.forecast import run_forecast
-from quartz_solar_forecast.pydantic_models import PVSite
-import pandas as pd
-
-
-def generate_forecasts(sites_info, forecast_date):
-    """Generate forecasts for multiple PV sites.
-
-    This function takes a list of site information tuples and a forecast date as input. For each site, it creates a PVSite object,
-    runs the forecast using the `run_forecast` function from the `quartz_solar_forecast` module, and generates a DataFrame
-    containing the site's latitude, longitude, capacity, and power forecast values. Finally, it concatenates all the site
-    DataFrames into a single DataFrame and returns it.
-
-    Args:
-        sites_info (list): List of tuples containing site information. Each tuple should be in the format
-            (pv_id, latitude, longitude, capacity). Latitude and longitude are geographic coordinates, and capacity
-            is the site's capacity in kilowatts peak (kWp).
-        forecast_date (str): Date for which the forecast is generated (format: "YYYY-MM-DD").
+""" Generate forecasts for a portfolio of PV sites.
 
-    Returns:
-        pandas.DataFrame: DataFrame containing forecasts for each PV site. The DataFrame has columns for each site's
-            latitude, longitude, capacity, and power forecast, with a column name in the format "{pv_id} Power".
-            The index of the DataFrame is set to the forecast dates.
-    """
-    all_forecasts = []  # List to store DataFrames for each site
+The sites are forecast concurrently, and the forecasts are written to a Parquet file in long
+format, with site_id, forecast_init_time, time and power_kw columns. See also the
+quartz-forecast batch command, which can forecast at many init times.
 
-    # Loop through each site information
-    for site_info in sites_info:
-        # Unpack site information from the tuple
-        pv_id, latitude, longitude, capacity = site_info
+The sites can be given as a csv with site_id, latitude, longitude and capacity_kwp columns,
+and optional tilt and orientation columns, e.g.
+    python scripts/multi_site_generate_forecasts.py --sites-path sites.csv --forecast-date 2023-11-01
+"""
+from typing import Optional
 
-        # Create PVSite object for the site
-        site = PVSite(latitude=latitude, longitude=longitude, capacity_kwp=capacity)
+import typer
 
-        # Run forecast for the site
-        forecast = run_forecast(site=site, ts=forecast_date)
-
-        # Flatten forecast values to a 1D array
-        forecast_values = forecast.values.flatten()
+from quartz_solar_forecast.pydantic_models import PVSite
+from quartz_solar_forecast.utils.portfolio import read_sites, run_portfolio_forecast
 
-        # Extract forecast dates from the forecast index
-        forecast_dates = forecast.index
+# Example sites, used if no sites csv is given
+EXAMPLE_SITES = [
+    PVSite(site_id="Site1", latitude=51.75, longitude=-1.25, capacity_kwp=1.25),
+    PVSite(site_id="Site2", latitude=52.0, longitude=-1.5, capacity_kwp=1.5),
+]
 
-        # Create a DataFrame for the current site
-        site_df = pd.DataFrame(
-            {
-                f"{pv_id}_latitude": [latitude]
-                * len(forecast_dates),  # Repeat latitude for each forecast date
-                f"{pv_id}_longitude": [longitude]
-                * len(forecast_dates),  # Repeat longitude for each forecast date
-                f"{pv_id}_capacity": [capacity]
-                * len(forecast_dates),  # Repeat capacity for each forecast date
-                f"{pv_id} Power": forecast_values,  # Power forecast column with renamed header
-            },
-            index=forecast_dates,
-        )
 
-        # Append the site DataFrame to the list
-        all_forecasts.append(site_df)
+def main(
+    sites_path: Optional[str] = None,
+    forecast_date: str = "2023-11-01",
+    output_path: str = "multi_site_pv_forecasts.parquet",
+    nwp_source: str = "icon",
+    max_workers: Optional[int] = None,
+):
+    sites = EXAMPLE_SITES if sites_path is None else read_sites(sites_path)
 
-    # Concatenate all site DataFrames into a single DataFrame along the column axis
-    master_df = pd.concat(all_forecasts, axis=1)
+    failed = run_portfolio_forecast(
+        sites, [forecast_date], output_path, nwp_source=nwp_source, max_workers=max_workers
+    )
 
-    return master_df
+    print(f"Forecasts saved to {output_path}")
+    if failed:
+        print(f"Forecasts failed for sites {failed}")
 
 
 if __name__ == "__main__":
-    # Example input for multiple PV sites
-    sites_info = [
-        (
-            "Site1",
-            51.75,
-            -1.25,
-            1.25,
-        ),  # Site 1 information (pv_id, latitude, longitude, capacity)
-        (
-            "Site2",
-            52.0,
-            -1.5,
-            1.5,
-        ),  # Site 2 information (pv_id, latitude, longitude, capacity)
-        # Add more sites as needed, with format (pv_id, latitude, longitude, capacity)
-    ]
-    forecast_date = "2023-11-01"  # Forecast date
-    output_file = "multi_site_pv_forecasts.csv"  # Output file name
-
-    # Generate forecasts for the given sites and forecast date
-    forecasts = generate_forecasts(sites_info, forecast_date)
-
-    # Save forecasts to a CSV file
-    forecasts.to_csv(output_file)
+    typer.run(main)
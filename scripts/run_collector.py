@@ -0,0 +1,35 @@
+""" Run the fleet telemetry collector
+
+This polls live generation data for all the sites in a JSON file and writes it to the
+generation store. Forecasts for sites with a `site_id` then read live data from the store,
+if GENERATION_STORE_PATH is set.
+
+The sites file should be a list of sites, e.g.
+[{"site_id": "1", "inverter_type": "enphase", "settings": {"ENPHASE_SYSTEM_ID": "1234"}}]
+"""
+import asyncio
+import logging
+
+import pandas as pd
+import typer
+
+from quartz_solar_forecast.inverters.collector import FleetCollector, load_sites
+from quartz_solar_forecast.inverters.store import GenerationStore
+
+
+def main(
+    sites_file: str,
+    store_path: str = "data/generation.sqlite",
+    poll_interval_minutes: int = 15,
+):
+    logging.basicConfig(level=logging.INFO)
+
+    sites = load_sites(sites_file)
+    store = GenerationStore(store_path)
+    collector = FleetCollector(sites, store, poll_interval=pd.Timedelta(minutes=poll_interval_minutes))
+
+    asyncio.run(collector.run())
+
+
+if __name__ == "__main__":
+    typer.run(main)
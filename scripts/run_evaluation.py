@@ -5,9 +5,30 @@ The NWP (ICON) and PV data are both pulled Open Climate Fix's Hugging Face page.
 
 Please note it can take hours to pull the NWP data.
 The data will be cached locally so next time you run it, itll be much quicker
+
+To split the evaluation across machines, run each shard on its own machine, e.g.
+    python scripts/run_evaluation.py --shard-index 0 --shard-count 4
+and then, with all the shard results copied into one shard directory, merge them
+    python scripts/run_evaluation.py --shard-count 4 --merge
 """
+import typer
+
+from quartz_solar_forecast.eval.shard import EVAL_SHARD_DIR
+from quartz_solar_forecast.evaluation import merge_eval, run_eval
+
+
+def main(
+    testset_path: str = "dataset/testset.csv",
+    shard_index: int = 0,
+    shard_count: int = 1,
+    shard_dir: str = EVAL_SHARD_DIR,
+    merge: bool = False,
+):
+    if merge:
+        merge_eval(shard_count=shard_count, shard_dir=shard_dir)
+    else:
+        run_eval(testset_path, shard_index=shard_index, shard_count=shard_count, shard_dir=shard_dir)
 
-from quartz_solar_forecast.evaluation import run_eval
 
 if __name__ == '__main__':
-    run_eval()
+    typer.run(main)
@@ -0,0 +1,50 @@
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
+
+from quartz_solar_forecast.weather.archive import NWP_VARIABLES, NWPArchive
+
+
+def make_client(start: str, end: str):
+    """Make a fake Open-Meteo client, that returns hourly data from start to end (inclusive)"""
+    time = pd.date_range(start, pd.Timestamp(end) + pd.Timedelta(hours=23), freq="h")
+
+    hourly = MagicMock()
+    hourly.Time.return_value = time[0].timestamp()
+    hourly.TimeEnd.return_value = (time[-1] + pd.Timedelta(hours=1)).timestamp()
+    hourly.Interval.return_value = 3600
+    hourly.Variables.side_effect = lambda i: MagicMock(
+        ValuesAsNumpy=MagicMock(return_value=np.arange(len(time), dtype=np.float32) + 1000 * i)
+    )
+
+    client = MagicMock()
+    client.weather_api.return_value = [MagicMock(Hourly=MagicMock(return_value=hourly))]
+    return client
+
+
+def test_prefetch_and_read(tmp_path):
+    archive = NWPArchive(str(tmp_path))
+
+    client = make_client("2023-01-01", "2023-01-31")
+    n_hours = archive.prefetch(51.7512, -1.2534, pd.Timestamp("2023-01-01").date(), pd.Timestamp("2023-01-31").date(), client)
+    assert n_hours == 31 * 24
+    assert client.weather_api.call_count == 1
+    assert client.weather_api.call_args.kwargs["params"]["latitude"] == 51.75
+
+    # a nearby site in the same grid cell reads the same data
+    df = archive.read(51.7498, -1.2501, pd.Timestamp("2023-01-10").date(), pd.Timestamp("2023-01-17").date())
+    assert list(df.columns) == list(NWP_VARIABLES.values())
+    assert len(df) == 8 * 24
+    assert df.index[0] == pd.Timestamp("2023-01-10")
+    assert df["t"].iloc[0] == 9 * 24
+    assert df["prate"].iloc[0] == 1000 + 9 * 24
+
+    # windows that are not all in the store are not read
+    assert archive.read(51.75, -1.25, pd.Timestamp("2023-01-28").date(), pd.Timestamp("2023-02-04").date()) is None
+    assert archive.read(50.0, -1.25, pd.Timestamp("2023-01-10").date(), pd.Timestamp("2023-01-17").date()) is None
+
+    # prefetching more days extends the store
+    archive.prefetch(51.75, -1.25, pd.Timestamp("2023-02-01").date(), pd.Timestamp("2023-02-10").date(), make_client("2023-02-01", "2023-02-10"))
+    df = archive.read(51.75, -1.25, pd.Timestamp("2023-01-28").date(), pd.Timestamp("2023-02-04").date())
+    assert len(df) == 8 * 24
@@ -0,0 +1,134 @@
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from quartz_solar_forecast.weather import serving
+from quartz_solar_forecast.weather.serving import NWPServingSettings, get_serving_nwp, nwp_age_seconds
+
+SETTINGS = NWPServingSettings(NWP_STALE_WHILE_REVALIDATE=True, NWP_MAX_STALE_MINUTES=60, NWP_REFRESH_MINUTES=10)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    serving._cache.clear()
+    yield
+    serving._cache.clear()
+
+
+def fake_weather(latitude, longitude, start_date, forecast_models, nwp_source, dtype, openmeteo=None):
+    return {"gb": xr.Dataset({nwp_source: (("step",), np.zeros(3, dtype=dtype))})}
+
+
+def age_cache(minutes: float):
+    """Make the cached data look fetched some minutes ago"""
+    for nwp_xr in serving._cache.values():
+        fetched_at = pd.Timestamp.now(tz="UTC") - pd.Timedelta(minutes=minutes)
+        nwp_xr.attrs["fetched_at"] = fetched_at.isoformat()
+
+
+def get():
+    return get_serving_nwp(51.75, -1.25, date(2024, 7, 1), "icon", np.float64, SETTINGS)
+
+
+def test_fetches_without_stale_while_revalidate():
+    with patch.object(serving, "get_forecast_weather", side_effect=fake_weather) as fetch:
+        nwp_xr = get_serving_nwp(51.75, -1.25, date(2024, 7, 1), settings=NWPServingSettings())
+        get_serving_nwp(51.75, -1.25, date(2024, 7, 1), settings=NWPServingSettings())
+
+    assert fetch.call_count == 2
+    # the data may be from the HTTP cache, so its age is not known
+    assert nwp_age_seconds(nwp_xr) is None
+    assert len(serving._cache) == 0
+
+
+def test_serves_fresh_cache():
+    with patch.object(serving, "get_forecast_weather", side_effect=fake_weather) as fetch:
+        get()
+        get()
+
+    assert fetch.call_count == 1
+
+
+def test_serves_stale_cache_and_refreshes():
+    refreshes = []
+    with patch.object(serving, "get_forecast_weather", side_effect=fake_weather) as fetch, patch.object(
+        serving._refresh_pool, "submit", side_effect=lambda fn, key: refreshes.append((fn, key))
+    ):
+        get()
+        age_cache(30)
+
+        # the stale data is served straight away, with one refresh queued
+        nwp_xr = get()
+        get()
+        assert nwp_age_seconds(nwp_xr) >= 30 * 60
+        assert fetch.call_count == 1
+        assert len(refreshes) == 1
+
+        # the refresh replaces the cached data
+        fn, key = refreshes[0]
+        fn(key)
+        assert fetch.call_count == 2
+        assert nwp_age_seconds(get()) < 60
+        assert not serving._refreshing
+
+
+def test_fetches_when_too_stale():
+    with patch.object(serving, "get_forecast_weather", side_effect=fake_weather) as fetch:
+        get()
+        age_cache(90)
+
+        nwp_xr = get()
+
+    assert fetch.call_count == 2
+    assert nwp_age_seconds(nwp_xr) < 60
+
+
+@pytest.fixture
+def upstream():
+    """A local server standing in for Open-Meteo, counting the requests that reach it"""
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append(self.path)
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("localhost", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://localhost:{server.server_port}/v1/forecast", requests
+    server.shutdown()
+    server.server_close()
+
+
+def test_refresh_reaches_upstream(upstream):
+    url, requests = upstream
+
+    def weather_from_upstream(*args, openmeteo=None, **kwargs):
+        openmeteo.session.get(url, params={"latitude": 51.75, "longitude": -1.25})
+        return fake_weather(*args, **kwargs)
+
+    refreshes = []
+    with patch.object(serving, "get_forecast_weather", side_effect=weather_from_upstream), patch.object(
+        serving._refresh_pool, "submit", side_effect=lambda fn, key: refreshes.append((fn, key))
+    ):
+        get()
+        age_cache(30)
+        get()
+
+        fn, key = refreshes[0]
+        fn(key)
+
+    # the same request reaches upstream again, rather than being served by the HTTP cache
+    assert len(requests) == 2
+    assert nwp_age_seconds(get()) < 60
@@ -0,0 +1,57 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from quartz_solar_forecast.weather import endpoints
+from quartz_solar_forecast.weather.endpoints import PUBLIC_URLS, OpenMeteoSettings, endpoint_urls, weather_api
+
+LOCAL_URL = "http://localhost:8080/v1/forecast"
+
+
+@pytest.fixture(autouse=True)
+def clear_health():
+    endpoints._health.clear()
+    yield
+    endpoints._health.clear()
+
+
+def make_settings(**kwargs) -> OpenMeteoSettings:
+    return OpenMeteoSettings(OPEN_METEO_FORECAST_URL=LOCAL_URL, **kwargs)
+
+
+def test_endpoint_urls_public():
+    assert endpoint_urls("archive", make_settings()) == [PUBLIC_URLS["archive"]]
+
+
+def test_endpoint_urls_health_checked_once():
+    with patch.object(endpoints, "check_health", return_value=True) as check_health:
+        assert endpoint_urls("forecast", make_settings()) == [LOCAL_URL, PUBLIC_URLS["forecast"]]
+        assert endpoint_urls("forecast", make_settings()) == [LOCAL_URL, PUBLIC_URLS["forecast"]]
+
+    assert check_health.call_count == 1
+
+
+def test_endpoint_urls_down():
+    with patch.object(endpoints, "check_health", return_value=False):
+        assert endpoint_urls("forecast", make_settings()) == [PUBLIC_URLS["forecast"]]
+        # without the fallback, the configured url is always used
+        assert endpoint_urls("forecast", make_settings(OPEN_METEO_FALLBACK=False)) == [LOCAL_URL]
+
+
+def test_weather_api_falls_back():
+    def request(url, params):
+        if url == LOCAL_URL:
+            raise Exception("model not synced")
+        return ["response"]
+
+    client = MagicMock()
+    client.weather_api.side_effect = request
+
+    with patch.object(endpoints, "check_health", return_value=True) as check_health:
+        assert weather_api(client, "forecast", {"latitude": 51.75}, make_settings()) == ["response"]
+        assert [call.args[0] for call in client.weather_api.call_args_list] == [LOCAL_URL, PUBLIC_URLS["forecast"]]
+
+        # the failed endpoint is skipped until its next health check
+        weather_api(client, "forecast", {"latitude": 51.75}, make_settings())
+        assert client.weather_api.call_args_list[-1].args[0] == PUBLIC_URLS["forecast"]
+        assert check_health.call_count == 1
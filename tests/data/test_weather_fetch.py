@@ -0,0 +1,96 @@
+from datetime import date
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from quartz_solar_forecast.data import format_nwp_data
+from quartz_solar_forecast.pydantic_models import PVSite
+from quartz_solar_forecast.weather.archive import NWP_VARIABLES
+from quartz_solar_forecast.weather.decode import hourly_to_df
+from quartz_solar_forecast.weather.fetch import XGB_VARIABLES, get_forecast_weather, request_weather
+
+
+def make_response(start: str, end: str, model_number: int):
+    """Make a fake Open-Meteo response, with hourly data from start to end (inclusive)"""
+    time = pd.date_range(start, pd.Timestamp(end) + pd.Timedelta(hours=23), freq="h")
+
+    hourly = MagicMock()
+    hourly.Time.return_value = time[0].timestamp()
+    hourly.TimeEnd.return_value = (time[-1] + pd.Timedelta(hours=1)).timestamp()
+    hourly.Interval.return_value = 3600
+    hourly.Variables.side_effect = lambda i: MagicMock(
+        ValuesAsNumpy=MagicMock(return_value=np.full(len(time), 100 * model_number + i, dtype=np.float32))
+    )
+    return MagicMock(Hourly=MagicMock(return_value=hourly))
+
+
+def test_get_forecast_weather_one_request():
+    client = MagicMock()
+    client.weather_api.side_effect = lambda url, params: [
+        make_response(params["start_date"], params["end_date"], i) for i in range(len(params["models"]))
+    ]
+
+    weather = get_forecast_weather(51.75, -1.25, date(2024, 7, 1), ["gb", "xgb"], openmeteo=client)
+
+    assert client.weather_api.call_count == 1
+    params = client.weather_api.call_args.kwargs["params"]
+    assert params["models"] == ["icon_seamless", "gfs_seamless", "best_match"]
+    assert params["end_date"] == "2024-07-08"
+    variables = params["hourly"]
+    assert len(variables) == len(set(variables))
+    assert set(variables) == set(NWP_VARIABLES) | {"visibility"} | set(XGB_VARIABLES)
+
+    # gb gets the icon variables, renamed, and the gfs visibility, for 8 days
+    gb = weather["gb"]["icon"]
+    assert gb.dims == ("step", "variable")
+    assert list(gb["variable"].values) == list(NWP_VARIABLES.values()) + ["vis"]
+    assert gb.shape == (8 * 24, 9)
+    assert gb.dtype == np.float64
+    assert gb.sel(variable="t").values[0] == variables.index("temperature_2m")
+    assert gb.sel(variable="vis").values[0] == 100 + variables.index("visibility")
+    assert weather["gb"]["time"].values[0] == np.datetime64("2024-07-01T00:00")
+
+    # xgb gets the best match variables, for 3 days
+    xgb = weather["xgb"]
+    assert list(xgb.columns) == ["date"] + XGB_VARIABLES
+    assert len(xgb) == 3 * 24
+    assert xgb["date"].iloc[-1] == pd.Timestamp("2024-07-03 23:00")
+    assert xgb["is_day"].iloc[0] == 200 + variables.index("is_day")
+
+
+def test_get_forecast_weather_gfs_visibility_from_same_model():
+    client = MagicMock()
+    client.weather_api.side_effect = lambda url, params: [
+        make_response(params["start_date"], params["end_date"], i) for i in range(len(params["models"]))
+    ]
+
+    weather = get_forecast_weather(51.75, -1.25, date(2024, 7, 1), ["gb"], nwp_source="gfs", openmeteo=client)
+
+    assert client.weather_api.call_args.kwargs["params"]["models"] == ["gfs_seamless"]
+    assert list(weather) == ["gb"]
+    assert not weather["gb"]["gfs"].isnull().any()
+
+
+def test_decode_nwp_matches_dataframe_path():
+    client = MagicMock()
+    client.weather_api.side_effect = lambda url, params: [
+        make_response(params["start_date"], params["end_date"], i) for i in range(len(params["models"]))
+    ]
+    site = PVSite(latitude=51.75, longitude=-1.25, capacity_kwp=1.25)
+
+    weather = get_forecast_weather(site.latitude, site.longitude, date(2024, 7, 1), ["gb"], openmeteo=client)
+    variables, hourly = request_weather(
+        site.latitude, site.longitude, date(2024, 7, 1), date(2024, 7, 8),
+        {"icon_seamless": list(NWP_VARIABLES), "gfs_seamless": ["visibility"]}, client,
+    )
+    df = hourly_to_df(hourly["icon_seamless"], variables)[list(NWP_VARIABLES)].rename(columns=NWP_VARIABLES)
+    df["vis"] = hourly_to_df(hourly["gfs_seamless"], variables)["visibility"]
+
+    xr.testing.assert_identical(weather["gb"], format_nwp_data(df, "icon", site))
+
+    weather = get_forecast_weather(
+        site.latitude, site.longitude, date(2024, 7, 1), ["gb"], openmeteo=client, dtype=np.float32
+    )
+    assert weather["gb"]["icon"].dtype == np.float32
@@ -0,0 +1,32 @@
+import pandas as pd
+
+from quartz_solar_forecast.eval.checkpoint import CheckpointStore, hash_inputs
+
+
+def test_hash_inputs():
+    df = pd.DataFrame({"pv_id": [1, 2], "timestamp": pd.to_datetime(["2021-01-26 01:15", "2021-01-30 16:30"])})
+
+    assert hash_inputs(df) == hash_inputs(df.copy())
+    assert hash_inputs(df) != hash_inputs(df.iloc[:1])
+    assert hash_inputs(df, "a") != hash_inputs(df, "b")
+
+
+def test_load_or_compute(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    df = pd.DataFrame({"pv_id": [1, 2], "timestamp": pd.to_datetime(["2021-01-26 01:15", "2021-01-30 16:30"])})
+    key = hash_inputs(df)
+
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return df
+
+    first = store.load_or_compute("pv_metadata", key, compute)
+    second = store.load_or_compute("pv_metadata", key, compute)
+
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(first, second)
+
+    # the saved output hashes the same, so later stages keyed on it are also reused
+    assert hash_inputs(second) == key
@@ -1,9 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from quartz_solar_forecast.eval import forecast
 from quartz_solar_forecast.eval.forecast import run_forecast
 
 import pandas as pd
 
 
-def test_run_forecast():
+def make_inputs():
     pv_df = pd.DataFrame(
         [
             {
@@ -68,4 +72,23 @@ def test_run_forecast():
     nwp_df["timestamp"] = pd.to_datetime(nwp_df["timestamp"])
     nwp_df["time"] = pd.to_datetime(nwp_df["time"])
 
+    return pv_df, nwp_df
+
+
+def test_run_forecast():
+    pv_df, nwp_df = make_inputs()
+
     _ = run_forecast(pv_df=pv_df, nwp_df=nwp_df, nwp_source="ICON")
+
+
+def test_run_forecast_reuses_pool():
+    pv_df, nwp_df = make_inputs()
+
+    # threads share the model loaded by the initializer, as the workers of a process pool would
+    with patch.object(forecast, "load_model", wraps=forecast.load_model) as load_model, patch.object(
+        forecast, "ProcessPoolExecutor", side_effect=AssertionError("a new pool was started")
+    ), ThreadPoolExecutor(max_workers=1, initializer=forecast._init_worker, initargs=(forecast.model_path,)) as pool:
+        for _ in range(3):
+            run_forecast(pv_df=pv_df, nwp_df=nwp_df, nwp_source="ICON", pool=pool)
+
+    assert load_model.call_count == 1
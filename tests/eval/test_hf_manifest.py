@@ -0,0 +1,48 @@
+import pandas as pd
+
+from quartz_solar_forecast.eval.hf_manifest import ICON_HF_ROOT, ICONManifest
+
+
+class FakeHfFileSystem:
+    def __init__(self, files):
+        self.files = files
+        self.calls = []
+
+    def find(self, path):
+        self.calls.append(path)
+        return [f for f in self.files if f.startswith(f"{path}/")]
+
+
+def test_manifest(tmp_path):
+    fs = FakeHfFileSystem(
+        [
+            f"{ICON_HF_ROOT}/2021/1/1/20210101_00.zarr.zip",
+            f"{ICON_HF_ROOT}/2021/1/1/20210101_06.zarr.zip",
+            f"{ICON_HF_ROOT}/2021/2/3/20210203_12.zarr.zip",
+        ]
+    )
+    path = str(tmp_path / "manifest.json")
+    manifest = ICONManifest(path, fs=fs)
+
+    timestamps = pd.DatetimeIndex(["2021-01-01 01:15", "2021-01-01 07:00", "2021-01-01 13:00", "2021-02-03 17:45"])
+    exists = manifest.exists(timestamps)
+
+    assert list(exists) == [True, True, False, True]
+    # one listing per month, rather than one probe per timestamp
+    assert fs.calls == [f"{ICON_HF_ROOT}/2021/1", f"{ICON_HF_ROOT}/2021/2"]
+
+    # the cached manifest is used next time, and finished months are not listed again
+    manifest = ICONManifest(path, fs=fs)
+    assert list(manifest.exists(timestamps)) == [True, True, False, True]
+    assert len(fs.calls) == 2
+
+
+def test_manifest_refreshes_unfinished_months(tmp_path):
+    fs = FakeHfFileSystem([f"{ICON_HF_ROOT}/2021/1/1/20210101_00.zarr.zip"])
+    manifest = ICONManifest(str(tmp_path / "manifest.json"), fs=fs)
+    timestamps = pd.DatetimeIndex(["2021-01-01 01:15"])
+
+    assert manifest.refresh(timestamps, now=pd.Timestamp("2021-01-15")) == ["2021/1"]
+    assert manifest.refresh(timestamps, now=pd.Timestamp("2021-01-20")) == ["2021/1"]
+    assert manifest.refresh(timestamps, now=pd.Timestamp("2021-02-02")) == ["2021/1"]
+    assert manifest.refresh(timestamps, now=pd.Timestamp("2021-02-03")) == []
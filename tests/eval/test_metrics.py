@@ -1,4 +1,4 @@
-from quartz_solar_forecast.eval.metrics import metrics
+from quartz_solar_forecast.eval.metrics import compute_metrics, metrics
 import pandas as pd
 import numpy as np
 
@@ -28,3 +28,40 @@ def test_metrics():
 
     # call the metrics function
     metrics(results_df, pv_metadata)
+
+
+def test_compute_metrics():
+    results_df = pd.DataFrame(
+        {
+            "pv_id": [1, 1, 2, 2],
+            "timestamp": pd.to_datetime(["2021-06-01 10:00"] * 4),
+            "horizon_hour": [4, 6, 4, 6],
+            "forecast_power": [1.0, 2.0, 3.0, 1.0],
+            "generation_power": [2.0, 2.0, 2.0, 2.0],
+        }
+    )
+    pv_metadata = pd.DataFrame({"pv_id": [1, 2], "capacity": [2.0, 4.0]})
+
+    tables = compute_metrics(results_df, pv_metadata, n_bootstrap=200)
+    assert set(tables) == {"overall", "horizon", "horizon_bucket", "site", "month", "hour_of_day"}
+
+    overall = tables["overall"].iloc[0]
+    assert overall["n"] == 4
+    assert np.isclose(overall["mae"], 0.75)
+    assert np.isclose(overall["rmse"], 0.75**0.5)
+    assert np.isclose(overall["bias"], -0.25)
+    assert overall["mae_lower"] <= overall["mae"] <= overall["mae_upper"]
+
+    site = tables["site"].set_index("pv_id")
+    assert np.isclose(site.loc[1, "mae"], 0.5)
+    assert np.isclose(site.loc[1, "mae_normalized"], 0.25)
+    assert np.isclose(site.loc[2, "mae_normalized"], 0.25)
+
+    # horizon 4 is in the 3-4 and 0-36 buckets, and 6 is in 5-8 and 0-36
+    buckets = tables["horizon_bucket"].set_index("horizon_bucket")
+    assert buckets.loc["0-36", "n"] == 4
+    assert buckets.loc["3-4", "n"] == 2
+    assert "9-16" not in buckets.index
+
+    hour_of_day = tables["hour_of_day"].set_index("hour_of_day")
+    assert list(hour_of_day.index) == [14, 16]
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from quartz_solar_forecast.eval.nwp import get_nwp
+from quartz_solar_forecast.eval.nwp_cache import NWPCache, make_cache_key
+
+
+def make_records(n_records: int, init_time: str, seed: int) -> xr.Dataset:
+    rng = np.random.default_rng(seed)
+    return xr.Dataset(
+        {"t_2m": (("record", "step"), rng.random((n_records, 54)))},
+        coords={
+            "step": pd.to_timedelta(np.arange(54), unit="h"),
+            "time": ("record", np.repeat(np.datetime64(init_time, "ns"), n_records)),
+        },
+    )
+
+
+def test_nwp_cache_append_and_read(tmp_path):
+    path = str(tmp_path / "icon.zarr")
+    first = make_records(2, "2022-01-01T00:00", seed=0)
+    second = make_records(1, "2022-01-01T06:00", seed=1)
+    keys = [
+        make_cache_key("20220101_00", 51.5, 0.0),
+        make_cache_key("20220101_00", 52.0, 1.0),
+        make_cache_key("20220101_06", 51.5, 0.0),
+    ]
+
+    cache = NWPCache(path)
+    cache.append(keys[:2], first)
+    cache.append(keys[2:], second)
+
+    # a new cache object picks up the index from disk
+    cache = NWPCache(path)
+    assert len(cache) == 3
+    assert keys[2] in cache
+    assert make_cache_key("20220101_12", 51.5, 0.0) not in cache
+
+    data = cache.read([keys[2], keys[0], keys[2]])
+    assert data.sizes["record"] == 3
+    np.testing.assert_allclose(data["t_2m"].values[0], second["t_2m"].values[0])
+    np.testing.assert_allclose(data["t_2m"].values[1], first["t_2m"].values[0])
+    assert data.time.values[0] == np.datetime64("2022-01-01T06:00", "ns")
+
+
+def test_nwp_cache_read_no_keys(tmp_path):
+    path = str(tmp_path / "icon.zarr")
+
+    # nothing has been cached, so there is no store to open
+    assert len(NWPCache(path).read([]).data_vars) == 0
+
+    cache = NWPCache(path)
+    cache.append([make_cache_key("20220101_00", 51.5, 0.0)], make_records(1, "2022-01-01T00:00", seed=0))
+    assert cache.read([]).sizes["record"] == 0
+
+
+def test_get_nwp_no_time_locations(tmp_path):
+    time_locations = pd.DataFrame({"timestamp": [], "latitude": [], "longitude": [], "pv_id": []})
+    nwp_df = get_nwp(time_locations, cache_path=str(tmp_path / "icon.zarr"), check_hf_files=False)
+
+    assert len(nwp_df) == 0
+    assert {"time", "t", "prate", "si10", "vis", "timestamp"} <= set(nwp_df.columns)
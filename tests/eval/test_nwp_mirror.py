@@ -0,0 +1,42 @@
+import os
+
+from quartz_solar_forecast.eval.nwp_mirror import (
+    NWPMirrorSettings,
+    mirror_disk_usage,
+    mirror_url,
+    prune_mirror,
+)
+
+
+def test_mirror_url():
+    url = mirror_url("zip:///::hf://datasets/openclimatefix/dwd-icon-eu/data/2021/1/1/20210101_00.zarr.zip")
+    assert url == "zip:///::blockcache::hf://datasets/openclimatefix/dwd-icon-eu/data/2021/1/1/20210101_00.zarr.zip"
+
+
+def test_prune_mirror_within_limit(tmp_path):
+    (tmp_path / "block_file").write_bytes(b"0" * 10_000)
+    assert mirror_disk_usage(str(tmp_path)) >= 10_000
+
+    settings = NWPMirrorSettings(NWP_MIRROR_DIR=str(tmp_path), NWP_MIRROR_MAX_GB=1)
+    assert prune_mirror(settings) == 0
+    assert (tmp_path / "block_file").exists()
+
+
+def test_prune_mirror_missing_dir(tmp_path):
+    settings = NWPMirrorSettings(NWP_MIRROR_DIR=str(tmp_path / "missing"), NWP_MIRROR_MAX_GB=0)
+    assert prune_mirror(settings) == 0
+
+
+def test_prune_mirror_removes_oldest(tmp_path):
+    for i, name in enumerate(["oldest", "middle", "newest"]):
+        path = tmp_path / name
+        path.write_bytes(b"0" * 10_000)
+        os.utime(path, (1000 + i, 1000 + i))
+    (tmp_path / "cache").write_bytes(b"0" * 10_000)
+
+    # room for the two newest files
+    max_bytes = mirror_disk_usage(str(tmp_path)) - (tmp_path / "oldest").stat().st_blocks * 512
+    settings = NWPMirrorSettings(NWP_MIRROR_DIR=str(tmp_path), NWP_MIRROR_MAX_GB=max_bytes / 1e9)
+
+    assert prune_mirror(settings) == 1
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["cache", "middle", "newest"]
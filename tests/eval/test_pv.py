@@ -1,5 +1,7 @@
-from quartz_solar_forecast.eval.pv import get_pv_truth, get_pv_metadata
+from quartz_solar_forecast.eval.pv import extract_pv_truth, get_pv_truth, get_pv_metadata
+import numpy as np
 import pandas as pd
+import xarray as xr
 
 
 def test_get_pv_metadata():
@@ -29,3 +31,33 @@ def test_get_pv():
 
     # Collect NWP data from Hugging Face, ICON. (Peter)
     _ = get_pv_truth(test_set_df)
+
+
+def test_extract_pv_truth():
+    datetimes = pd.date_range("2021-01-26 00:00", "2021-01-28 00:00", freq="30min")
+    pv_ds = xr.Dataset(
+        {"8215": ("datetime", np.arange(len(datetimes), dtype=float) * 1000)},
+        coords={"datetime": datetimes},
+    )
+    test_set_df = pd.DataFrame(
+        [
+            {"timestamp": pd.Timestamp("2021-01-26 01:00:00"), "pv_id": 8215},
+            {"timestamp": pd.Timestamp("2021-01-26 01:15:00"), "pv_id": 8215},
+            {"timestamp": pd.Timestamp("2021-01-26 01:00:00"), "pv_id": 1},
+        ]
+    )
+
+    truth_df = extract_pv_truth(pv_ds, test_set_df)
+
+    assert len(truth_df) == 3 * 49
+    assert list(truth_df.columns) == ["pv_id", "timestamp", "value", "horizon_hour"]
+
+    site_df = truth_df[truth_df["pv_id"] == "8215"]
+    first = site_df.iloc[:49]
+    # 01:00 is the 3rd value, each hour is 2 values on, and there is no data after 2 days
+    assert first["value"].iloc[:3].tolist() == [2.0, 4.0, 6.0]
+    assert first["value"].iloc[47:].isna().tolist() == [False, True]
+    # 01:15 is not in the data
+    assert site_df.iloc[49:]["value"].isna().all()
+    # unknown pv_id
+    assert truth_df[truth_df["pv_id"] == "1"]["value"].isna().all()
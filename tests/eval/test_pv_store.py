@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from quartz_solar_forecast.eval.pv import extract_pv_truth, extract_pv_truth_from_store
+from quartz_solar_forecast.eval.pv_store import (
+    read_pv_generation,
+    read_pv_metadata,
+    store_exists,
+    write_pv_store,
+)
+
+
+def make_uk_pv():
+    datetimes = pd.date_range("2021-01-26 00:00", "2021-01-28 00:00", freq="30min")
+    values = np.arange(len(datetimes), dtype=float) * 1000
+    values[10:20] = np.nan
+    pv_ds = xr.Dataset(
+        {"8215": ("datetime", values), "8216": ("datetime", values * 2)},
+        coords={"datetime": datetimes},
+    )
+    metadata_df = pd.DataFrame(
+        {"ss_id": [8216, 8215], "latitude_rounded": [51.5, 52.5], "longitude_rounded": [0.1, -1.0], "kwp": [3, 4]}
+    )
+    return pv_ds, metadata_df
+
+
+def test_write_pv_store(tmp_path):
+    pv_ds, metadata_df = make_uk_pv()
+
+    store_dir = str(tmp_path / "store")
+    write_pv_store(pv_ds, metadata_df, store_dir)
+
+    metadata_df = read_pv_metadata([8215], store_dir)
+    assert metadata_df["pv_id"].tolist() == [8215]
+    assert metadata_df["kwp"].tolist() == [4]
+
+    generation_df = read_pv_generation("8215", pd.Timestamp("2021-01-26 01:00"), pd.Timestamp("2021-01-26 02:00"), store_dir)
+    assert generation_df["power_w"].tolist() == [2000.0, 3000.0, 4000.0]
+
+    test_set_df = pd.DataFrame(
+        [
+            {"timestamp": pd.Timestamp("2021-01-26 01:00:00"), "pv_id": 8215},
+            {"timestamp": pd.Timestamp("2021-01-26 03:00:00"), "pv_id": 8216},
+        ]
+    )
+    truth_df = extract_pv_truth_from_store(test_set_df, store_dir)
+    expected_df = extract_pv_truth(pv_ds, test_set_df)
+    pd.testing.assert_frame_equal(truth_df, expected_df)
+
+    # a site that is not in the store raises, rather than giving NaN truth
+    test_set_df = pd.DataFrame([{"timestamp": pd.Timestamp("2021-01-26 01:00:00"), "pv_id": 1}])
+    with pytest.raises(FileNotFoundError):
+        extract_pv_truth_from_store(test_set_df, store_dir)
+
+
+def test_write_pv_store_subset(tmp_path):
+    pv_ds, metadata_df = make_uk_pv()
+    store_dir = str(tmp_path / "store")
+
+    # converting some of the sites does not mark the store as complete
+    write_pv_store(pv_ds, metadata_df, store_dir, pv_ids=["8215"])
+    assert not store_exists(store_dir)
+
+    # converting the rest does
+    write_pv_store(pv_ds, metadata_df, store_dir, pv_ids=["8216"])
+    assert store_exists(store_dir)
@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+from quartz_solar_forecast.eval.shard import merge_shards, save_shard, shard_testset
+
+
+def make_testset(n: int = 200) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "pv_id": [8215 + i % 7 for i in range(n)],
+            "timestamp": [str(pd.Timestamp("2021-01-01") + pd.Timedelta(hours=5 * i)) for i in range(n)],
+        }
+    )
+
+
+def test_shard_testset():
+    testset = make_testset()
+
+    shards = [shard_testset(testset, i, 3) for i in range(3)]
+
+    # every row is in exactly one shard, and the split does not change between runs
+    assert sum(len(shard) for shard in shards) == len(testset)
+    assert pd.concat(shards).index.sort_values().equals(testset.index)
+    assert shard_testset(testset, 1, 3).equals(shards[1])
+    assert all(len(shard) > 0 for shard in shards)
+
+    # parsed timestamps give the same split as strings
+    parsed = testset.assign(timestamp=pd.to_datetime(testset["timestamp"]))
+    assert shard_testset(parsed, 1, 3).index.equals(shards[1].index)
+
+    with pytest.raises(ValueError):
+        shard_testset(testset, 3, 3)
+
+
+def test_merge_shards(tmp_path):
+    testset = make_testset(20).assign(timestamp=lambda df: pd.to_datetime(df["timestamp"]))
+
+    for i in range(2):
+        shard = shard_testset(testset, i, 2)
+        results = shard.assign(horizon_hour=0, forecast_power=1.0, generation_power=1.0)
+        save_shard(str(tmp_path), i, 2, results, shard.assign(capacity=4.0))
+
+    results_df, pv_metadata = merge_shards(str(tmp_path), 2)
+    assert len(results_df) == len(testset)
+    assert len(pv_metadata) == len(testset)
+    assert results_df[["pv_id", "timestamp"]].equals(
+        testset.sort_values(["pv_id", "timestamp"]).reset_index(drop=True)
+    )
+
+    with pytest.raises(ValueError):
+        merge_shards(str(tmp_path), 3)
@@ -0,0 +1,50 @@
+import asyncio
+
+import pandas as pd
+
+from quartz_solar_forecast.inverters.collector import FleetCollector, FleetSite, VendorLimits
+from quartz_solar_forecast.inverters.inverter import AbstractInverter
+from quartz_solar_forecast.inverters.store import GenerationStore, StoredInverter
+
+
+class FlakyInverter(AbstractInverter):
+    """Fails the first time it is called, then returns data"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_data(self, ts: pd.Timestamp):
+        self.calls += 1
+        if self.calls == 1:
+            raise ConnectionError("vendor API is down")
+        return pd.DataFrame(
+            {
+                "timestamp": pd.date_range("2024-06-16 10:00", periods=4, freq="15min"),
+                "power_kw": [0.5, 0.6, 0.7, 0.8],
+            }
+        )
+
+
+def test_collector_retries_and_writes_to_store(tmp_path):
+    store = GenerationStore(str(tmp_path / "generation.sqlite"))
+    inverters = [FlakyInverter() for _ in range(3)]
+    sites = [
+        FleetSite(site_id=str(i), inverter_type="enphase", inverter=inverter)
+        for i, inverter in enumerate(inverters)
+    ]
+
+    collector = FleetCollector(
+        sites,
+        store,
+        vendor_limits={"enphase": VendorLimits(max_concurrency=2, requests_per_second=100)},
+        backoff_seconds=0.01,
+    )
+    rows_written = asyncio.run(collector.collect_once())
+
+    assert rows_written == 12
+    assert [inverter.calls for inverter in inverters] == [2, 2, 2]
+
+    ts = pd.Timestamp("2024-06-16 12:00")
+    df = StoredInverter(store, "1").get_data(ts)
+    assert df["power_kw"].tolist() == [0.5, 0.6, 0.7, 0.8]
+    assert store.last_timestamp("1") == pd.Timestamp("2024-06-16 10:45")
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from quartz_solar_forecast.inverters.normalize import (
+    make_generation_df,
+    normalize_solarman,
+    normalize_solis,
+    normalize_victron,
+)
+
+
+def test_make_generation_df_sorts_and_filters():
+    df = make_generation_df([300, 100, 200, 400], [3000, 1000, 2000, 4000], scale=1 / 1000, start=200)
+
+    assert list(df.columns) == ["timestamp", "power_kw"]
+    assert pd.api.types.is_datetime64_any_dtype(df["timestamp"])
+    assert df["timestamp"].tolist() == [pd.Timestamp(200, unit="s"), pd.Timestamp(300, unit="s"),
+                                        pd.Timestamp(400, unit="s")]
+    assert df["power_kw"].tolist() == [2.0, 3.0, 4.0]
+
+
+def test_make_generation_df_empty():
+    df = make_generation_df([], [])
+
+    assert df.empty
+    assert list(df.columns) == ["timestamp", "power_kw"]
+    assert pd.api.types.is_datetime64_any_dtype(df["timestamp"])
+
+
+def test_normalize_solis():
+    data_points = [
+        {"dataTimestamp": "1718531400000", "pac": "684"},
+        {"dataTimestamp": "1718531100000", "pac": "624"},
+    ]
+
+    df = normalize_solis(data_points, start=1718531100000, end=1718531400000)
+
+    assert df["timestamp"].tolist() == [pd.Timestamp("2024-06-16 09:45:00"), pd.Timestamp("2024-06-16 09:50:00")]
+    assert np.allclose(df["power_kw"], [0.624, 0.684])
+
+
+def test_normalize_solarman_drops_missing_power():
+    records = [
+        {"dateTime": 1718531100, "generationPower": 624},
+        {"dateTime": 1718531400, "generationPower": None},
+        {"dateTime": 1718531700, "generationPower": 672},
+    ]
+
+    df = normalize_solarman(records)
+
+    assert len(df) == 2
+    assert np.allclose(df["power_kw"], [0.624, 0.672])
+
+
+def test_normalize_victron_kwh_to_kw():
+    # 0.25 kWh in a 15 minute interval is 1 kW, and intervals with no data are left out
+    kwh = [[1726263854000, 0.25], [1726264754000, 0.25], [1726265654000, 0.125], [1726267454000, 0.5]]
+
+    df = normalize_victron(kwh)
+
+    assert np.allclose(df["power_kw"], [1.0, 1.0, 0.5, 2.0])
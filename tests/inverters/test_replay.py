@@ -0,0 +1,84 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from quartz_solar_forecast.inverters.enphase import EnphaseSettings, get_enphase_data
+from quartz_solar_forecast.inverters.givenergy import GivEnergySettings, get_givenergy_data
+from quartz_solar_forecast.inverters.replay import SOLARMAN_RECORD_PATH, ReplayServer, default_recordings
+from quartz_solar_forecast.inverters.solarman import SolarmanSettings, get_solarman_data
+from quartz_solar_forecast.inverters.solis import SolisSettings, get_solis_data
+from quartz_solar_forecast.inverters.victron import VictronInverter, VictronSettings
+
+
+@pytest.fixture(scope="module")
+def server():
+    with ReplayServer(default_recordings()) as server:
+        yield server
+
+
+def check_generation(df: pd.DataFrame):
+    assert list(df.columns) == ["timestamp", "power_kw"]
+    assert len(df) > 0
+    assert df["timestamp"].is_monotonic_increasing
+    assert df["power_kw"].between(0, 4).all()
+
+
+def test_replay_enphase(server, monkeypatch):
+    monkeypatch.setenv("ENPHASE_ACCESS_TOKEN", "token")
+    settings = EnphaseSettings(
+        ENPHASE_CLIENT_ID="1",
+        ENPHASE_SYSTEM_ID="1",
+        ENPHASE_API_KEY="key",
+        ENPHASE_CLIENT_SECRET="secret",
+        ENPHASE_API_URL=server.url,
+    )
+    check_generation(get_enphase_data(settings))
+
+
+def test_replay_givenergy(server):
+    settings = GivEnergySettings(GIVENERGY_API_KEY="key", GIVENERGY_API_URL=server.url)
+    df = get_givenergy_data(settings)
+    assert len(df) == 1
+
+
+def test_replay_solarman(server):
+    settings = SolarmanSettings(
+        SOLARMAN_API_URL=server.url + SOLARMAN_RECORD_PATH, SOLARMAN_TOKEN="token", SOLARMAN_ID="1"
+    )
+    end_date = datetime.now()
+    check_generation(get_solarman_data(end_date - timedelta(days=2), end_date, settings))
+
+
+def test_replay_solis(server, monkeypatch):
+    # don't wait between calls, there is no rate limit
+    sleep = asyncio.sleep
+    monkeypatch.setattr("quartz_solar_forecast.inverters.solis.asyncio.sleep", lambda _: sleep(0))
+    settings = SolisSettings(
+        SOLIS_CLOUD_API_URL="http://127.0.0.1",
+        SOLIS_CLOUD_API_PORT=str(server.port),
+        SOLIS_CLOUD_API_KEY="key",
+        SOLIS_CLOUD_API_KEY_SECRET="secret",
+    )
+    check_generation(asyncio.run(get_solis_data(settings)))
+
+
+def test_replay_victron(server):
+    settings = VictronSettings(VICTRON_USER="user", VICTRON_PASS="pass", VICTRON_API_URL=server.url)
+    check_generation(VictronInverter.from_settings(settings).get_data(pd.Timestamp.now()))
+
+
+def test_replay_failures_and_rate_limit():
+    with ReplayServer(default_recordings(), failure_rate=1) as server:
+        settings = GivEnergySettings(GIVENERGY_API_KEY="key", GIVENERGY_API_URL=server.url)
+        with pytest.raises(Exception):
+            get_givenergy_data(settings)
+        assert server.status_counts == {503: 1}
+
+    with ReplayServer(default_recordings(), requests_per_second=1) as server:
+        settings = GivEnergySettings(GIVENERGY_API_KEY="key", GIVENERGY_API_URL=server.url)
+        # the second call in the same second is rate limited
+        with pytest.raises(Exception):
+            get_givenergy_data(settings)
+        assert server.status_counts == {200: 1, 429: 1}
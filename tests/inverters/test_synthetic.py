@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from quartz_solar_forecast.inverters.synthetic import SyntheticInverter
+
+
+def test_synthetic_inverter_shape():
+    inverter = SyntheticInverter(
+        latitude=51.75, longitude=-1.25, capacity_kwp=4, gap_probability=0, outage_probability=0, seed=1
+    )
+    ts = pd.Timestamp("2024-06-21 12:00")
+
+    df = inverter.get_data(ts)
+
+    assert list(df.columns) == ["timestamp", "power_kw"]
+    assert len(df) == 7 * 24 * 12
+    assert df["timestamp"].iloc[-1] == ts
+    assert df["power_kw"].between(0, 4).all()
+
+    # no generation at night, and generation around midday
+    hourly = df.set_index("timestamp")["power_kw"].groupby(lambda t: t.hour).mean()
+    assert hourly[0] == 0
+    assert hourly[12] > 0.5
+
+
+def test_synthetic_inverter_gaps_and_outages():
+    inverter = SyntheticInverter(
+        latitude=51.75,
+        longitude=-1.25,
+        capacity_kwp=4,
+        freq="15min",
+        gap_probability=0.1,
+        outage_probability=1,
+        seed=2,
+    )
+
+    df = inverter.get_data(pd.Timestamp("2024-06-21 12:00"))
+
+    assert len(df) < 7 * 24 * 4
+    assert df["timestamp"].is_monotonic_increasing
+    assert not np.isnan(df["power_kw"]).any()
+
+
+def test_synthetic_inverter_seed():
+    inverter = SyntheticInverter(latitude=40, longitude=-3, capacity_kwp=2, seed=3)
+    ts = pd.Timestamp("2024-01-10 09:00")
+
+    pd.testing.assert_frame_equal(inverter.get_data(ts), inverter.get_data(ts))
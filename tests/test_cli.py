@@ -0,0 +1,19 @@
+import pandas as pd
+import pytest
+import typer
+
+from quartz_solar_forecast.cli import make_batch_init_times
+
+
+def test_make_batch_init_times():
+    assert make_batch_init_times(["2024-07-02T09:00", "2024-07-01T09:00"], None, None, 24) == [
+        pd.Timestamp("2024-07-01 09:00"),
+        pd.Timestamp("2024-07-02 09:00"),
+    ]
+
+    init_times = make_batch_init_times(None, "2024-07-01", "2024-07-02", 6)
+    assert len(init_times) == 5
+    assert make_batch_init_times(None, "2024-07-01", None, 6) == [pd.Timestamp("2024-07-01")]
+
+    with pytest.raises(typer.BadParameter):
+        make_batch_init_times(None, None, None, 24)
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from quartz_solar_forecast.data import process_pv_data
+from quartz_solar_forecast.forecast import run_forecasts
+from quartz_solar_forecast.pydantic_models import PVSite
+from quartz_solar_forecast.utils.portfolio import portfolio_schema
+from quartz_solar_forecast.utils.precision import float_dtype
+
+
+def test_float_dtype(monkeypatch):
+    monkeypatch.delenv("QUARTZ_FLOAT32", raising=False)
+    assert float_dtype() == np.float64
+
+    monkeypatch.setenv("QUARTZ_FLOAT32", "true")
+    assert float_dtype() == np.float32
+    # an explicit dtype wins over the environment
+    assert float_dtype(np.float64) == np.float64
+
+
+def test_process_pv_data_float32():
+    site = PVSite(latitude=51.75, longitude=-1.25, capacity_kwp=1.25)
+    live_generation_kw = pd.DataFrame(
+        {
+            "timestamp": pd.date_range("2024-06-16 10:00", periods=3, freq="5min"),
+            "power_kw": [0.75, 0.80, 0.78],
+        }
+    )
+
+    pv_xr = process_pv_data(live_generation_kw, pd.Timestamp("2024-06-16 10:15"), site, dtype=np.float32)
+    assert pv_xr["generation_kw"].dtype == np.float32
+
+    pv_xr = process_pv_data(None, pd.Timestamp("2024-06-16 10:15"), site, dtype=np.float32)
+    assert pv_xr["generation_kw"].dtype == np.float32
+
+
+def test_portfolio_schema():
+    assert portfolio_schema(np.dtype(np.float32)).field("power_kw").type == pa.float32()
+    assert portfolio_schema(np.dtype(np.float64)).field("power_kw").type == pa.float64()
+
+
+def test_run_forecasts_float32():
+    site = PVSite(latitude=51.75, longitude=-1.25, capacity_kwp=1.25)
+    ts = datetime.today() - timedelta(weeks=2)
+
+    predictions_64 = run_forecasts(site, ts=ts, dtype=np.float64)
+    predictions_32 = run_forecasts(site, ts=ts, dtype=np.float32)
+
+    for model in ["gb", "xgb"]:
+        assert predictions_32[model]["power_kw"].dtype == np.float32
+        # float32 changes the forecasts by much less than a watt
+        np.testing.assert_allclose(
+            predictions_32[model]["power_kw"].to_numpy(dtype=float),
+            predictions_64[model]["power_kw"].to_numpy(),
+            atol=1e-3,
+        )
@@ -0,0 +1,118 @@
+import uuid
+from unittest.mock import patch
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from quartz_solar_forecast.utils.forecast_archive import ForecastArchive
+
+
+def make_forecast(init_time, power_kw):
+    index = pd.date_range(init_time, periods=4, freq="15min")
+    return pd.DataFrame({"power_kw": [power_kw] * 4}, index=index)
+
+
+def fill_archive(archive):
+    for day in range(1, 4):
+        for site_id in ["a", "b"]:
+            for model in ["gb", "xgb"]:
+                init_time = pd.Timestamp(f"2024-07-0{day} 09:00")
+                archive.append(make_forecast(init_time, day), site_id, model, init_time)
+
+
+def test_append_and_query(tmp_path):
+    archive = ForecastArchive(str(tmp_path))
+    fill_archive(archive)
+
+    assert len(archive.read_index()) == 12
+
+    forecasts = archive.query(site_id="a", model="gb", start="2024-07-02", end="2024-07-03 12:00")
+    assert forecasts["forecast_init_time"].unique().tolist() == [
+        pd.Timestamp("2024-07-02 09:00"),
+        pd.Timestamp("2024-07-03 09:00"),
+    ]
+    assert (forecasts["site_id"] == "a").all() and (forecasts["model"] == "gb").all()
+    assert forecasts["power_kw"].tolist() == [2.0] * 4 + [3.0] * 4
+
+    # appending a run again replaces it
+    init_time = pd.Timestamp("2024-07-01 09:00")
+    archive.append(make_forecast(init_time, 10), "a", "gb", init_time)
+    assert len(archive.read_index()) == 12
+    assert archive.query(site_id="a", model="gb", end=init_time)["power_kw"].tolist() == [10.0] * 4
+
+    assert archive.query(site_id="c").empty
+
+
+def test_compact(tmp_path):
+    archive = ForecastArchive(str(tmp_path))
+    fill_archive(archive)
+    before = archive.query()
+
+    path = archive.compact("gb", "2024-07")
+
+    assert set(archive.read_index().query("model == 'gb'")["path"]) == {path}
+    assert len(list(tmp_path.glob("model=gb/month=2024-07/*.parquet"))) == 1
+    pd.testing.assert_frame_equal(archive.query(), before)
+
+    forecasts = archive.query(site_id="b", model="gb", start="2024-07-03")
+    assert forecasts["power_kw"].tolist() == [3.0] * 4
+    assert pq.ParquetFile(path).metadata.num_rows == 24
+
+
+def test_append_writes_index_fragments(tmp_path):
+    archive = ForecastArchive(str(tmp_path))
+    fill_archive(archive)
+
+    # each append writes one fragment, rather than rewriting the index
+    assert not (tmp_path / "index.parquet").exists()
+    assert len(archive.index_fragments()) == 12
+
+    assert archive.merge_index() == 12
+    assert archive.index_fragments() == []
+    assert len(archive.read_index()) == 12
+
+    # a run appended again after the merge replaces the merged row
+    init_time = pd.Timestamp("2024-07-01 09:00")
+    archive.append(make_forecast(init_time, 10), "a", "gb", init_time)
+    assert len(archive.read_index()) == 12
+    assert archive.query(site_id="a", model="gb", end=init_time)["power_kw"].tolist() == [10.0] * 4
+
+
+def test_compact_merges_index_fragments(tmp_path):
+    archive = ForecastArchive(str(tmp_path))
+    fill_archive(archive)
+
+    archive.compact("gb", "2024-07")
+
+    assert archive.index_fragments() == []
+    assert len(archive.read_index()) == 12
+
+
+def test_remote_archive_writes_in_place():
+    archive = ForecastArchive(f"memory://archive-{uuid.uuid4().hex}")
+
+    with patch.object(archive.fs, "mv") as mv:
+        fill_archive(archive)
+
+    mv.assert_not_called()
+    assert len(archive.read_index()) == 12
+    assert archive.query(site_id="a", model="xgb", start="2024-07-03")["power_kw"].tolist() == [3.0] * 4
+
+
+def test_append_again_after_compact(tmp_path):
+    archive = ForecastArchive(str(tmp_path))
+    fill_archive(archive)
+    archive.compact("gb", "2024-07")
+
+    # the new run is in a new part, and the old one is still in the compacted file
+    init_time = pd.Timestamp("2024-07-01 09:00")
+    archive.append(make_forecast(init_time, 10), "a", "gb", init_time)
+
+    expected = [10.0] * 4 + [2.0] * 4 + [3.0] * 4
+    assert archive.query(site_id="a", model="gb")["power_kw"].tolist() == expected
+    assert archive.query(site_id="a", model="gb", columns=["power_kw"])["power_kw"].tolist() == expected
+
+    # compacting again keeps only the new run
+    path = archive.compact("gb", "2024-07")
+    assert pq.ParquetFile(path).metadata.num_rows == 24
+    assert archive.query(site_id="a", model="gb")["power_kw"].tolist() == expected
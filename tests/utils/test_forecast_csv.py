@@ -0,0 +1,68 @@
+from datetime import datetime
+from unittest.mock import patch
+
+import pandas as pd
+from typer.testing import CliRunner
+
+from quartz_solar_forecast.cli import app
+from quartz_solar_forecast.utils import forecast_csv
+from quartz_solar_forecast.utils.forecast_csv import make_init_times
+
+
+def test_make_init_times():
+    init_times = make_init_times(6, datetime(2024, 3, 1, 12), datetime(2024, 3, 3, 0))
+
+    assert [len(date_init_times) for date_init_times in init_times] == [2, 4, 1]
+    assert init_times[0][0] == pd.Timestamp("2024-03-01 12:00")
+    assert init_times[-1][-1] == pd.Timestamp("2024-03-03 00:00")
+    for date_init_times in init_times:
+        assert (date_init_times.normalize() == date_init_times[0].normalize()).all()
+
+
+def test_make_init_times_fraction_of_hour():
+    init_times = make_init_times(0.25, datetime(2024, 3, 1, 23), datetime(2024, 3, 2, 0, 30))
+
+    assert [len(date_init_times) for date_init_times in init_times] == [4, 3]
+
+
+def fake_predict_ocf(site, model, ts, nwp_source, nwp_xr=None):
+    index = pd.date_range(ts, periods=4, freq="15min")
+    return pd.DataFrame({"power_kw": [site.capacity_kwp] * 4}, index=index)
+
+
+def test_backfill_command(tmp_path):
+    output_dir = tmp_path / "backfill"
+    args = [
+        "backfill",
+        "--latitude", "51.75",
+        "--longitude", "-1.25",
+        "--capacity-kwp", "1.25",
+        "--start", "2024-03-01 12:00",
+        "--end", "2024-03-03 00:00",
+        "--freq-hours", "6",
+        "--output-dir", str(output_dir),
+        "--workers", "1",
+    ]
+
+    with patch.object(forecast_csv, "load_model"), patch.object(forecast_csv, "get_nwp") as get_nwp, patch.object(
+        forecast_csv, "predict_ocf", side_effect=fake_predict_ocf
+    ) as predict_ocf:
+        result = CliRunner().invoke(app, args)
+
+        assert result.exit_code == 0, result.output
+        # the nwp data is fetched once per date
+        assert get_nwp.call_count == 3
+        assert predict_ocf.call_count == 7
+
+        # the dates already written are skipped
+        result = CliRunner().invoke(app, args)
+        assert result.exit_code == 0, result.output
+        assert predict_ocf.call_count == 7
+
+    partitions = sorted(path.parent.name for path in output_dir.glob("date=*/forecasts.parquet"))
+    assert partitions == ["date=2024-03-01", "date=2024-03-02", "date=2024-03-03"]
+
+    forecasts = pd.read_parquet(output_dir / "date=2024-03-02" / "forecasts.parquet")
+    assert len(forecasts) == 4 * 4
+    assert forecasts["forecast_init_time"].nunique() == 4
+    assert (forecasts["power_kw"] == 1.25).all()
@@ -0,0 +1,96 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from quartz_solar_forecast.inverters.store import StoredInverter
+from quartz_solar_forecast.pydantic_models import PVSite
+from quartz_solar_forecast.utils import portfolio
+from quartz_solar_forecast.utils.portfolio import (
+    PORTFOLIO_SCHEMA,
+    forecast_site,
+    read_sites,
+    run_portfolio_forecast,
+)
+
+
+def test_read_sites(tmp_path):
+    path = tmp_path / "sites.csv"
+    path.write_text("site_id,latitude,longitude,capacity_kwp,tilt\n001,51.75,-1.25,1.25,30\n002,52.0,-1.5,1.5,\n")
+
+    sites = read_sites(str(path))
+
+    assert [site.site_id for site in sites] == ["001", "002"]
+    assert sites[0].tilt == 30
+    # missing values use the defaults
+    assert sites[1].tilt == 35
+
+
+def test_run_portfolio_forecast_needs_unique_site_ids(tmp_path):
+    sites = [PVSite(site_id="a", latitude=51.75, longitude=-1.25, capacity_kwp=1.25)] * 2
+
+    with pytest.raises(ValueError):
+        run_portfolio_forecast(sites, ["2023-11-01"], str(tmp_path / "forecasts.parquet"))
+
+
+def test_run_portfolio_forecast(tmp_path):
+    sites = [
+        PVSite(site_id="001", latitude=51.75, longitude=-1.25, capacity_kwp=1.25),
+        PVSite(site_id="002", latitude=52.0, longitude=-1.5, capacity_kwp=1.5),
+    ]
+    init_times = ["2023-11-01 00:00", "2023-11-01 12:00"]
+    output_path = str(tmp_path / "forecasts.parquet")
+
+    def fake_predict_ocf(site, model, ts, nwp_source, dtype=None):
+        if site.latitude == 52.0 and ts == pd.Timestamp("2023-11-01 12:00"):
+            raise ValueError("no nwp data")
+        times = pd.date_range(ts, periods=3, freq="15min")
+        return pd.DataFrame({"power_kw": [0.0, 0.5, 1.0]}, index=times)
+
+    calls = []
+    # threads instead of worker processes, so the patched forecast is used
+    with patch.object(portfolio, "ProcessPoolExecutor", ThreadPoolExecutor), patch.object(
+        portfolio, "_init_worker"
+    ), patch.object(portfolio, "predict_ocf", side_effect=fake_predict_ocf):
+        failed = run_portfolio_forecast(
+            sites, init_times, output_path, max_workers=2, on_forecast=lambda *args: calls.append(args)
+        )
+
+    assert failed == [("002", pd.Timestamp("2023-11-01 12:00"))]
+    assert sorted(calls) == [("001", 3), ("001", 3), ("002", 0), ("002", 3)]
+    assert os.listdir(tmp_path) == ["forecasts.parquet"]
+
+    table = pq.read_table(output_path)
+    assert table.schema.equals(PORTFOLIO_SCHEMA, check_metadata=False)
+
+    forecasts_df = table.to_pandas().sort_values(["site_id", "forecast_init_time", "time"])
+    assert len(forecasts_df) == 9
+    assert forecasts_df.groupby(["site_id", "forecast_init_time"]).size().to_dict() == {
+        ("001", pd.Timestamp("2023-11-01 00:00")): 3,
+        ("001", pd.Timestamp("2023-11-01 12:00")): 3,
+        ("002", pd.Timestamp("2023-11-01 00:00")): 3,
+    }
+    assert forecasts_df["power_kw"].tolist() == [0.0, 0.5, 1.0] * 3
+    assert forecasts_df["time"].iloc[:3].tolist() == list(pd.date_range("2023-11-01", periods=3, freq="15min"))
+
+
+@pytest.mark.parametrize("use_generation_store", [False, True])
+def test_forecast_site_generation_store(tmp_path, monkeypatch, use_generation_store):
+    monkeypatch.setenv("GENERATION_STORE_PATH", str(tmp_path / "generation.sqlite"))
+    site = PVSite(site_id="001", latitude=51.75, longitude=-1.25, capacity_kwp=1.25)
+
+    inverters = []
+
+    def fake_predict_ocf(site, model, ts, nwp_source, dtype=None):
+        inverters.append(site.get_inverter())
+        return pd.DataFrame({"power_kw": [0.5]}, index=pd.DatetimeIndex([pd.Timestamp(ts)]))
+
+    with patch.object(portfolio, "predict_ocf", side_effect=fake_predict_ocf):
+        site_df = forecast_site(site, "2023-11-01", use_generation_store=use_generation_store)
+
+    # the site_id is the output key either way, but only reads the store when asked to
+    assert site_df["site_id"].tolist() == ["001"]
+    assert isinstance(inverters[0], StoredInverter) == use_generation_store
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from quartz_solar_forecast.utils.resample import resample_pv_data
+
+
+def test_resample_pv_data_5_minute():
+    live_generation_kw = pd.DataFrame(
+        {
+            "timestamp": pd.date_range("2024-06-16 10:05", "2024-06-16 11:00", freq="5min"),
+            "power_kw": np.arange(12, dtype=float),
+        }
+    )
+    ts = pd.Timestamp("2024-06-16 10:50")
+
+    resampled = resample_pv_data(live_generation_kw, ts)
+
+    # the last period ends at 10:45, as later data is after ts
+    assert resampled["timestamp"].tolist() == list(
+        pd.date_range("2024-06-16 10:15", "2024-06-16 10:45", freq="15min")
+    )
+    assert resampled["power_kw"].tolist() == [1.0, 4.0, 7.0]
+    assert not resampled["is_gap"].any()
+
+
+def test_resample_pv_data_unsorted_with_gap():
+    live_generation_kw = pd.DataFrame(
+        {
+            "timestamp": pd.to_datetime(["2024-06-16 11:00", "2024-06-16 10:15", "2024-06-16 10:30"]),
+            "power_kw": [3.0, 1.0, 2.0],
+        }
+    )
+
+    resampled = resample_pv_data(live_generation_kw, pd.Timestamp("2024-06-16 11:00"))
+
+    assert resampled["timestamp"].is_monotonic_increasing
+    assert np.allclose(resampled["power_kw"], [1.0, 2.0, np.nan, 3.0], equal_nan=True)
+    assert resampled["is_gap"].tolist() == [False, False, True, False]
+
+
+def test_resample_pv_data_hourly():
+    live_generation_kw = pd.DataFrame(
+        {
+            "timestamp": pd.to_datetime(["2024-06-16 10:00", "2024-06-16 11:00"]),
+            "power_kw": [1.0, 2.0],
+        }
+    )
+
+    resampled = resample_pv_data(live_generation_kw, pd.Timestamp("2024-06-16 11:00"))
+
+    assert resampled["power_kw"].tolist() == [1.0, 2.0, 2.0, 2.0, 2.0]
+
+
+def test_resample_pv_data_outside_lookback():
+    live_generation_kw = pd.DataFrame(
+        {"timestamp": pd.to_datetime(["2024-06-01 10:00"]), "power_kw": [1.0]}
+    )
+
+    resampled = resample_pv_data(live_generation_kw, pd.Timestamp("2024-06-16 11:00"))
+
+    assert resampled.empty
+    assert list(resampled.columns) == ["timestamp", "power_kw", "is_gap"]